@@ -0,0 +1,219 @@
+"""Load test for report_api.py
+
+Opens keep-alive connections to the API and sends render requests as
+fast as the server answers them, optionally pipelining several requests
+per connection. Clients are spread over processes so the client side is
+not the bottleneck. Every response is checked to be byte-identical to
+report_renderer.render() for the same record.
+
+    python api_load_test.py --spawn 4 -c 64 -n 200000
+    python api_load_test.py --port 8765 -c 32 --batch 100 --min-rps 2000
+
+--spawn N starts report_api.py with N workers on a free port for the
+duration of the test; otherwise a running server is used.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import report_renderer
+from load_test import percentile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def sample_record(seed):
+    rng = random.Random(seed)
+    report_type = rng.choice(report_renderer.REPORT_TYPES)
+    return {
+        "type": report_type,
+        "name": f"Officer {seed}",
+        "crime": rng.choice(["Robbery", "Hostage", "Banditry"]),
+        "date": "18.10.2025",
+        "time": f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+        "nov": rng.random() < 0.3,
+        "crimes": ["PC 2.10.6 Robbery", "PC 3.1.6 Banditry"][:rng.randint(0, 2)],
+        "fields": {key: f"https://i.ibb.co/{seed:06d}/{key}.png" if rng.random() < 0.8 else ""
+                   for _, key in report_renderer.fields_for(report_type)},
+    }
+
+
+def build_request(host, port, batch, seed):
+    """Return (request bytes, expected response body)"""
+    if batch:
+        records = [sample_record(seed * batch + i) for i in range(batch)]
+        path, body = "/render/batch", {"records": records}
+        expected = {"results": [dict(zip(("part1", "part2"), report_renderer.render(r)))
+                                for r in records]}
+    else:
+        record = sample_record(seed)
+        path, body = "/render", record
+        expected = dict(zip(("part1", "part2"), report_renderer.render(record)))
+    payload = json.dumps(body).encode("utf-8")
+    head = (f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n")
+    return head.encode("latin-1") + payload, expected
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def connection(host, port, requests, pipeline, batch, seed, latencies, errors):
+    request, expected = build_request(host, port, batch, seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        checked = False
+        sent = 0
+        while sent < requests:
+            depth = min(pipeline, requests - sent)
+            began = time.perf_counter()
+            writer.write(request * depth)
+            for _ in range(depth):
+                status, body = await read_response(reader)
+                if status != 200:
+                    errors.append(f"HTTP {status}: {body[:200]!r}")
+                elif not checked:
+                    checked = True
+                    if json.loads(body) != expected:
+                        errors.append("response differs from report_renderer.render()")
+            latencies.append((time.perf_counter() - began) / depth)
+            sent += depth
+    finally:
+        writer.close()
+
+
+def run_client(host, port, connections, requests, pipeline, batch, first_seed):
+    """One client process: returns (latencies, errors)"""
+    latencies, errors = [], []
+
+    async def main():
+        per_connection = [requests // connections + (i < requests % connections)
+                          for i in range(connections)]
+        await asyncio.gather(*(connection(host, port, count, pipeline, batch,
+                                          first_seed + i, latencies, errors)
+                               for i, count in enumerate(per_connection) if count))
+
+    asyncio.run(main())
+    return latencies, errors
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(host, port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start on {host}:{port}")
+
+
+def run_load_test(host, port, connections, requests, pipeline=1, batch=0, processes=1):
+    processes = max(1, min(processes, connections))
+    shares = [(connections // processes + (i < connections % processes),
+               requests // processes + (i < requests % processes)) for i in range(processes)]
+    began = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        outcomes = pool.starmap(run_client, [
+            (host, port, conns, reqs, pipeline, batch, i * 10_000)
+            for i, (conns, reqs) in enumerate(shares)])
+    elapsed = time.perf_counter() - began
+    latencies = [seconds * 1000 for lats, _ in outcomes for seconds in lats]
+    errors = [error for _, errs in outcomes for error in errs]
+    done = requests - len(errors)
+    return {
+        "connections": connections,
+        "requests": requests,
+        "pipeline": pipeline,
+        "batch": batch,
+        "elapsed_s": elapsed,
+        "requests_per_s": requests / elapsed if elapsed else 0.0,
+        "reports_per_s": done * max(batch, 1) / elapsed if elapsed else 0.0,
+        "latency_ms": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                       "p99": percentile(latencies, 99), "max": max(latencies, default=0.0)},
+        "errors": errors,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the report API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-c", "--connections", type=int, default=32,
+                        help="keep-alive connections (default: 32)")
+    parser.add_argument("-n", "--requests", type=int, default=50_000,
+                        help="total requests (default: 50000)")
+    parser.add_argument("--pipeline", type=int, default=1,
+                        help="requests in flight per connection (default: 1)")
+    parser.add_argument("--batch", type=int, default=0,
+                        help="send batches of this many records to /render/batch")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() // 2 or 1,
+                        help="client processes (default: half the CPUs)")
+    parser.add_argument("--spawn", type=int, metavar="WORKERS",
+                        help="start report_api.py with this many workers on a free port")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--min-rps", type=float,
+                        help="exit with status 1 below this many requests per second")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn:
+        args.port = free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "report_api.py"),
+                                   "--host", args.host, "--port", str(args.port),
+                                   "--workers", str(args.spawn)],
+                                  stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.host, args.port)
+        results = run_load_test(args.host, args.port, args.connections, args.requests,
+                                args.pipeline, args.batch, args.processes)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    latency = results["latency_ms"]
+    print(f"{results['requests']} requests over {results['connections']} connections "
+          f"in {results['elapsed_s']:.2f}s")
+    print(f"  throughput  {results['requests_per_s']:.0f} requests/s, "
+          f"{results['reports_per_s']:.0f} reports/s")
+    print(f"  latency     p50 {latency['p50']:.2f} ms  p95 {latency['p95']:.2f} ms  "
+          f"p99 {latency['p99']:.2f} ms  max {latency['max']:.2f} ms")
+    if results["errors"]:
+        print(f"  {len(results['errors'])} errors, first: {results['errors'][0]}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if results["errors"]:
+        return 1
+    if args.min_rps is not None and results["requests_per_s"] < args.min_rps:
+        print(f"{results['requests_per_s']:.0f} requests/s is below {args.min_rps:.0f}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
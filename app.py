@@ -1,6 +1,27 @@
 import streamlit as st
-from datetime import datetime
-import pytz
+import logging
+import os
+import time
+
+import charge_catalog
+import charge_search
+import charge_suggest
+import draft_journal
+import evidence_links
+import metrics
+import plate_index
+import report_archive
+import report_delivery
+import report_renderer
+import report_time
+import render_cache
+
+# Every widget interaction re-runs this script; keep each run under budget.
+# Slower reruns are counted in crime_report_slow_reruns_total, and
+# benchmarks.py fails when most of its reruns are over.
+RERUN_BUDGET_MS = 50
+rerun_started = time.perf_counter()
+logger = logging.getLogger(__name__)
 
 # Set page config
 st.set_page_config(
@@ -13,6 +34,9 @@ st.set_page_config(
 st.title("🚔 UK Crime Reporting System")
 st.markdown("---")
 
+# The first run of a session builds everything and is not held to the budget
+first_run = 'fields' not in st.session_state
+
 # Initialize session state for persistence
 if 'selected_crimes' not in st.session_state:
     st.session_state.selected_crimes = []
@@ -22,49 +46,173 @@ if 'name' not in st.session_state:
     st.session_state.name = ""
 if 'crime_type' not in st.session_state:
     st.session_state.crime_type = ""
-if 'date' not in st.session_state:
-    uk_now = datetime.now(pytz.timezone('Europe/London'))
-    st.session_state.date = uk_now.strftime("%d.%m.%Y")
-if 'time' not in st.session_state:
-    uk_now = datetime.now(pytz.timezone('Europe/London'))
-    st.session_state.time = uk_now.strftime("%H:%M")
+if 'date' not in st.session_state or 'time' not in st.session_state:
+    st.session_state.date, st.session_state.time = report_time.now_strings()
 if 'nov_checked' not in st.session_state:
     st.session_state.nov_checked = False
 if 'fields' not in st.session_state:
     st.session_state.fields = {}
 if 'generated_report' not in st.session_state:
     st.session_state.generated_report = False
-if 'part1' not in st.session_state:
-    st.session_state.part1 = ""
-if 'part2' not in st.session_state:
-    st.session_state.part2 = ""
+# The generated report lives in the shared render cache; a session keeps
+# its key, and the archive id of its record to render it again if it has
+# been evicted
+if 'report_key' not in st.session_state:
+    st.session_state.report_key = None
+    st.session_state.report_id = None
+
+# One archive connection shared by every session
+@st.cache_resource
+def get_archive():
+    return report_archive.ReportArchive()
+
+@st.cache_resource
+def get_catalog():
+    return charge_catalog.load_catalog()
+
+@st.cache_resource
+def get_search_index():
+    return charge_search.ChargeSearchIndex(get_catalog().labels)
+
+# Rendered reports shared by every session, least recently used dropped first
+@st.cache_resource
+def get_render_cache():
+    megabytes = int(os.environ.get("CRIME_REPORT_RENDER_CACHE_MB", "32"))
+    return render_cache.RenderCache(max_bytes=megabytes * 1024 * 1024)
+
+def generated_report():
+    """The report this session generated last, as a RenderedReport"""
+    report = get_render_cache().get(st.session_state.report_key)
+    if report is None:
+        record = get_archive().get(st.session_state.report_id)
+        report = get_render_cache().render(record, header="web")
+    return report
+
+# Built once from the archive, then updated as reports are generated
+@st.cache_resource
+def get_suggester():
+    return charge_suggest.ChargeSuggester.from_archive(get_archive())
+
+# Operation timings are served at http://127.0.0.1:<port>/metrics, once per server process
+@st.cache_resource
+def start_metrics_server():
+    port = int(os.environ.get("CRIME_REPORT_METRICS_PORT", "9108"))
+    try:
+        return metrics.start_http_server(port)
+    except OSError as e:
+        logger.warning("Metrics endpoint not started on port %d: %s", port, e)
+        return None
+
+start_metrics_server()
+
+# Link checks for every session share one event loop, connection pool and cache
+@st.cache_resource
+def get_link_checker():
+    return evidence_links.BackgroundValidator()
+
+# One outbox and delivery worker for every session; None unless CRIME_REPORT_WEBHOOK is set
+@st.cache_resource
+def get_delivery():
+    return report_delivery.from_environment()
+
+# Drafts nobody came back to for a week are removed, once per server process
+@st.cache_resource
+def prune_drafts():
+    return draft_journal.prune()
+
+prune_drafts()
+
+def restore_draft(state):
+    """Fill the session from a journaled draft"""
+    draft = draft_journal.unflatten(state)
+    for key, state_key in (("type", "report_type"), ("name", "name"), ("crime", "crime_type"),
+                           ("date", "date"), ("time", "time"), ("nov", "nov_checked")):
+        if key in draft:
+            st.session_state[state_key] = draft[key]
+    if "crimes" in draft:
+        st.session_state.selected_crimes = get_catalog().ordered(
+            [crime for crime in draft["crimes"] if crime in get_catalog()])
+    st.session_state.fields.update(draft["fields"])
+
+# Form widgets are created with a key only and read their value from these
+# session state entries. Passing value= too would give the widget a new id
+# each time its value changed, and the next edit to it would be dropped.
+WIDGET_STATE = {
+    "report_type_selector": "report_type",
+    "name_input": "name",
+    "crime_type_input": "crime_type",
+    "date_input": "date",
+    "time_input": "time",
+    "nov_checkbox": "nov_checked",
+}
+
+def sync_widgets():
+    """Show the form values in the widgets, e.g. after Clear All"""
+    for widget_key, state_key in WIDGET_STATE.items():
+        st.session_state[widget_key] = st.session_state[state_key]
+    for fields in report_renderer.FIELDS.values():
+        for _, key in fields:
+            st.session_state[f"{key}_input"] = st.session_state.fields.get(key, "")
+
+# The form is journaled under a draft id kept in the URL, so reloading the
+# page or restarting the server brings back whatever was typed
+if 'draft' not in st.session_state:
+    draft_id = st.experimental_get_query_params().get("draft", [""])[0]
+    if not draft_journal.valid_draft_id(draft_id):
+        draft_id = draft_journal.new_draft_id()
+        st.experimental_set_query_params(draft=draft_id)
+    st.session_state.draft = draft_journal.DraftJournal(draft_journal.draft_path(draft_id))
+    try:
+        restore_draft(st.session_state.draft.load())
+    except OSError as e:
+        logger.warning("Could not read draft %s: %s", draft_id, e)
+    sync_widgets()
+
+# Button callbacks run before the rerun they trigger, so no extra st.rerun() is needed
+def set_date_now():
+    st.session_state.date = st.session_state.date_input = report_time.now_strings()[0]
+
+def set_time_now():
+    st.session_state.time = st.session_state.time_input = report_time.now_strings()[1]
+
+def clear_all():
+    """Reset the whole form"""
+    # FIXED: Clear everything properly
+    st.session_state.selected_crimes = []
+    st.session_state.name = ""
+    st.session_state.crime_type = ""
+    
+    # Reset date and time to now
+    set_date_now()
+    set_time_now()
+    
+    st.session_state.nov_checked = False
+    st.session_state.fields = {}
+    st.session_state.generated_report = False
+    st.session_state.report_key = None
+    st.session_state.report_id = None
+    st.session_state.link_problems = []
+    st.session_state.draft.clear()
+    sync_widgets()
+    sync_charge_widgets()
+
+def sync_charge_widgets():
+    """Show selected_crimes in both multiselects and keep them listed"""
+    selected = st.session_state.selected_crimes
+    top = set(get_catalog().top)
+    st.session_state.charge_listed = list(selected)
+    st.session_state.top_charges = [c for c in selected if c in top]
+    st.session_state.all_charges = [c for c in selected if c not in top]
+
+def add_suggested_crime(crime):
+    """Add a suggested charge to the selection"""
+    st.session_state.selected_crimes = catalog.ordered(st.session_state.selected_crimes + [crime])
+    sync_charge_widgets()
 
 # Crime lists
-TOP_CHARGES = [
-    "PC 3.1.6 Banditry",
-    "PC 2.10.6 Robbery",
-    "PC 2.8.3 Taking a hostage",
-    "PC 2.5.6 Brandishing of a weapon",
-    "PC 3.4.2 Trespassing in a State Facility",
-    "PC 3.11 Murder or Attempted murder of a public servant"
-]
-
-ALL_CHARGES = [
-    "PC 2.2.4 Cultivation of cannabis (small quantities)",
-    "PC 2.2.5 Cultivation of cannabis (large quantities)",
-    "PC 2.5.3 Open Carrying",
-    "PC 2.5.8 Discharging a weapon in a public place",
-    "PC 2.8.1 Abduction",
-    "PC 2.8.2 Kidnapping",
-    "PC 2.8.4 Human Trafficking",
-    "PC 2.13.3 Vandalism",
-    "PC 3.1.1 Participation in terrorism",
-    "PC 3.1.4 Committing a terrorist act",
-    "PC 3.1.5 Creation of a stable armed group",
-    "PC 3.8.2 Impersonating a law enforcement officer",
-    "PC 3.10 Battery of a public servant",
-    "PC 3.20 Participation in a cyber attack of the state's resources"
-]
+catalog = get_catalog()
+TOP_CHARGES = catalog.top
+ALL_CHARGES = catalog.others
 
 # Layout
 col1, col2 = st.columns(2)
@@ -75,7 +223,6 @@ with col1:
     report_type = st.radio(
         "", 
         ["Gang", "Family"],
-        index=0 if st.session_state.report_type == "Gang" else 1,
         key="report_type_selector",
         label_visibility="collapsed",
         horizontal=True
@@ -86,13 +233,14 @@ with col1:
         st.session_state.report_type = report_type
         # Reset fields when type changes
         st.session_state.fields = {}
+        for _, key in report_renderer.fields_for(report_type):
+            st.session_state[f"{key}_input"] = ""
     
     # Basic Information with session state
     st.subheader("Basic Information")
     
     name = st.text_input(
         "**Name:**", 
-        value=st.session_state.name,
         key="name_input"
     )
     st.session_state.name = name
@@ -101,7 +249,6 @@ with col1:
     
     crime_type = st.text_input(
         "", 
-        value=st.session_state.crime_type,
         key="crime_type_input",
         label_visibility="collapsed"
     )
@@ -114,35 +261,28 @@ with col1:
         # Date input - editable and persistent
         date_input = st.text_input(
             "**Date (DD.MM.YYYY):**",
-            value=st.session_state.date,
             key="date_input"
         )
         st.session_state.date = date_input
         
-        if st.button("📅 Set to Now", key="date_now", use_container_width=True):
-            uk_now = datetime.now(pytz.timezone('Europe/London'))
-            st.session_state.date = uk_now.strftime("%d.%m.%Y")
-            st.rerun()
+        st.button("📅 Set to Now", key="date_now", use_container_width=True,
+                  on_click=set_date_now)
     
     with col_time:
         # Time input - FIXED: Changed label and made persistent
         time_input = st.text_input(
             "**Time (24h HH:MM):**",  # FIXED LABEL
-            value=st.session_state.time,
             key="time_input"
         )
         st.session_state.time = time_input
         
-        if st.button("⏰ Set to Now", key="time_now", use_container_width=True):
-            uk_now = datetime.now(pytz.timezone('Europe/London'))
-            st.session_state.time = uk_now.strftime("%H:%M")
-            st.rerun()
+        st.button("⏰ Set to Now", key="time_now", use_container_width=True,
+                  on_click=set_time_now)
     
     # NOV Checkbox - FIXED: Added to session state
     st.subheader("NOV:")
     nov_checked = st.checkbox(
         "",
-        value=st.session_state.nov_checked,
         key="nov_checkbox"
     )
     st.session_state.nov_checked = nov_checked
@@ -151,12 +291,31 @@ with col2:
     # Crimes Selection - FIXED: Using multiselect which stays open
     st.subheader("Select Crimes")
     
+    # Narrow both lists by code or description; selected charges always stay listed
+    charge_filter = st.text_input("Search charges", key="charge_filter",
+                                  placeholder="e.g. 3.1 or robbery")
+    if 'charge_search' not in st.session_state:
+        st.session_state.charge_search = get_search_index().session()
+    # The option lists change only with the filter (a changed list is a new
+    # widget), and the selection is carried over into the new widgets then
+    filter_key = charge_search.normalize(charge_filter)
+    if st.session_state.get("charge_filter_key") != filter_key:
+        st.session_state.charge_filter_key = filter_key
+        sync_charge_widgets()
+    if filter_key:
+        matched = set(st.session_state.charge_search.labels(charge_filter))
+        matched.update(st.session_state.charge_listed)
+        top_options = [c for c in TOP_CHARGES if c in matched]
+        all_options = [c for c in ALL_CHARGES if c in matched]
+    else:
+        top_options = TOP_CHARGES
+        all_options = ALL_CHARGES
+    
     st.markdown("**Top Charges:**")
     # FIXED: Using multiselect with key to prevent closing
     selected_top = st.multiselect(
         "", 
-        TOP_CHARGES,
-        default=[c for c in TOP_CHARGES if c in st.session_state.selected_crimes],
+        top_options,
         key="top_charges",
         label_visibility="collapsed"
     )
@@ -164,14 +323,13 @@ with col2:
     st.markdown("**All Charges:**")
     selected_all = st.multiselect(
         "", 
-        ALL_CHARGES,
-        default=[c for c in ALL_CHARGES if c in st.session_state.selected_crimes],
+        all_options,
         key="all_charges",
         label_visibility="collapsed"
     )
     
-    # Combine selections and update session state
-    all_selected = list(set(selected_top + selected_all))
+    # Combine selections in penal code order and update session state
+    all_selected = catalog.ordered(selected_top + selected_all)
     st.session_state.selected_crimes = all_selected
     
     # Display selected crimes
@@ -181,214 +339,132 @@ with col2:
             st.markdown(f"• {crime}")
     else:
         st.markdown("*No crimes selected*")
+    
+    # Charges usually filed alongside the current selection
+    suggestions = get_suggester().suggest(st.session_state.selected_crimes, k=4)
+    if suggestions:
+        st.markdown("**Often filed with these:**")
+        # The score adds up, over the selected charges, the reports filing each one with it
+        for crime, score in suggestions:
+            st.button(f"+ {crime}", key=f"suggest_{crime}", help=f"Co-filed score {score}",
+                      on_click=add_suggested_crime, args=(crime,))
 
 # Evidence Links - Dynamic fields based on report type
 st.markdown("---")
 st.subheader("Evidence Links")
 
-# Initialize field keys if not exists
-field_keys_gang = ["gang_proof", "gang_footage", "gang_interrogation", "gang_id", "gang_plates"]
-field_keys_family = ["family_proof", "family_footage", "family_id", "family_interrogation", "family_plates", "family_pda", "family_owner"]
-
 # Initialize all field values in session state
-for key in field_keys_gang + field_keys_family:
-    if key not in st.session_state.fields:
-        st.session_state.fields[key] = ""
+for fields in report_renderer.FIELDS.values():
+    for _, key in fields:
+        if key not in st.session_state.fields:
+            st.session_state.fields[key] = ""
 
-if report_type == "Gang":
-    # Gang fields with proper label
-    col1_fields, col2_fields = st.columns(2)
-    
-    with col1_fields:
-        gang_proof = st.text_area(
-            "**Proof of bodycam / refresh / upload:**", 
-            value=st.session_state.fields.get("gang_proof", ""),
-            key="gang_proof_input",
-            height=100
-        )
-        st.session_state.fields["gang_proof"] = gang_proof
-        
-        gang_footage = st.text_area(
-            "**Bodycam Footage:**", 
-            value=st.session_state.fields.get("gang_footage", ""),
-            key="gang_footage_input",
-            height=100
-        )
-        st.session_state.fields["gang_footage"] = gang_footage
-        
-        gang_interrogation = st.text_area(
-            "**Bodycam Footage of interrogation:**", 
-            value=st.session_state.fields.get("gang_interrogation", ""),
-            key="gang_interrogation_input",
-            height=100
-        )
-        st.session_state.fields["gang_interrogation"] = gang_interrogation
-    
-    with col2_fields:
-        gang_id = st.text_area(
-            "**Culprit Identification Proof:**", 
-            value=st.session_state.fields.get("gang_id", ""),
-            key="gang_id_input",
-            height=100
-        )
-        st.session_state.fields["gang_id"] = gang_id
-        
-        gang_plates = st.text_area(
-            "**License plates:**", 
-            value=st.session_state.fields.get("gang_plates", ""),
-            key="gang_plates_input",
-            height=100
-        )
-        st.session_state.fields["gang_plates"] = gang_plates
-    
-    fields_display = {
-        "Proof of bodycam / refresh / upload:": gang_proof,
-        "Bodycam Footage:": gang_footage,
-        "Bodycam Footage of interrogation:": gang_interrogation,
-        "Culprit Identification Proof:": gang_id,
-        "License plates:": gang_plates
-    }
-else:
-    # Family fields
+# Evidence fields come from the shared renderer so the form and the report
+# always agree; the first half goes in the left column
+evidence_fields = report_renderer.fields_for(report_type)
+field_height = 100 if report_type == "Gang" else 80
+split = (len(evidence_fields) + 1) // 2
+
+# The text areas sit in a form: typing or pasting does not rerun the page,
+# the values are sent together when one of its buttons is pressed, and the
+# rerun that follows journals them. Links typed since the last press are
+# only in the browser until then, which is what Save Draft is for.
+with st.form("evidence_form"):
     col1_fields, col2_fields = st.columns(2)
+    for i, (label, key) in enumerate(evidence_fields):
+        with col1_fields if i < split else col2_fields:
+            st.session_state.fields[key] = st.text_area(
+                f"**{label}**",
+                key=f"{key}_input",
+                height=field_height
+            )
     
-    with col1_fields:
-        family_proof = st.text_area(
-            "**Proof of bodycam / refresh / upload:**", 
-            value=st.session_state.fields.get("family_proof", ""),
-            key="family_proof_input",
-            height=80
-        )
-        st.session_state.fields["family_proof"] = family_proof
-        
-        family_footage = st.text_area(
-            "**Bodycam Footage:**", 
-            value=st.session_state.fields.get("family_footage", ""),
-            key="family_footage_input",
-            height=80
-        )
-        st.session_state.fields["family_footage"] = family_footage
-        
-        family_id = st.text_area(
-            "**Culprit Identification Proof:**", 
-            value=st.session_state.fields.get("family_id", ""),
-            key="family_id_input",
-            height=80
-        )
-        st.session_state.fields["family_id"] = family_id
-        
-        family_interrogation = st.text_area(
-            "**Bodycam Footage of interrogation:**", 
-            value=st.session_state.fields.get("family_interrogation", ""),
-            key="family_interrogation_input",
-            height=80
-        )
-        st.session_state.fields["family_interrogation"] = family_interrogation
-    
-    with col2_fields:
-        family_plates = st.text_area(
-            "**License plates:**", 
-            value=st.session_state.fields.get("family_plates", ""),
-            key="family_plates_input",
-            height=80
-        )
-        st.session_state.fields["family_plates"] = family_plates
-        
-        family_pda = st.text_area(
-            "**License plates searched in PDA:**", 
-            value=st.session_state.fields.get("family_pda", ""),
-            key="family_pda_input",
-            height=80
-        )
-        st.session_state.fields["family_pda"] = family_pda
-        
-        family_owner = st.text_area(
-            "**Owner of the car searched in PDA:**", 
-            value=st.session_state.fields.get("family_owner", ""),
-            key="family_owner_input",
-            height=80
-        )
-        st.session_state.fields["family_owner"] = family_owner
-    
-    fields_display = {
-        "Proof of bodycam / refresh / upload:": family_proof,
-        "Bodycam Footage:": family_footage,
-        "Culprit Identification Proof:": family_id,
-        "Bodycam Footage of interrogation:": family_interrogation,
-        "License plates:": family_plates,
-        "License plates searched in PDA:": family_pda,
-        "Owner of the car searched in PDA:": family_owner
-    }
-
-# Generate Report Button
-st.markdown("---")
-generate_col1, generate_col2 = st.columns([3, 1])
-
-with generate_col1:
-    if st.button("📋 Generate Report", type="primary", use_container_width=True):
-        if not st.session_state.name:
-            st.error("Please enter a Name")
-        else:
-            # Part 1
-            nov_text = "Nov" if st.session_state.nov_checked else ""
-            part1 = f"{st.session_state.name} | {st.session_state.crime_type} | {st.session_state.date} {st.session_state.time} {nov_text}\n\n"
-            
-            # Part 2
-            part2 = f"{report_type} Name: {st.session_state.name}\n\n"
-            part2 += "=" * 50 + "\n"
-            
-            # Add fields
-            for label, value in fields_display.items():
-                value = value.strip()
-                if value:
-                    part2 += f"{label}\n{value}\n"
-                else:
-                    part2 += f"{label} N/A\n"
-                part2 += "=" * 50 + "\n"
-            
-            # Add Crimes
-            part2 += "Crimes Committed "
-            part2 += "(Mandatory):\n" if report_type == "Gang" else ":\n"
-            
-            if st.session_state.selected_crimes:
-                for crime in st.session_state.selected_crimes:
-                    part2 += f"- {crime}\n"
-            else:
-                part2 += "N/A\n"
-            
-            part2 += "=" * 50 + "\n"
-            
-            # Store in session state
-            st.session_state.part1 = part1
-            st.session_state.part2 = part2
-            st.session_state.full_report = part1 + part2
-            st.session_state.generated_report = True
-            
-            st.success("✅ Report generated successfully!")
-
-with generate_col2:
-    if st.button("🔄 Clear All", use_container_width=True):
-        # FIXED: Clear everything properly
-        st.session_state.selected_crimes = []
-        st.session_state.name = ""
-        st.session_state.crime_type = ""
+    # Generate Report Button
+    st.markdown("---")
+    generate_clicked = st.form_submit_button("📋 Generate Report", type="primary",
+                                             use_container_width=True)
+    check_clicked = st.form_submit_button("🔗 Check Links", use_container_width=True)
+    st.form_submit_button("💾 Save Draft", use_container_width=True,
+                          help="Keep the evidence links typed so far and update the preview")
+
+if check_clicked:
+    links = evidence_links.report_links(
+        {key: st.session_state.fields.get(key, "") for _, key in evidence_fields})
+    urls = [url for field_links in links.values() for url in field_links]
+    labels = {key: label.rstrip(": ") for label, key in evidence_fields}
+    try:
+        with st.spinner(f"Checking {len(set(urls))} links..."):
+            results = get_link_checker().check(urls, timeout=15)
+    except Exception as e:
+        st.error(f"Could not check links: {e}")
+    else:
+        st.session_state.link_problems = [
+            f"**{labels[key]}**: {url} ({results[url].error})"
+            for key, field_links in links.items() for url in field_links if not results[url].ok]
+        if not st.session_state.link_problems:
+            st.success(f"✅ All {len(results)} evidence links answered" if urls
+                       else "No evidence links to check")
+
+if st.session_state.get("link_problems"):
+    st.warning("Dead or unreachable evidence links:\n\n" +
+               "\n".join(f"- {problem}" for problem in st.session_state.link_problems))
+
+report_data = {
+    "type": report_type,
+    "name": st.session_state.name,
+    "crime": st.session_state.crime_type,
+    "date": st.session_state.date,
+    "time": st.session_state.time,
+    "nov": st.session_state.nov_checked,
+    "crimes": st.session_state.selected_crimes,
+    "fields": {key: st.session_state.fields.get(key, "") for _, key in evidence_fields}
+}
+
+# Live preview, re-rendered only in the sections that changed. Text inputs
+# rerun the page on Enter or when focus leaves them and the evidence links
+# arrive with the form, so typing never reruns the page per character.
+if 'preview' not in st.session_state:
+    st.session_state.preview = report_renderer.ReportPreview(header="web")
+with metrics.timed("streamlit", "preview"):
+    st.session_state.preview.update(report_data)
+with st.expander("👁 Live Preview", expanded=not st.session_state.generated_report):
+    st.code(st.session_state.preview.text, language="text")
+
+if generate_clicked:
+    # Checked once here; the report keeps the UTC epoch next to the strings
+    try:
+        report_data["epoch"] = report_time.to_epoch(st.session_state.date, st.session_state.time)
+        timestamp_error = None
+    except report_time.InvalidTimestamp as e:
+        timestamp_error = str(e)
+    if not st.session_state.name:
+        st.error("Please enter a Name")
+    elif timestamp_error:
+        st.error(f"Invalid date/time: {timestamp_error}")
+    else:
+        # Pressing Generate again for the same report is a cache hit
+        with metrics.timed("streamlit", "generate"):
+            report = get_render_cache().render(report_data, header="web")
         
-        # Reset date and time to now
-        uk_now = datetime.now(pytz.timezone('Europe/London'))
-        st.session_state.date = uk_now.strftime("%d.%m.%Y")
-        st.session_state.time = uk_now.strftime("%H:%M")
+        # Archive each distinct report once, even if Generate is pressed again
+        if st.session_state.get("archived_key") != report.key:
+            with metrics.timed("streamlit", "archive"):
+                st.session_state.archived_id = get_archive().add(report_data)
+                get_suggester().observe(report_data["crimes"])
+            st.session_state.archived_key = report.key
         
-        st.session_state.nov_checked = False
-        st.session_state.fields = {}
-        st.session_state.generated_report = False
-        st.session_state.part1 = ""
-        st.session_state.part2 = ""
-        st.session_state.full_report = ""
+        # Store in session state
+        st.session_state.report_key = report.key
+        st.session_state.report_id = st.session_state.archived_id
+        st.session_state.generated_report = True
         
-        st.rerun()
+        st.success("✅ Report generated successfully!")
+
+st.button("🔄 Clear All", use_container_width=True, on_click=clear_all)
 
 # Display generated report (if exists) - PERSISTENT
 if st.session_state.generated_report:
+    report = generated_report()
     st.markdown("---")
     st.subheader("📄 Generated Report")
     
@@ -396,31 +472,108 @@ if st.session_state.generated_report:
     tab1, tab2, tab3 = st.tabs(["📋 Full Report", "1️⃣ Part 1", "2️⃣ Part 2"])
     
     with tab1:
-        st.code(st.session_state.full_report, language="text")
+        st.code(report.text, language="text")
         
         # Download button
         st.download_button(
             label="💾 Download Full Report",
-            data=st.session_state.full_report,
+            data=report.text,
             file_name=f"{st.session_state.name}_{st.session_state.date.replace('.', '-')}_report.txt",
             mime="text/plain",
             key="download_full"
         )
     
     with tab2:
-        st.code(st.session_state.part1.strip(), language="text")
+        st.code(report.part1.strip(), language="text")
         
         # Copy feedback without clearing form
         if st.button("📋 Copy Part 1", key="copy_part1", use_container_width=True):
-            st.code(st.session_state.part1.strip())
+            st.code(report.part1.strip())
             st.success("✅ Part 1 ready to copy! Select and copy the text above.")
     
     with tab3:
-        st.code(st.session_state.part2.strip(), language="text")
+        st.code(report.part2.strip(), language="text")
         
         if st.button("📋 Copy Part 2", key="copy_part2", use_container_width=True):
-            st.code(st.session_state.part2.strip())
+            st.code(report.part2.strip())
             st.success("✅ Part 2 ready to copy! Select and copy the text above.")
+    
+    delivery = get_delivery()
+    if delivery is not None:
+        # Rerunning must not post the same report twice
+        if st.session_state.get("sent_report") == report.key:
+            st.info("📤 This report is queued for the channel")
+        elif st.button("📤 Send to Channel", key="send_report", use_container_width=True):
+            try:
+                with metrics.timed("streamlit", "send"):
+                    count = delivery.submit(report.part1, report.part2)
+            except Exception as e:
+                st.error(f"Could not queue the report: {e}")
+            else:
+                st.session_state.sent_report = report.key
+                st.success(f"📤 Queued {count} message(s) for the channel "
+                           f"({delivery.pending()} waiting)")
+
+def pick_plate(plate):
+    st.session_state.plate_query = plate
+
+# Earlier reports naming a vehicle; plates match however they were written
+with st.expander("🚗 Vehicle Lookup"):
+    plate_query = st.text_input("Plate or car owner", key="plate_query",
+                                placeholder="e.g. AB12 CDE or John Smith").strip()
+    if plate_query:
+        archive = get_archive()
+        plate = plate_index.normalize_plate(plate_query)
+        report_ids = archive.plate_report_ids(plate) if plate else []
+        owned = archive.owner_plates(plate_query)
+        if report_ids:
+            owners = archive.plate_owners(plate)
+            st.markdown(f"**{plate}** is named in {len(report_ids)} report(s)" +
+                        (f", owner: {', '.join(owners)}" if owners else ""))
+            for found in archive.find_plate(plate, limit=20):
+                st.markdown(f"- {found.get('date', '')} {found.get('time', '')} · "
+                            f"{found.get('type', '')} · **{found.get('name', '')}** · "
+                            f"{found.get('crime', '')}")
+        if owned:
+            st.markdown(f"Plates found in the PDA for **{plate_query}**: " + ", ".join(owned))
+        suggestions = [known for known in archive.suggest_plates(plate_query) if known != plate]
+        if suggestions:
+            st.markdown("Known plates starting with that:")
+            for column, known in zip(st.columns(4), suggestions[:4]):
+                column.button(known, key=f"plate_{known}", on_click=pick_plate, args=(known,))
+        if not (report_ids or owned or suggestions):
+            st.info("No archived report names this plate or owner")
+
+def pick_name(name):
+    st.session_state.name_query = name
+
+# Archived reports by name or crime type, however they were spelled
+with st.expander("🔎 Report Search"):
+    name_query = st.text_input("Name or crime type", key="name_query",
+                               placeholder="e.g. jon smith or robery").strip()
+    if name_query:
+        archive = get_archive()
+        with metrics.timed("streamlit", "report_search"):
+            names = archive.search_names(name_query, limit=8)
+            crimes = archive.search_crimes(name_query, limit=4)
+        exact = names[0] if names and names[0].similarity == 1.0 else None
+        if exact:
+            st.markdown(f"**{exact.text}** filed {exact.reports} report(s):")
+            for found in archive.find_name(exact.text, limit=20):
+                st.markdown(f"- {found.get('date', '')} {found.get('time', '')} · "
+                            f"{found.get('type', '')} · {found.get('crime', '')}")
+        others = [match for match in names if match is not exact]
+        if others:
+            st.markdown("Similar names:")
+            for column, match in zip(st.columns(4), others[:4]):
+                column.button(match.text, key=f"name_{match.text}", on_click=pick_name,
+                              args=(match.text,),
+                              help=f"{match.reports} report(s), {match.similarity:.0%} match")
+        if crimes:
+            st.markdown("Crime types: " + ", ".join(
+                f"**{match.text}** ({match.reports})" for match in crimes))
+        if not (names or crimes):
+            st.info("No archived report has a name or crime type like that")
 
 # Instructions
 with st.expander("📖 How to use this app"):
@@ -451,4 +604,30 @@ with st.expander("📖 How to use this app"):
 
 # Footer
 st.markdown("---")
-st.caption("UK Crime Reporting System v3.0 | All issues fixed | Data persists in this session")
\ No newline at end of file
+st.caption("UK Crime Reporting System v3.0 | All issues fixed | Data persists in this session")
+
+# Journal what changed in this rerun; a fresh, untouched form is not written
+draft_values = draft_journal.flatten({
+    "type": st.session_state.report_type,
+    "name": st.session_state.name,
+    "crime": st.session_state.crime_type,
+    "date": st.session_state.date,
+    "time": st.session_state.time,
+    "nov": st.session_state.nov_checked,
+    "crimes": st.session_state.selected_crimes,
+    "fields": st.session_state.fields,
+})
+draft = st.session_state.draft
+if draft.state or any(draft_values[key] for key in ("name", "crime", "crimes")) \
+        or any(st.session_state.fields.values()):
+    draft.record(draft_values)
+    try:
+        draft.flush()
+    except OSError as e:
+        logger.warning("Draft autosave failed: %s", e)
+
+rerun_ms = (time.perf_counter() - rerun_started) * 1000
+metrics.observe("streamlit", "rerun", rerun_ms / 1000)
+if rerun_ms > RERUN_BUDGET_MS and not first_run:
+    metrics.SLOW_RERUNS.labels().inc()
+    logger.warning("Rerun took %.1f ms (budget %d ms)", rerun_ms, RERUN_BUDGET_MS)
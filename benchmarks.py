@@ -0,0 +1,389 @@
+"""Benchmark suite
+
+Times the hot paths of both front ends at small, medium and large
+catalog/archive sizes:
+
+    render           report text assembly, as in generate_report
+    json_compact     json.dumps(report_data), as the archive and app.py do
+    json_indent      json.dumps(report_data, indent=2), as save_to_file does
+    save             save_to_file without the dialog: .txt + .json + archive
+    save_submit      handing a save to the background writer (UI thread cost)
+    archive_import   archive.add_many, per report
+    tk_update_fields Gang <-> Family switch in the Tk app
+    tk_open_selection  reopening the (hidden) Select Crimes window
+    tk_build_selection opening it for the first time, when it is built
+    st_first_run     first Streamlit run of a session (AppTest)
+    st_rerun         one Streamlit rerun after a widget change (AppTest)
+    st_rerun_script  the same rerun, as app.py times itself against its budget
+    st_slow_reruns   how many of those reruns went over RERUN_BUDGET_MS
+
+Each size runs in its own process against a synthetic catalog and
+archive in a temporary directory, so nothing touches the real data.
+The Tk cases need a display; without one an Xvfb virtual display is
+started if available, otherwise they are skipped.
+
+    python benchmarks.py --json results.json
+    python benchmarks.py --save-baseline bench_baseline.json
+    python benchmarks.py --baseline bench_baseline.json --threshold 1.5
+
+With --baseline, every case whose fastest run is more than --threshold
+times slower than the stored one is listed and the exit status is 1.
+The minimum is compared rather than the median because it is the least
+disturbed by other load on the machine.
+
+Without a baseline, the exit status is still 1 when more than half of
+a size's Streamlit reruns went over the app's rerun budget.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from contextlib import contextmanager
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Total charges in the catalog, reports in the archive, charges per report
+SIZES = {
+    "small": {"catalog": 20, "archive": 200, "charges": 3},
+    "medium": {"catalog": 200, "archive": 10_000, "charges": 10},
+    "large": {"catalog": 2000, "archive": 100_000, "charges": 40},
+}
+
+REPEAT = 7
+SAVE_RUNS = 50
+RERUN_RUNS = 10
+
+
+def synthetic_catalog(size):
+    """The real charges, padded with generated ones up to size"""
+    with open(os.path.join(REPO_DIR, "charges.json"), encoding="utf-8") as f:
+        data = json.load(f)
+    charges = data["charges"]
+    for ordinal in range(len(charges), size):
+        charges.append({"ordinal": ordinal, "code": f"PC 9.{ordinal // 100}.{ordinal % 100}",
+                        "title": f"Synthetic charge {ordinal}", "top": False})
+    return data
+
+
+def random_record(rng, catalog, charges):
+    import report_renderer
+    report_type = rng.choice(report_renderer.REPORT_TYPES)
+    return {
+        "type": report_type,
+        "name": f"Officer {rng.randrange(1000)}",
+        "crime": rng.choice(["Robbery", "Hostage", "Banditry", "Kidnapping"]),
+        "date": f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025",
+        "time": f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+        "nov": rng.random() < 0.3,
+        "crimes": catalog.ordered(rng.sample(catalog.labels, min(charges, len(catalog)))),
+        "fields": {key: f"https://i.ibb.co/{rng.randrange(10**8):08d}/proof.png"
+                   for _, key in report_renderer.fields_for(report_type)},
+    }
+
+
+def summarize(seconds, number=1):
+    """Per-call statistics from a list of timings of `number` calls each"""
+    per_call = [s / number * 1e6 for s in seconds]
+    return {"median_us": statistics.median(per_call), "min_us": min(per_call),
+            "runs": len(per_call) * number}
+
+
+def measure(func):
+    """Time a cheap function with timeit, calibrating the loop count"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return summarize(timer.repeat(REPEAT, number), number)
+
+
+def measure_each(func, runs, setup=None):
+    """Time an expensive function once per run; setup is not timed"""
+    seconds = []
+    for i in range(runs):
+        if setup:
+            setup(i)
+        began = time.perf_counter()
+        func(i)
+        seconds.append(time.perf_counter() - began)
+    return summarize(seconds)
+
+
+def bench_core(results, spec, catalog, rng, workdir):
+    import charge_suggest
+    import report_archive
+    import report_renderer
+    import report_writer
+
+    record = random_record(rng, catalog, spec["charges"])
+    results["render"] = measure(lambda: report_renderer.render(record))
+    results["json_compact"] = measure(lambda: json.dumps(record))
+    results["json_indent"] = measure(lambda: json.dumps(record, indent=2))
+
+    archive = report_archive.ReportArchive()
+    reports = [random_record(rng, catalog, spec["charges"]) for _ in range(spec["archive"])]
+    began = time.perf_counter()
+    archive.add_many(reports)
+    results["archive_import"] = summarize([time.perf_counter() - began], len(reports))
+
+    suggester = charge_suggest.ChargeSuggester.from_archive(archive)
+    part1, part2 = report_renderer.render(record)
+    out_dir = os.path.join(workdir, "saved")
+    os.makedirs(out_dir)
+
+    def save(i):
+        report_writer.write_report_files(os.path.join(out_dir, f"report_{i}.txt"),
+                                        part1 + part2, record)
+        archive.add(record)
+        suggester.observe(record["crimes"])
+
+    results["save"] = measure_each(save, SAVE_RUNS)
+
+    # What the Tk main thread pays per save now that the writes are queued
+    writer = report_writer.ReportWriter(archive, max_pending=SAVE_RUNS + 1)
+    results["save_submit"] = measure_each(
+        lambda i: writer.submit(os.path.join(out_dir, f"queued_{i}.txt"), part1 + part2, record),
+        SAVE_RUNS)
+    writer.close()
+    archive.close()
+
+
+def bench_tk(results, catalog):
+    import tkinter as tk
+    import crime_report
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        results["tk_skipped"] = str(e)
+        return
+    root.withdraw()
+    app = crime_report.CrimeReportApp(root)
+    root.update()
+
+    def switch(i):
+        app.report_type.set("Family" if i % 2 == 0 else "Gang")
+        app.update_fields()
+        root.update_idletasks()
+
+    results["tk_update_fields"] = measure_each(switch, REPEAT * 4)
+
+    def hide_selection(i):
+        if app.selection_window is not None:
+            app.hide_crimes_selection()
+        root.update()
+
+    def destroy_selection(i):
+        if app.selection_window is not None:
+            app.selection_window.destroy()
+            app.selection_window = None
+        root.update()
+
+    def open_selection(i):
+        app.open_crimes_selection()
+        root.update_idletasks()
+
+    app.selected_crimes_list = catalog.labels[:3]
+    results["tk_build_selection"] = measure_each(open_selection, REPEAT, setup=destroy_selection)
+    results["tk_open_selection"] = measure_each(open_selection, REPEAT, setup=hide_selection)
+    root.destroy()
+
+
+def bench_streamlit(results):
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError as e:
+        results["st_skipped"] = str(e)
+        return
+
+    from streamlit.testing.v1 import local_script_runner
+
+    # AppTest checks for the end of the run every 100 ms, which would
+    # round every rerun up to the poll interval; poll every 1 ms instead
+    def wait_for_run(runner, timeout=3):
+        deadline = time.perf_counter() + timeout
+        while not runner.script_stopped():
+            if time.perf_counter() > deadline:
+                runner.request_stop()
+                runner.join()
+                raise RuntimeError(f"AppTest script run timed out after {timeout}s")
+            time.sleep(0.001)
+
+    local_script_runner.require_widgets_deltas = wait_for_run
+    at = AppTest.from_file(os.path.join(REPO_DIR, "app.py"), default_timeout=120)
+    results["st_first_run"] = measure_each(lambda i: at.run(), 1)
+
+    import metrics
+    script_seconds = metrics.OPERATION_SECONDS.labels("streamlit", "rerun")
+    slow_reruns = metrics.SLOW_RERUNS.labels()
+    slow_before = slow_reruns.value
+    in_script = []
+
+    def rerun(i):
+        before = script_seconds.sum
+        at.text_input(key="name_input").input(f"Officer {i}").run()
+        in_script.append(script_seconds.sum - before)
+
+    results["st_rerun"] = measure_each(rerun, RERUN_RUNS)
+    results["st_rerun_script"] = summarize(in_script)
+    results["st_slow_reruns"] = slow_reruns.value - slow_before
+
+
+def run_size(name):
+    """Run every case for one size; called in a fresh process"""
+    spec = SIZES[name]
+    workdir = tempfile.mkdtemp(prefix=f"crime-report-bench-{name}-")
+    try:
+        catalog_path = os.path.join(workdir, "charges.json")
+        with open(catalog_path, "w", encoding="utf-8") as f:
+            json.dump(synthetic_catalog(spec["catalog"]), f)
+        # Must be set before the modules read their default paths
+        os.environ["CRIME_REPORT_CATALOG"] = catalog_path
+        os.environ["CRIME_REPORT_ARCHIVE"] = os.path.join(workdir, "reports.db")
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_DIR)
+
+        import charge_catalog
+        catalog = charge_catalog.load_catalog()
+        rng = random.Random(0)
+        results = {}
+        bench_core(results, spec, catalog, rng, workdir)
+        bench_tk(results, catalog)
+        bench_streamlit(results)
+        return results
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@contextmanager
+def virtual_display():
+    """Make sure Tk has a display, starting Xvfb if there is none"""
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        yield
+        return
+    display = f":{90 + os.getpid() % 100}"
+    server = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    try:
+        yield
+    finally:
+        del os.environ["DISPLAY"]
+        server.terminate()
+        server.wait()
+
+
+def run_all(sizes):
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": {},
+    }
+    with virtual_display():
+        for name in sizes:
+            print(f"Running {name}...", file=sys.stderr)
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                out_path = f.name
+            try:
+                subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", name,
+                                "--json", out_path], check=True)
+                with open(out_path, encoding="utf-8") as f:
+                    results["sizes"][name] = json.load(f)
+            finally:
+                os.remove(out_path)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (size, case, ratio) for every case slower than threshold x baseline"""
+    regressions = []
+    for size, cases in results["sizes"].items():
+        for case, stats in cases.items():
+            old = baseline.get("sizes", {}).get(size, {}).get(case)
+            if isinstance(stats, dict) and isinstance(old, dict) and old["min_us"]:
+                ratio = stats["min_us"] / old["min_us"]
+                stats["baseline_ratio"] = ratio
+                if ratio > threshold:
+                    regressions.append((size, case, ratio))
+    return regressions
+
+
+def format_us(us):
+    if us >= 1e6:
+        return f"{us / 1e6:.2f} s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f} ms"
+    return f"{us:.1f} us"
+
+
+def print_results(results):
+    for size, cases in results["sizes"].items():
+        spec = SIZES[size]
+        print(f"{size}: {spec['catalog']} charges, {spec['archive']} reports, "
+              f"{spec['charges']} charges per report")
+        for case, stats in cases.items():
+            if not isinstance(stats, dict):
+                print(f"  {case:<18} {stats}")
+                continue
+            line = f"  {case:<18} {format_us(stats['median_us']):>10}  (min {format_us(stats['min_us'])})"
+            if "baseline_ratio" in stats:
+                line += f"  x{stats['baseline_ratio']:.2f} vs baseline"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark rendering, persistence and UI paths")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        help=f"comma-separated sizes to run (default: {','.join(SIZES)})")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results stored in this JSON file")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="slowdown vs baseline that counts as a regression (default: 1.5)")
+    parser.add_argument("--save-baseline", help="store the results as the new baseline")
+    parser.add_argument("--worker", choices=SIZES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(run_size(args.worker), f)
+        return 0
+
+    sizes = [name.strip() for name in args.sizes.split(",") if name.strip()]
+    unknown = [name for name in sizes if name not in SIZES]
+    if unknown:
+        parser.error(f"unknown size: {', '.join(unknown)}")
+
+    results = run_all(sizes)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    print_results(results)
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+
+    over_budget = [size for size, cases in results["sizes"].items()
+                   if cases.get("st_slow_reruns", 0) > RERUN_RUNS // 2]
+    if over_budget:
+        print(f"\nMost Streamlit reruns over the rerun budget: {', '.join(over_budget)}")
+    if regressions:
+        print(f"\n{len(regressions)} regressions over x{args.threshold}:")
+        for size, case, ratio in regressions:
+            print(f"  {size} {case}: x{ratio:.2f}")
+    return 1 if regressions or over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Bulk report generator
+
+Streams report records from CSV or JSONL (a file or stdin), renders
+Part 1 / Part 2 for each one with the same output as the Tk
+"Generate Report" button, and streams the results to stdout or a file.
+
+    python bulk_generate.py imports.csv -o reports.txt
+    cat imports.jsonl | python bulk_generate.py --format jsonl -
+
+JSONL input is one report_data dict per line. CSV input has the columns
+type, name, crime, date, time, nov and crimes (charges separated by
+";"), plus one column per evidence field key (gang_bodycam_proof, ...).
+
+Rendering is spread across a process pool. Records are sent in chunks and
+only a fixed number of chunks are in flight at once, so memory stays flat
+whatever the size of the input.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import report_renderer
+
+RECORD_KEYS = ("type", "name", "crime", "date", "time")
+FIELD_KEYS = tuple(key for fields in report_renderer.FIELDS.values() for _, key in fields)
+TRUE_VALUES = {"1", "true", "yes", "y", "nov", "x"}
+
+
+def record_from_row(row):
+    """Turn a CSV row dict into a report record"""
+    record = {key: (row.get(key) or "").strip() for key in RECORD_KEYS}
+    record["type"] = record["type"] or "Gang"
+    record["nov"] = (row.get("nov") or "").strip().lower() in TRUE_VALUES
+    crimes = row.get("crimes") or ""
+    record["crimes"] = [c.strip() for c in crimes.split(";") if c.strip()]
+    record["fields"] = {key: row[key] for key in FIELD_KEYS if row.get(key)}
+    return record
+
+
+def read_records(stream, fmt):
+    """Yield report records from an open text stream"""
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield record_from_row(row)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def detect_format(path):
+    """Guess the input format from a file name"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def format_output(part1, part2, fmt):
+    """Format one rendered report for the output stream"""
+    if fmt == "jsonl":
+        return json.dumps({"part1": part1, "part2": part2}, ensure_ascii=False) + "\n"
+    # Same text as the .txt written by Save to File, one blank line apart
+    return part1 + part2 + "\n"
+
+
+def render_chunk(records, header="desktop", fmt="text"):
+    """Render a list of records into one block of output text"""
+    return "".join(format_output(part1, part2, fmt)
+                   for part1, part2 in report_renderer.render_many(records, header))
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate(records, out, workers=None, chunk_size=500, header="desktop", fmt="text",
+             max_pending=None, progress=None):
+    """Render records and write them to out in input order
+
+    Returns the number of records written. At most max_pending chunks are
+    queued in the pool at once; the reader blocks until the oldest chunk
+    has been written.
+    """
+    count = 0
+    if workers == 0:
+        for chunk in chunked(records, chunk_size):
+            out.write(render_chunk(chunk, header, fmt))
+            count += len(chunk)
+            if progress:
+                progress(count)
+        return count
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunked(records, chunk_size):
+            pending.append((len(chunk), pool.submit(render_chunk, chunk, header, fmt)))
+            while len(pending) >= max_pending:
+                size, future = pending.popleft()
+                out.write(future.result())
+                count += size
+                if progress:
+                    progress(count)
+        while pending:
+            size, future = pending.popleft()
+            out.write(future.result())
+            count += size
+            if progress:
+                progress(count)
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate crime reports in bulk from CSV or JSONL")
+    parser.add_argument("input", nargs="?", default="-", help="input file, or - for stdin (default)")
+    parser.add_argument("-o", "--output", default="-", help="output file, or - for stdout (default)")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"],
+                        help="input format (default: from file extension, jsonl for stdin)")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text",
+                        help="output format (default: text)")
+    parser.add_argument("--header", choices=sorted(report_renderer.HEADER_FORMATS), default="desktop",
+                        help="Part 1 layout (default: desktop, as in the Tk app)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count, 0 renders in-process)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="records per task (default: 500)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print throughput")
+    args = parser.parse_args(argv)
+
+    fmt = args.input_format or ("jsonl" if args.input == "-" else detect_format(args.input))
+    src = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    start = time.perf_counter()
+    last_report = [start]
+
+    def progress(count):
+        now = time.perf_counter()
+        if not args.quiet and now - last_report[0] >= 1.0:
+            last_report[0] = now
+            print(f"{count} records, {count / (now - start):,.0f} records/s",
+                  file=sys.stderr, flush=True)
+
+    try:
+        count = generate(read_records(src, fmt), out, workers=args.workers,
+                         chunk_size=args.chunk_size, header=args.header,
+                         fmt=args.format, progress=progress)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        rate = count / elapsed if elapsed else 0.0
+        print(f"Generated {count} reports in {elapsed:.2f}s ({rate:,.0f} records/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""Charge frequency analytics over the report archive
+
+Loads the charge bitmask, report type and date of every archived report
+into NumPy arrays and computes, without a Python loop over reports:
+
+- per-charge counts, split by report type
+- the charge co-occurrence matrix
+- per-week counts of each charge
+
+    python charge_analytics.py freq
+    python charge_analytics.py cooc --top 15
+    python charge_analytics.py weekly --csv weekly.csv
+
+hourly and daily read the archive's incrementally kept rollups instead
+(see report_rollups), so they cost the same however large it is:
+
+    python charge_analytics.py daily --from 01.06.2024 --to 30.06.2024 --type Gang
+    python charge_analytics.py hourly --nov
+    python charge_analytics.py rebuild-rollups
+
+Loaded arrays are cached next to the archive (reports.db ->
+reports.analytics.npz), so later runs only read reports archived since.
+The cache records which archive it was built from and is rebuilt when
+pointed at another one. The reports x charges matrix is kept bit-packed
+(one bit per charge) and only unpacked a block of rows at a time, so
+memory stays bounded for large catalogs.
+"""
+import argparse
+import csv
+import logging
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+import report_archive
+import report_renderer
+import report_time
+
+logger = logging.getLogger(__name__)
+
+BLOCK_ROWS = 65536
+ROLLUP_PERIODS = {"hourly": "hour", "daily": "day"}
+
+
+class ChargeMatrix:
+    """Bit-packed reports x charges matrix with per-report type and date"""
+
+    def __init__(self, packed, types, dates, catalog):
+        self.packed = packed          # uint8 (reports, catalog.width)
+        self.types = types            # int8 index into report_renderer.REPORT_TYPES, -1 if other
+        self.dates = dates            # datetime64[D], NaT when the date was not parseable
+        self.catalog = catalog
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def labels(self):
+        """Charge labels in ordinal (column) order; None for unused ordinals"""
+        return [c.label if c is not None else None for c in self.catalog.by_ordinal]
+
+    def blocks(self, rows=BLOCK_ROWS):
+        """Yield (start, bool matrix) blocks of at most rows reports"""
+        size = self.catalog.size
+        for start in range(0, len(self), rows):
+            bits = np.unpackbits(self.packed[start:start + rows], axis=1, bitorder="little")
+            yield start, bits[:, :size].view(bool)
+
+    def to_bool(self):
+        """Return the full reports x charges boolean matrix"""
+        size = self.catalog.size
+        return np.unpackbits(self.packed, axis=1, bitorder="little")[:, :size].view(bool)
+
+
+def dates_from_keys(keys):
+    """Convert YYYYMMDD integers (0 for unknown) to datetime64[D]"""
+    keys = np.asarray(keys, dtype=np.int64)
+    years, rest = np.divmod(keys, 10000)
+    months, days = np.divmod(rest, 100)
+    valid = (keys > 0) & (months >= 1) & (months <= 12) & (days >= 1)
+    months_since_epoch = ((years - 1970) * 12 + months - 1).astype("timedelta64[M]")
+    first = np.datetime64("1970-01", "M") + months_since_epoch
+    dates = first.astype("datetime64[D]") + (days - 1).astype("timedelta64[D]")
+    dates[~valid] = np.datetime64("NaT")
+    return dates
+
+
+def _type_case():
+    """SQL expression mapping the type column to its REPORT_TYPES index"""
+    whens = " ".join(f"WHEN '{name}' THEN {i}"
+                     for i, name in enumerate(report_renderer.REPORT_TYPES))
+    return f"CASE type {whens} ELSE -1 END"
+
+
+def _fetch(archive, after_id):
+    """Read reports with id > after_id as (last_id, packed, types, dates)"""
+    width = archive.catalog.width
+    with archive.lock:
+        rows = archive.conn.execute(
+            f"SELECT id, charges, {_type_case()}, IFNULL(date_key, 0) FROM reports "
+            "WHERE id > ? ORDER BY id", (after_id,)).fetchall()
+    if not rows:
+        return after_id, np.zeros((0, width), np.uint8), np.zeros(0, np.int8), \
+            np.zeros(0, "datetime64[D]")
+    ids, masks, types, keys = zip(*rows)
+    blank = bytes(width)
+    # Masks from an older, smaller catalog are shorter: pad them out
+    buffer = b"".join(blank if m is None else m[:width].ljust(width, b"\0") for m in masks)
+    packed = np.frombuffer(buffer, dtype=np.uint8).reshape(len(rows), width)
+    return ids[-1], packed, np.array(types, dtype=np.int8), dates_from_keys(keys)
+
+
+def cache_path_for(archive_path):
+    """The matrix cache kept next to an archive: reports.db -> reports.analytics.npz"""
+    if archive_path == ":memory:":
+        return None
+    return os.path.splitext(archive_path)[0] + ".analytics.npz"
+
+
+def _identity(archive, last_id):
+    """The archive's absolute path and the creation times of its first report and report last_id
+
+    A cache must match this to be used: a recreated database at the same
+    path has different creation times.
+    """
+    with archive.lock:
+        created = dict(archive.conn.execute(
+            "SELECT id, created FROM reports WHERE id = (SELECT MIN(id) FROM reports) OR id = ?",
+            (last_id,)))
+    first = min(created) if created else 0
+    return np.array([os.path.abspath(archive.path), repr(created.get(first)),
+                     repr(created.get(last_id))])
+
+
+def load_matrix(archive, cache_path=None):
+    """Load every archived report into a ChargeMatrix
+
+    With cache_path, the arrays are kept in a .npz file between runs and
+    only reports archived since the last run are read from the database.
+    A cache written for another archive, or for an earlier database at
+    the same path, is ignored and rewritten.
+    """
+    catalog = archive.catalog
+    width = catalog.width
+    last_id = 0
+    parts = []
+    if cache_path:
+        try:
+            with np.load(cache_path) as cached:
+                last_id = int(cached["last_id"])
+                if not np.array_equal(cached["archive"], _identity(archive, last_id)):
+                    raise ValueError("cache belongs to another archive")
+                packed = cached["packed"]
+                if packed.shape[1] < width:
+                    packed = np.pad(packed, ((0, 0), (0, width - packed.shape[1])))
+                parts.append((packed[:, :width], cached["types"], cached["dates"]))
+        except (OSError, KeyError, ValueError):
+            parts = []
+            last_id = 0
+
+    new_last_id, packed, types, dates = _fetch(archive, last_id)
+    parts.append((packed, types, dates))
+    packed, types, dates = (np.concatenate(column) for column in zip(*parts))
+
+    if cache_path and new_last_id != last_id:
+        # Write then rename so a reader in another process never sees half a file
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_path)),
+                                            suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, packed=packed, types=types, dates=dates, last_id=new_last_id,
+                         archive=_identity(archive, new_last_id))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # The matrix is complete without it; the next run reads more of the archive
+            logger.warning("Analytics cache %s not written: %s", cache_path, e)
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    return ChargeMatrix(packed, types, dates, catalog)
+
+
+def charge_frequencies(matrix):
+    """Return (total, by_type) counts per charge
+
+    by_type has one row per entry of report_renderer.REPORT_TYPES.
+    """
+    size = matrix.catalog.size
+    total = np.zeros(size, np.int64)
+    by_type = np.zeros((len(report_renderer.REPORT_TYPES), size), np.int64)
+    for start, block in matrix.blocks():
+        total += block.sum(axis=0)
+        types = matrix.types[start:start + len(block)]
+        for code in range(len(report_renderer.REPORT_TYPES)):
+            by_type[code] += block[types == code].sum(axis=0)
+    return total, by_type
+
+
+def cooccurrence(matrix):
+    """Return the charges x charges co-occurrence count matrix
+
+    The diagonal holds each charge's own count.
+    """
+    size = matrix.catalog.size
+    counts = np.zeros((size, size), np.int64)
+    for _, block in matrix.blocks():
+        # float32 matmul is exact here: a block never exceeds 2**24 rows
+        values = block.astype(np.float32)
+        counts += (values.T @ values).astype(np.int64)
+    return counts
+
+
+def week_starts(dates):
+    """Map dates to the Monday of their week (NaT stays NaT)"""
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    # 1970-01-01 was a Thursday, three days after a Monday
+    monday = days - (days + 3) % 7
+    weeks = monday.astype("datetime64[D]")
+    weeks[np.isnat(dates)] = np.datetime64("NaT")
+    return weeks
+
+
+def weekly_counts(matrix):
+    """Return (weeks, counts) where counts[i, j] is reports of charge j in weeks[i]"""
+    size = matrix.catalog.size
+    weeks_all = week_starts(matrix.dates)
+    known = ~np.isnat(weeks_all)
+    weeks = np.unique(weeks_all[known])
+    counts = np.zeros((len(weeks), size), np.int64)
+    for start, block in matrix.blocks():
+        block_weeks = weeks_all[start:start + len(block)]
+        keep = ~np.isnat(block_weeks)
+        if not keep.any():
+            continue
+        rows = np.searchsorted(weeks, block_weeks[keep])
+        order = np.argsort(rows, kind="stable")
+        rows = rows[order]
+        values = block[keep][order].astype(np.int64)
+        # Sum each run of equal week rows in one reduceat call
+        bounds = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        counts[rows[bounds]] += np.add.reduceat(values, bounds, axis=0)
+    return weeks, counts
+
+
+def rollup_table(archive, period, date_from, date_to, report_type=None, nov=None):
+    """(header, rows) of report and charge counts per bucket from the rollups"""
+    if period == "hour":
+        start = report_time.to_epoch(date_from, "00:00")
+        end = report_time.to_epoch(date_to, "23:59")
+    else:
+        start, end = (int(report_time.parse(date, "00:00").strftime("%Y%m%d"))
+                      for date in (date_from, date_to))
+    size = archive.catalog.size
+    totals = {}
+    for row in archive.rollups(period, start, end, report_type, nov):
+        count, charges = totals.get(row.bucket, (0, np.zeros(size, np.int64)))
+        totals[row.bucket] = count + row.count, charges + row.charges
+    used = np.flatnonzero(sum((charges for _, charges in totals.values()),
+                              np.zeros(size, np.int64)))
+    labels = [c.label if c is not None else None for c in archive.catalog.by_ordinal]
+    header = [period, "reports"] + [labels[j] for j in used]
+    rows = []
+    for bucket, (count, charges) in sorted(totals.items()):
+        if period == "hour":
+            bucket = " ".join(report_time.display(bucket))
+        else:
+            bucket = f"{bucket % 100:02d}.{bucket // 100 % 100:02d}.{bucket // 10000}"
+        rows.append([bucket, count] + [int(v) for v in charges[used]])
+    return header, rows
+
+
+def write_table(header, rows, csv_path=None):
+    """Print rows as an aligned table, or write them to a CSV file"""
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        return
+    widths = [max(len(str(value)) for value in column) for column in zip(header, *rows)]
+    for row in [header] + rows:
+        print("  ".join(str(value).ljust(width) for value, width in zip(row, widths)).rstrip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Charge analytics over the report archive")
+    parser.add_argument("report",
+                        choices=["freq", "cooc", "weekly", "hourly", "daily", "rebuild-rollups"],
+                        help="freq: counts per charge, cooc: co-occurring pairs, "
+                             "weekly: counts per week, "
+                             "hourly/daily: counts per hour/day from the rollups, "
+                             "rebuild-rollups: recount the rollups from every report")
+    parser.add_argument("--archive", default=report_archive.DEFAULT_PATH,
+                        help=f"archive database (default: {report_archive.DEFAULT_PATH})")
+    parser.add_argument("--cache",
+                        help="matrix cache file, or '' to disable "
+                             "(default: next to the archive, e.g. reports.analytics.npz)")
+    parser.add_argument("--top", type=int, default=None, help="only show the top N rows")
+    parser.add_argument("--csv", help="write the table to this CSV file instead of printing it")
+    today = report_time.now_strings()[0]
+    parser.add_argument("--from", dest="date_from", default=today,
+                        help="hourly/daily: first date, DD.MM.YYYY (default: today)")
+    parser.add_argument("--to", dest="date_to", default=today,
+                        help="hourly/daily: last date, DD.MM.YYYY (default: today)")
+    parser.add_argument("--type", choices=report_renderer.REPORT_TYPES,
+                        help="hourly/daily: only this report type")
+    parser.add_argument("--nov", action=argparse.BooleanOptionalAction, default=None,
+                        help="hourly/daily: only NOV (--nov) or non-NOV (--no-nov) reports")
+    args = parser.parse_args(argv)
+
+    if args.report == "rebuild-rollups":
+        with report_archive.ReportArchive(args.archive) as archive:
+            print(f"Counted {archive.rebuild_rollups()} reports", file=sys.stderr)
+        return 0
+    if args.report in ("hourly", "daily"):
+        try:
+            with report_archive.ReportArchive(args.archive) as archive:
+                header, rows = rollup_table(archive, ROLLUP_PERIODS[args.report],
+                                            args.date_from, args.date_to, args.type, args.nov)
+        except report_time.InvalidTimestamp as e:
+            parser.error(str(e))
+        if args.top is not None:
+            rows = rows[:args.top]
+        write_table(header, rows, args.csv)
+        return 0
+
+    with report_archive.ReportArchive(args.archive) as archive:
+        cache_path = cache_path_for(args.archive) if args.cache is None else args.cache or None
+        matrix = load_matrix(archive, cache_path)
+    labels = matrix.labels
+
+    if args.report == "freq":
+        total, by_type = charge_frequencies(matrix)
+        order = np.argsort(-total, kind="stable")
+        header = ["charge", "total"] + list(report_renderer.REPORT_TYPES)
+        rows = [[labels[j], int(total[j])] + [int(v) for v in by_type[:, j]]
+                for j in order if labels[j] is not None and total[j]]
+    elif args.report == "cooc":
+        counts = cooccurrence(matrix)
+        first, second = np.triu_indices(len(counts), k=1)
+        pair_counts = counts[first, second]
+        order = np.argsort(-pair_counts, kind="stable")
+        header = ["charge", "with charge", "reports"]
+        rows = [[labels[first[i]], labels[second[i]], int(pair_counts[i])]
+                for i in order if pair_counts[i]]
+    else:
+        weeks, counts = weekly_counts(matrix)
+        used = np.flatnonzero(counts.sum(axis=0))
+        header = ["week"] + [labels[j] for j in used]
+        rows = [[str(week)] + [int(v) for v in counts[i, used]] for i, week in enumerate(weeks)]
+
+    if args.top is not None:
+        rows = rows[:args.top]
+    write_table(header, rows, args.csv)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
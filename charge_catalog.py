@@ -0,0 +1,142 @@
+"""Penal code charge catalog
+
+Charges are loaded once from charges.json (or the file named by the
+CRIME_REPORT_CATALOG environment variable) into an indexed structure:
+
+    {"version": 1, "charges": [
+        {"ordinal": 0, "code": "PC 3.1.6", "title": "Banditry", "top": true},
+        ...]}
+
+A charge is shown and stored as its label, "<code> <title>", exactly as
+the old hard-coded lists did. Ordinals are assigned once and never reused
+or reordered, so anything stored against them stays valid when charges
+are added to the file.
+
+A set of charges can be packed into a bitmask with one bit per ordinal
+(bit ``i % 8`` of byte ``i // 8``). Masks are ``width`` bytes long for the
+current catalog; shorter masks from an older, smaller catalog decode the
+same way.
+"""
+import json
+import os
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+DEFAULT_PATH = os.environ.get(
+    "CRIME_REPORT_CATALOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "charges.json"))
+
+Charge = namedtuple("Charge", "ordinal code title label top sort_key")
+
+_SECTION = re.compile(r"\d+")
+
+
+def section_key(code):
+    """Sort key from the numeric section of a code: "PC 2.10.6" -> (2, 10, 6)"""
+    return tuple(int(part) for part in _SECTION.findall(code))
+
+
+class ChargeCatalog:
+    """Indexed, ordered view of every known charge"""
+
+    def __init__(self, charges, version=1):
+        self.version = version
+        entries = []
+        for item in charges:
+            code = item["code"].strip()
+            title = item["title"].strip()
+            entries.append(Charge(int(item["ordinal"]), code, title, f"{code} {title}",
+                                  bool(item.get("top")), section_key(code)))
+        self.size = max((c.ordinal for c in entries), default=-1) + 1
+        self.width = (self.size + 7) // 8
+
+        # Lookups
+        self.by_label = {c.label: c for c in entries}
+        self.by_code = {c.code: c for c in entries}
+        self.by_ordinal = [None] * self.size
+        for c in entries:
+            self.by_ordinal[c.ordinal] = c
+
+        # Canonical order is by penal code section; top charges keep file order
+        self.entries = tuple(sorted(entries, key=lambda c: (c.sort_key, c.label)))
+        self.rank = {c.label: i for i, c in enumerate(self.entries)}
+        self.top = tuple(c.label for c in entries if c.top)
+        self.others = tuple(c.label for c in self.entries if not c.top)
+        self.labels = tuple(c.label for c in self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, label):
+        return label in self.by_label
+
+    def get(self, label):
+        """Return the Charge for a label, or None"""
+        return self.by_label.get(label)
+
+    def ordered(self, labels):
+        """Return labels deduplicated and in canonical penal code order
+
+        Labels not in the catalog are kept, after the known ones, in the
+        order given.
+        """
+        rank = self.rank
+        unique = dict.fromkeys(labels)
+        known = sorted((label for label in unique if label in rank), key=rank.__getitem__)
+        return known + [label for label in unique if label not in rank]
+
+    def mask_int(self, labels):
+        """Return the bitmask of known labels as an int, ignoring unknown ones"""
+        by_label = self.by_label
+        mask = 0
+        for label in labels:
+            charge = by_label.get(label)
+            if charge is not None:
+                mask |= 1 << charge.ordinal
+        return mask
+
+    def encode(self, labels):
+        """Pack labels into a fixed-width bitmask
+
+        Returns (mask_bytes, unknown) where unknown lists any labels that
+        are not in the catalog, in the order given.
+        """
+        unknown = [label for label in dict.fromkeys(labels) if label not in self.by_label]
+        return self.mask_int(labels).to_bytes(self.width, "little"), unknown
+
+    def decode(self, mask):
+        """Unpack a bitmask (bytes or int) into labels in canonical order"""
+        if not isinstance(mask, int):
+            mask = int.from_bytes(mask, "little")
+        by_ordinal = self.by_ordinal
+        charges = []
+        while mask:
+            low = mask & -mask
+            ordinal = low.bit_length() - 1
+            if ordinal < self.size and by_ordinal[ordinal] is not None:
+                charges.append(by_ordinal[ordinal])
+            mask ^= low
+        charges.sort(key=lambda c: self.rank[c.label])
+        return [c.label for c in charges]
+
+
+def mask_contains(mask, needle):
+    """True if every bit set in needle is also set in mask (both bytes)"""
+    if mask is None:
+        return False
+    wanted = int.from_bytes(needle, "little")
+    return int.from_bytes(mask, "little") & wanted == wanted
+
+
+def read_catalog(path):
+    """Load a ChargeCatalog from a JSON file"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return ChargeCatalog(data["charges"], data.get("version", 1))
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path=None):
+    """Return the shared catalog, reading the file on first use only"""
+    return read_catalog(path or DEFAULT_PATH)
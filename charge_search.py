@@ -0,0 +1,82 @@
+"""Filter-as-you-type search over charge codes and descriptions
+
+The index is built once per catalog: every label is lower-cased and its
+trigrams are mapped to the labels containing them. A query of three or
+more characters only checks the labels in its rarest trigram's posting
+list. Each search session also remembers its last result, and when the
+user keeps typing (the new query contains the old one) only those
+results are re-checked, so each keystroke narrows the previous result
+instead of starting over.
+"""
+from collections import defaultdict
+
+
+def normalize(text):
+    """Lower-case and collapse whitespace"""
+    return " ".join(text.lower().split())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ChargeSearchIndex:
+    """Substring index over a fixed list of labels"""
+
+    def __init__(self, labels):
+        self.labels = tuple(labels)
+        self.haystack = tuple(normalize(label) for label in self.labels)
+        postings = defaultdict(list)
+        for i, text in enumerate(self.haystack):
+            for gram in trigrams(text):
+                postings[gram].append(i)
+        self.postings = {gram: tuple(ids) for gram, ids in postings.items()}
+        self.everything = tuple(range(len(self.labels)))
+
+    def candidates(self, query):
+        """Indices that may contain query (query already normalized)"""
+        if len(query) < 3:
+            return self.everything
+        lists = []
+        for gram in trigrams(query):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return ()
+            lists.append(ids)
+        return min(lists, key=len)
+
+    def search(self, query, within=None):
+        """Return indices of labels containing query, in label order"""
+        query = normalize(query)
+        if not query:
+            return self.everything
+        haystack = self.haystack
+        ids = self.candidates(query) if within is None else within
+        return tuple(i for i in ids if query in haystack[i])
+
+    def session(self):
+        return SearchSession(self)
+
+
+class SearchSession:
+    """Per-widget search state that narrows results as the query grows"""
+
+    def __init__(self, index):
+        self.index = index
+        self.query = ""
+        self.results = index.everything
+
+    def search(self, query):
+        """Return matching label indices, reusing the previous result if possible"""
+        query = normalize(query)
+        if query == self.query:
+            return self.results
+        within = self.results if self.query and self.query in query else None
+        self.results = self.index.search(query, within)
+        self.query = query
+        return self.results
+
+    def labels(self, query):
+        """Return matching labels, in label order"""
+        labels = self.index.labels
+        return [labels[i] for i in self.search(query)]
@@ -0,0 +1,92 @@
+"""Related-charge suggestions
+
+Suggests the charges most often filed together with the ones already
+selected. The charge co-occurrence matrix is computed once from the
+archive (see charge_analytics) and then kept up to date in memory as new
+reports are saved, so no query touches the database.
+
+Results are memoized per selection and the memo is dropped whenever a
+new report is observed, so repeated lookups for the same selection (for
+example on every Streamlit rerun) are a single dict lookup. The memo
+holds at most MEMO_SIZE selections, least recently used dropped first.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import charge_analytics
+
+MEMO_SIZE = 1024
+
+
+class ChargeSuggester:
+    """Top-k related charges from co-occurrence counts"""
+
+    def __init__(self, catalog, counts=None):
+        self.catalog = catalog
+        size = catalog.size
+        if counts is None:
+            counts = np.zeros((size, size), np.int64)
+        self.counts = counts
+        self.lock = threading.Lock()
+        self._memo = OrderedDict()
+
+    @classmethod
+    def from_archive(cls, archive, cache_path=None):
+        """Build a suggester from every report in the archive
+
+        The matrix cache defaults to the one next to the archive (see
+        charge_analytics.cache_path_for).
+        """
+        if cache_path is None:
+            cache_path = charge_analytics.cache_path_for(archive.path)
+        matrix = charge_analytics.load_matrix(archive, cache_path)
+        return cls(archive.catalog, charge_analytics.cooccurrence(matrix))
+
+    def _ordinals(self, labels):
+        by_label = self.catalog.by_label
+        return sorted({by_label[label].ordinal for label in labels if label in by_label})
+
+    def observe(self, crimes):
+        """Add one newly saved report's charges to the counts"""
+        ordinals = self._ordinals(crimes)
+        if not ordinals:
+            return
+        index = np.array(ordinals)
+        with self.lock:
+            self.counts[np.ix_(index, index)] += 1
+            self._memo = OrderedDict()
+
+    def suggest(self, selected, k=5):
+        """Return up to k (label, score) pairs related to the selected labels
+
+        A charge's score is the number of reports filing it with each
+        selected charge, summed over the selection. Charges that are
+        already selected, or never seen with them, are left out.
+        """
+        ordinals = tuple(self._ordinals(selected))
+        if not ordinals:
+            return []
+        key = (ordinals, k)
+        with self.lock:
+            # observe() replaces the memo, so a result computed from older
+            # counts is stored only in the memo it was computed for
+            memo = self._memo
+            result = memo.get(key)
+            if result is not None:
+                memo.move_to_end(key)
+                return result
+            scores = self.counts[list(ordinals)].sum(axis=0)
+        scores[list(ordinals)] = 0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        by_ordinal = self.catalog.by_ordinal
+        ranked = sorted(candidates, key=lambda i: (-scores[i], self.catalog.rank[by_ordinal[i].label]))
+        result = [(by_ordinal[i].label, int(scores[i])) for i in ranked]
+        with self.lock:
+            memo[key] = result
+            if len(memo) > MEMO_SIZE:
+                memo.popitem(last=False)
+        return result
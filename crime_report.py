@@ -1,51 +1,95 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
-from datetime import datetime
-import pytz
-import json
 import os
+import time
 import pyperclip
 
+import charge_catalog
+import charge_search
+import charge_suggest
+import draft_journal
+import evidence_links
+import metrics
+import plate_index
+import report_archive
+import report_delivery
+import report_renderer
+import report_time
+import report_writer
+
+# How often pending background saves are checked, in ms
+WRITER_POLL_MS = 100
+
+# Form changes are written to the draft journal at most this often, in ms
+DRAFT_DEBOUNCE_MS = 500
+
+# How often a running evidence link check is polled, in ms
+LINK_POLL_MS = 100
+
+# The live preview is refreshed at most this often while typing, in ms
+PREVIEW_DEBOUNCE_MS = 150
+
+# The report search runs once typing pauses for this long, in ms
+SEARCH_DEBOUNCE_MS = 150
+
 class CrimeReportApp:
     def __init__(self, root):
         self.root = root
         self.root.title("UK Crime Reporting System")
         self.root.geometry("1000x750")
         
-        # UK Timezone
-        self.uk_tz = pytz.timezone('Europe/London')
-        
-        # Crime lists
-        self.TOP_CHARGES = [
-            "PC 3.1.6 Banditry",
-            "PC 2.10.6 Robbery",
-            "PC 2.8.3 Taking a hostage",
-            "PC 2.5.6 Brandishing of a weapon",
-            "PC 3.4.2 Trespassing in a State Facility",
-            "PC 3.11 Murder or Attempted murder of a public servant"
-        ]
-        
-        self.ALL_CHARGES = [
-            "PC 2.2.4 Cultivation of cannabis (small quantities)",
-            "PC 2.2.5 Cultivation of cannabis (large quantities)",
-            "PC 2.5.3 Open Carrying",
-            "PC 2.5.8 Discharging a weapon in a public place",
-            "PC 2.8.1 Abduction",
-            "PC 2.8.2 Kidnapping",
-            "PC 2.8.4 Human Trafficking",
-            "PC 2.13.3 Vandalism",
-            "PC 3.1.1 Participation in terrorism",
-            "PC 3.1.4 Committing a terrorist act",
-            "PC 3.1.5 Creation of a stable armed group",
-            "PC 3.8.2 Impersonating a law enforcement officer",
-            "PC 3.10 Battery of a public servant",
-            "PC 3.20 Participation in a cyber attack of the state's resources"
-        ]
+        # Crime lists come from the shared charge catalog
+        self.catalog = charge_catalog.load_catalog()
+        self.TOP_CHARGES = self.catalog.top
+        self.ALL_CHARGES = self.catalog.others
+        self.search_index = charge_search.ChargeSearchIndex(self.catalog.labels)
         
         # Combine all crimes
         self.all_crimes = self.TOP_CHARGES + self.ALL_CHARGES
         
+        # Every saved report is also appended to the indexed archive
+        self.archive = report_archive.ReportArchive()
+        
+        # Related-charge suggestions, kept current as reports are saved
+        self.suggester = charge_suggest.ChargeSuggester.from_archive(self.archive)
+        
+        # Files are written and archived off the main thread so the window
+        # never freezes on a slow disk; CRIME_REPORT_FSYNC=1 makes them durable
+        self.writer = report_writer.ReportWriter(
+            self.archive, fsync=os.environ.get("CRIME_REPORT_FSYNC") == "1")
+        self.polling_writer = False
+        self.saving_drafts = {}     # filename -> form values of the report being saved
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Unsaved form contents survive a crash in the draft journal
+        self.draft = draft_journal.DraftJournal(draft_journal.draft_path("tk"))
+        self.draft_paused = True
+        self.draft_flush_scheduled = False
+        
+        # Evidence links are checked on a background event loop, started on first use
+        self.link_checker = None
+        
+        # The crimes selection window is built on first open, then hidden and reused
+        self.selection_window = None
+        
+        # So is the report search window
+        self.report_search_window = None
+        self.report_search_scheduled = False
+        
+        # The output box previews the report as the form is filled in
+        self.preview = report_renderer.ReportPreview()
+        self.preview_scheduled = False
+        
+        # Reports can be posted to the channel webhook when CRIME_REPORT_WEBHOOK is set
+        self.delivery = report_delivery.from_environment()
+        
         self.setup_ui()
+        self.restore_draft()
+        for var in (self.report_type, self.name_var, self.crime_var, self.date_var, self.time_var):
+            var.trace_add("write", self.note_draft)
+            var.trace_add("write", self.schedule_preview)
+        self.draft_paused = False
+        self.refresh_preview()
     
     def setup_ui(self):
         # Main container
@@ -123,6 +167,10 @@ class CrimeReportApp:
         self.selected_crimes_text.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.selected_crimes_text.config(state='disabled')
         
+        # Suggested charges, filled in as crimes are selected
+        self.suggest_frame = ttk.Frame(crimes_frame)
+        self.suggest_frame.pack(fill=tk.X, pady=(0, 10))
+        
         # Open crimes selection button
         ttk.Button(crimes_frame, text="📋 Open Crimes Selection", 
                   command=self.open_crimes_selection, width=20).pack()
@@ -134,8 +182,8 @@ class CrimeReportApp:
         self.special_frame = ttk.LabelFrame(main_frame, text="Evidence Links", padding="10")
         self.special_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=10, padx=5)
         
-        # Initialize special fields
-        self.create_gang_fields()
+        # Both evidence forms are built once and swapped on a type change
+        self.build_evidence_forms()
         
         # Buttons Frame
         buttons_frame = ttk.Frame(main_frame)
@@ -149,6 +197,13 @@ class CrimeReportApp:
                   command=self.copy_part2).pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="💾 Save to File", 
                   command=self.save_to_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="🔗 Check Links", 
+                  command=self.check_links).pack(side=tk.LEFT, padx=5)
+        if self.delivery is not None:
+            ttk.Button(buttons_frame, text="📤 Send to Channel", 
+                      command=self.send_report).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="🔎 Search Reports", 
+                  command=self.open_report_search).pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="🔄 Clear All", 
                   command=self.clear_all).pack(side=tk.LEFT, padx=5)
         
@@ -170,84 +225,103 @@ class CrimeReportApp:
         self.status_var = tk.StringVar(value="Ready")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
         status_bar.grid(row=7, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        # F12 writes the operation timings to a file for debugging
+        self.root.bind("<F12>", lambda event: self.dump_metrics())
     
     def set_current_datetime(self):
         """Set current UK date and time"""
-        uk_now = datetime.now(self.uk_tz)
-        self.date_var.set(uk_now.strftime("%d.%m.%Y"))
-        self.time_var.set(uk_now.strftime("%H:%M"))
+        date, time = report_time.now_strings()
+        self.date_var.set(date)
+        self.time_var.set(time)
     
     def set_current_date(self):
         """Set current UK date"""
-        uk_now = datetime.now(self.uk_tz)
-        self.date_var.set(uk_now.strftime("%d.%m.%Y"))
+        self.date_var.set(report_time.now_strings()[0])
     
     def set_current_time(self):
         """Set current UK time"""
-        uk_now = datetime.now(self.uk_tz)
-        self.time_var.set(uk_now.strftime("%H:%M"))
+        self.time_var.set(report_time.now_strings()[1])
+    
+    def build_evidence_forms(self):
+        """Create the evidence form of every report type, all but one hidden"""
+        self.evidence_forms = {}
+        self.evidence_vars = {}
+        self.evidence_labels = {}
+        for report_type, fields in report_renderer.FIELDS.items():
+            frame = ttk.Frame(self.special_frame)
+            frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
+            frame.grid_remove()
+            special_vars, special_labels = self.create_special_fields(frame, fields)
+            self.evidence_forms[report_type] = (frame, special_vars, special_labels)
+            self.evidence_vars.update(special_vars)
+            self.evidence_labels.update(special_labels)
+        self.shown_form = None
+        self.update_fields()
     
     def update_fields(self):
-        """Update fields based on report type"""
-        # Clear previous special fields
-        for widget in self.special_frame.winfo_children():
-            widget.destroy()
-        
-        # Update title
-        self.special_frame.config(text=f"{self.report_type.get()} - Evidence Links")
-        
-        # Create appropriate fields
-        if self.report_type.get() == "Gang":
-            self.create_gang_fields()
-        else:
-            self.create_family_fields()
-    
-    def create_gang_fields(self):
-        """Create fields specific to Gang reports"""
-        fields = [
-            ("Proof of bodycam / refresh / upload:", "gang_bodycam_proof"),
-            ("Bodycam Footage:", "gang_bodycam_footage"),
-            ("Bodycam Footage of interrogation:", "gang_interrogation"),
-            ("Culprit Identification Proof:", "gang_culprit_id"),
-            ("License plates:", "gang_license_plates")
-        ]
-        
-        self.create_special_fields(fields)
-    
-    def create_family_fields(self):
-        """Create fields specific to Family reports"""
-        fields = [
-            ("Proof of bodycam / refresh / upload:", "family_bodycam_proof"),
-            ("Bodycam Footage:", "family_bodycam_footage"),
-            ("Culprit Identification Proof:", "family_culprit_id"),
-            ("Bodycam Footage of interrogation:", "family_interrogation"),
-            ("License plates:", "family_license_plates"),
-            ("License plates searched in PDA:", "family_pda_search"),
-            ("Owner of the car searched in PDA:", "family_car_owner")
-        ]
-        
-        self.create_special_fields(fields)
-    
-    def create_special_fields(self, fields):
-        """Create labeled entry fields"""
-        self.special_vars = {}
+        """Show the evidence form for the report type; typed values are kept"""
+        with metrics.timed("tk", "switch_type"):
+            report_type = self.report_type.get()
+            form_type = report_type if report_type in self.evidence_forms else "Family"
+            if form_type != self.shown_form:
+                if self.shown_form is not None:
+                    self.evidence_forms[self.shown_form][0].grid_remove()
+                frame, self.special_vars, self.special_labels = self.evidence_forms[form_type]
+                frame.grid()
+                self.shown_form = form_type
+            
+            # Update title
+            self.special_frame.config(text=f"{report_type} - Evidence Links")
+    
+    def create_special_fields(self, parent, fields):
+        """Create labeled entry fields; returns their variables and labels by key"""
+        special_vars = {}
+        special_labels = {}
         
         for i, (label, var_name) in enumerate(fields):
-            # Label
-            ttk.Label(self.special_frame, text=label, font=('Arial', 9, 'bold')).grid(
-                row=i, column=0, sticky=tk.W, pady=5)
+            # Label, turned red when a link in the field is dead
+            special_labels[var_name] = ttk.Label(parent, text=label, font=('Arial', 9, 'bold'))
+            special_labels[var_name].grid(row=i, column=0, sticky=tk.W, pady=5)
             
             # Create variable and entry
-            self.special_vars[var_name] = tk.StringVar()
-            entry = ttk.Entry(self.special_frame, textvariable=self.special_vars[var_name], 
-                             width=70)
+            special_vars[var_name] = tk.StringVar()
+            special_vars[var_name].trace_add("write", self.note_draft)
+            special_vars[var_name].trace_add("write", self.schedule_preview)
+            if var_name in plate_index.PLATE_FIELDS:
+                # Archived plates that complete the one being typed are in the drop-down
+                entry = ttk.Combobox(parent, textvariable=special_vars[var_name], width=68)
+                special_vars[var_name].trace_add(
+                    "write", lambda *args, var=special_vars[var_name], box=entry:
+                    self.suggest_plates(var, box))
+            else:
+                entry = ttk.Entry(parent, textvariable=special_vars[var_name], width=70)
             entry.grid(row=i, column=1, padx=(5, 0), pady=5, sticky=tk.W)
             
             # Add paste button
-            btn_frame = ttk.Frame(self.special_frame)
+            btn_frame = ttk.Frame(parent)
             btn_frame.grid(row=i, column=2, padx=(5, 0), sticky=tk.W)
             ttk.Button(btn_frame, text="Paste", width=8,
                       command=lambda v=var_name: self.paste_link(v)).pack(side=tk.LEFT)
+        
+        return special_vars, special_labels
+    
+    def suggest_plates(self, var, box):
+        """Offer known plates for the last plate in a field; say where it was seen"""
+        if self.draft_paused:
+            return
+        head, last = plate_index.split_last(var.get())
+        typed = last.strip()
+        spacing = last[:len(last) - len(last.lstrip())]
+        box.configure(values=[head + spacing + plate
+                              for plate in self.archive.suggest_plates(typed)] if typed else [])
+        
+        plate = plate_index.normalize_plate(typed)
+        seen = self.archive.plate_report_ids(plate) if plate else []
+        if seen:
+            owners = self.archive.plate_owners(plate)
+            self.status_var.set(f"{plate} is named in {len(seen)} archived report(s)" +
+                                (f", owner: {', '.join(owners)}" if owners else ""))
     
     def paste_link(self, field_name):
         """Paste link from clipboard"""
@@ -265,14 +339,38 @@ class CrimeReportApp:
                 pass
     
     def open_crimes_selection(self):
-        """Open a new window for selecting crimes"""
-        selection_window = tk.Toplevel(self.root)
+        """Show the crimes selection window, building it the first time"""
+        with metrics.timed("tk", "selection_open"):
+            if self.selection_window is None or not self.selection_window.winfo_exists():
+                self.build_crimes_selection()
+            else:
+                # Start from the current selection with an empty search box
+                self.search_session = self.search_index.session()
+                self.pending_crimes = set(self.selected_crimes_list)
+                if self.search_var.get():
+                    self.search_var.set("")    # the trace refills both lists
+                else:
+                    self.preselect_crimes()
+                self.top_listbox.yview_moveto(0)
+                self.all_listbox.yview_moveto(0)
+                self.selection_window.deiconify()
+            
+            # Make modal
+            self.selection_window.grab_set()
+            self.search_entry.focus_set()
+    
+    def hide_crimes_selection(self):
+        """Hide the selection window for reuse; unsaved picks are dropped on the next open"""
+        self.selection_window.grab_release()
+        self.selection_window.withdraw()
+    
+    def build_crimes_selection(self):
+        """Create the crimes selection window and its two lists"""
+        selection_window = self.selection_window = tk.Toplevel(self.root)
         selection_window.title("Select Crimes")
         selection_window.geometry("600x500")
-        
-        # Make modal
         selection_window.transient(self.root)
-        selection_window.grab_set()
+        selection_window.protocol("WM_DELETE_WINDOW", self.hide_crimes_selection)
         
         # Main frame
         main_frame = ttk.Frame(selection_window, padding="10")
@@ -282,6 +380,20 @@ class CrimeReportApp:
         ttk.Label(main_frame, text="Select Crimes (Ctrl+Click for multiple)", 
                  font=('Arial', 12, 'bold')).pack(pady=(0, 10))
         
+        # Search box - narrows both lists on every keystroke
+        search_frame = ttk.Frame(main_frame)
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=(0, 5))
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Selection is tracked by label so it survives filtering
+        self.search_session = self.search_index.session()
+        self.pending_crimes = set(self.selected_crimes_list)
+        self.top_visible = list(self.TOP_CHARGES)
+        self.all_visible = list(self.ALL_CHARGES)
+        
         # Create notebook for tabs
         notebook = ttk.Notebook(main_frame)
         notebook.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -290,18 +402,19 @@ class CrimeReportApp:
         top_frame = ttk.Frame(notebook)
         notebook.add(top_frame, text="Top Charges")
         
-        # Listbox for TOP CHARGES
+        # Listbox for TOP CHARGES, filled through a list variable in one call
         top_scrollbar = ttk.Scrollbar(top_frame)
         top_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        self.top_items = tk.Variable(value=self.top_visible)
         self.top_listbox = tk.Listbox(top_frame, selectmode=tk.MULTIPLE, 
+                                     listvariable=self.top_items, exportselection=False,
                                      yscrollcommand=top_scrollbar.set, 
                                      height=15, font=('Arial', 10))
         self.top_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
         top_scrollbar.config(command=self.top_listbox.yview)
-        
-        for crime in self.TOP_CHARGES:
-            self.top_listbox.insert(tk.END, crime)
+        self.top_listbox.bind("<<ListboxSelect>>",
+                              lambda e: self.sync_selection(self.top_listbox, self.top_visible))
         
         # ALL CHARGES tab
         all_frame = ttk.Frame(notebook)
@@ -311,17 +424,19 @@ class CrimeReportApp:
         all_scrollbar = ttk.Scrollbar(all_frame)
         all_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        self.all_items = tk.Variable(value=self.all_visible)
         self.all_listbox = tk.Listbox(all_frame, selectmode=tk.MULTIPLE, 
+                                     listvariable=self.all_items, exportselection=False,
                                      yscrollcommand=all_scrollbar.set, 
                                      height=15, font=('Arial', 10))
         self.all_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
         all_scrollbar.config(command=self.all_listbox.yview)
-        
-        for crime in self.ALL_CHARGES:
-            self.all_listbox.insert(tk.END, crime)
+        self.all_listbox.bind("<<ListboxSelect>>",
+                              lambda e: self.sync_selection(self.all_listbox, self.all_visible))
         
         # Pre-select already selected crimes
         self.preselect_crimes()
+        self.search_var.trace_add("write", lambda *args: self.filter_crimes())
         
         # Buttons frame
         buttons_frame = ttk.Frame(main_frame)
@@ -332,41 +447,65 @@ class CrimeReportApp:
         ttk.Button(buttons_frame, text="Clear All", 
                   command=self.clear_selection).pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Done", 
-                  command=lambda: self.save_selection(selection_window)).pack(side=tk.LEFT, padx=5)
+                  command=self.save_selection).pack(side=tk.LEFT, padx=5)
+    
+    def filter_crimes(self):
+        """Show only the charges matching the search box"""
+        matches = self.search_session.labels(self.search_var.get())
+        by_label = self.catalog.by_label
+        self.all_visible[:] = [c for c in matches if not by_label[c].top]
+        matched = set(matches)
+        self.top_visible[:] = [c for c in self.TOP_CHARGES if c in matched]
+        
+        self.top_items.set(self.top_visible)
+        self.all_items.set(self.all_visible)
+        self.preselect_crimes()
+    
+    def sync_selection(self, listbox, visible):
+        """Record clicks in a listbox against the visible charges"""
+        chosen = set(listbox.curselection())
+        for i, crime in enumerate(visible):
+            if i in chosen:
+                self.pending_crimes.add(crime)
+            else:
+                self.pending_crimes.discard(crime)
     
     def preselect_crimes(self):
         """Preselect already selected crimes"""
-        for i, crime in enumerate(self.TOP_CHARGES):
-            if crime in self.selected_crimes_list:
+        self.top_listbox.selection_clear(0, tk.END)
+        self.all_listbox.selection_clear(0, tk.END)
+        
+        for i, crime in enumerate(self.top_visible):
+            if crime in self.pending_crimes:
                 self.top_listbox.selection_set(i)
         
-        for i, crime in enumerate(self.ALL_CHARGES):
-            if crime in self.selected_crimes_list:
+        for i, crime in enumerate(self.all_visible):
+            if crime in self.pending_crimes:
                 self.all_listbox.selection_set(i)
     
     def select_all_crimes(self):
-        """Select all crimes in both lists"""
+        """Select all crimes shown in both lists"""
+        self.pending_crimes.update(self.top_visible)
+        self.pending_crimes.update(self.all_visible)
         self.top_listbox.selection_set(0, tk.END)
         self.all_listbox.selection_set(0, tk.END)
     
     def clear_selection(self):
         """Clear all selections"""
+        self.pending_crimes.clear()
         self.top_listbox.selection_clear(0, tk.END)
         self.all_listbox.selection_clear(0, tk.END)
     
-    def save_selection(self, window):
-        """Save selected crimes and close window"""
-        # Get selected crimes from both lists
-        selected_top = [self.top_listbox.get(i) for i in self.top_listbox.curselection()]
-        selected_all = [self.all_listbox.get(i) for i in self.all_listbox.curselection()]
-        
-        # Combine and deduplicate
-        self.selected_crimes_list = list(set(selected_top + selected_all))
-        
-        # Update display
-        self.update_selected_crimes_display()
-        
-        window.destroy()
+    def save_selection(self):
+        """Save selected crimes and hide the window"""
+        with metrics.timed("tk", "selection_save"):
+            # Put the selection in penal code order
+            self.selected_crimes_list = self.catalog.ordered(self.pending_crimes)
+            
+            # Update display
+            self.update_selected_crimes_display()
+            
+            self.hide_crimes_selection()
     
     def update_selected_crimes_display(self):
         """Update the selected crimes display"""
@@ -380,6 +519,28 @@ class CrimeReportApp:
             self.selected_crimes_text.insert(tk.END, "No crimes selected")
         
         self.selected_crimes_text.config(state='disabled')
+        self.update_suggestions()
+        self.note_draft()
+        self.schedule_preview()
+    
+    def update_suggestions(self):
+        """Show charges often filed with the current selection"""
+        for widget in self.suggest_frame.winfo_children():
+            widget.destroy()
+        
+        suggestions = self.suggester.suggest(self.selected_crimes_list, k=4)
+        if not suggestions:
+            return
+        
+        ttk.Label(self.suggest_frame, text="Often filed with these:").pack(side=tk.LEFT, padx=(0, 10))
+        for crime, _ in suggestions:
+            ttk.Button(self.suggest_frame, text=f"+ {crime}",
+                      command=lambda c=crime: self.add_suggested_crime(c)).pack(side=tk.LEFT, padx=2)
+    
+    def add_suggested_crime(self, crime):
+        """Add a suggested charge to the selection"""
+        self.selected_crimes_list = self.catalog.ordered(self.selected_crimes_list + [crime])
+        self.update_selected_crimes_display()
     
     def generate_report(self):
         """Generate the formatted report"""
@@ -399,77 +560,162 @@ class CrimeReportApp:
             date = self.date_var.get()
             time = self.time_var.get()
         
-        # Create PART 1: Header with Name instead of Report Type
-        part1 = f"{name} | {crime_type} | {date} | {time}\n\n"
-        
-        # Create PART 2: Body
-        part2 = f"{self.report_type.get()} Name: {name}\n\n"
-        part2 += "=" * 50 + "\n"
-        
-        # Get fields based on report type
-        if self.report_type.get() == "Gang":
-            fields = [
-                ("Proof of bodycam / refresh / upload:", "gang_bodycam_proof"),
-                ("Bodycam Footage:", "gang_bodycam_footage"),
-                ("Bodycam Footage of interrogation:", "gang_interrogation"),
-                ("Culprit Identification Proof:", "gang_culprit_id"),
-                ("License plates:", "gang_license_plates")
-            ]
-        else:
-            fields = [
-                ("Proof of bodycam / refresh / upload:", "family_bodycam_proof"),
-                ("Bodycam Footage:", "family_bodycam_footage"),
-                ("Culprit Identification Proof:", "family_culprit_id"),
-                ("Bodycam Footage of interrogation:", "family_interrogation"),
-                ("License plates:", "family_license_plates"),
-                ("License plates searched in PDA:", "family_pda_search"),
-                ("Owner of the car searched in PDA:", "family_car_owner")
-            ]
-        
-        # Add evidence fields - N/A on same line, links on next line
-        for label, var_name in fields:
-            value = self.special_vars[var_name].get().strip()
-            if value:  # If there's a link
-                part2 += f"{label}\n{value}\n"
-            else:  # If empty, show N/A on same line
-                part2 += f"{label} N/A\n"
-            part2 += "=" * 50 + "\n"
-        
-        # Add Crimes Committed with dash format
-        part2 += "Crimes Committed "
-        part2 += "(Mandatory):\n" if self.report_type.get() == "Gang" else ":\n"
-        
-        if self.selected_crimes_list:
-            for crime in self.selected_crimes_list:
-                part2 += f"- {crime}\n"
-        else:
-            part2 += "N/A\n"
-        
-        part2 += "=" * 50 + "\n"
-        
-        # Combine full report
-        full_report = part1 + part2
+        # Checked once here; the report keeps the UTC epoch next to the strings
+        try:
+            epoch = report_time.to_epoch(date, time)
+        except report_time.InvalidTimestamp as e:
+            messagebox.showwarning("Invalid Date/Time", str(e))
+            return
         
-        # Display in output
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.insert(1.0, full_report)
+        with metrics.timed("tk", "generate"):
+            report_data = {
+                "type": self.report_type.get(),
+                "name": name,
+                "crime": crime_type,
+                "date": date,
+                "time": time,
+                "epoch": epoch,
+                "crimes": self.selected_crimes_list,
+                "fields": {var: self.special_vars[var].get().strip() for var in self.special_vars}
+            }
+            
+            # PART 1 is the header line, PART 2 the evidence body
+            part1, part2 = report_renderer.render(report_data)
+            full_report = part1 + part2
+            
+            # Display in output
+            self.output_text.delete(1.0, tk.END)
+            self.output_text.insert(1.0, full_report)
         
         # Store for clipboard/file
         self.current_report = full_report
         self.part1 = part1
         self.part2 = part2
-        self.report_data = {
-            "type": self.report_type.get(),
-            "name": name,
-            "crime": crime_type,
-            "date": date,
-            "time": time,
-            "crimes": self.selected_crimes_list,
-            "fields": {var: self.special_vars[var].get().strip() for var in self.special_vars}
-        }
+        self.report_data = report_data
+        self.report_draft = self.draft_values()
         
         # Update status
         self.status_var.set(f"Report generated!")
+        
+        # Flag dead evidence links before the report is handed in
+        self.check_links()
+    
+    def open_report_search(self):
+        """Show the report search window, building it the first time"""
+        if self.report_search_window is None or not self.report_search_window.winfo_exists():
+            self.build_report_search()
+        else:
+            self.report_search_window.deiconify()
+        self.report_search_entry.focus_set()
+    
+    def build_report_search(self):
+        """Create the window that finds archived reports by name or crime type"""
+        window = self.report_search_window = tk.Toplevel(self.root)
+        window.title("Search Reports")
+        window.geometry("600x500")
+        window.transient(self.root)
+        window.protocol("WM_DELETE_WINDOW", window.withdraw)
+        
+        main_frame = ttk.Frame(window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(main_frame, text="Name or crime type (spelling need not be exact)", 
+                 font=('Arial', 12, 'bold')).pack(pady=(0, 10))
+        
+        # Matches are ranked once typing pauses
+        self.report_search_var = tk.StringVar()
+        self.report_search_entry = ttk.Entry(main_frame, textvariable=self.report_search_var)
+        self.report_search_entry.pack(fill=tk.X)
+        self.report_search_var.trace_add("write", self.schedule_report_search)
+        
+        # Names first, then crime types
+        self.search_matches = []
+        self.match_items = tk.Variable(value=[])
+        self.match_listbox = tk.Listbox(main_frame, listvariable=self.match_items,
+                                        exportselection=False, height=10, font=('Arial', 10))
+        self.match_listbox.pack(fill=tk.X, pady=5)
+        self.match_listbox.bind("<<ListboxSelect>>", lambda e: self.show_search_reports())
+        
+        # The newest reports of the chosen match
+        self.search_reports_text = scrolledtext.ScrolledText(main_frame, height=12,
+                                                             font=('Courier', 9), state='disabled')
+        self.search_reports_text.pack(fill=tk.BOTH, expand=True)
+    
+    def schedule_report_search(self, *args):
+        """Run the search once the debounce window ends"""
+        if not self.report_search_scheduled:
+            self.report_search_scheduled = True
+            self.root.after(SEARCH_DEBOUNCE_MS, self.run_report_search)
+    
+    def run_report_search(self):
+        """List the archived names and crime types most like the search box"""
+        self.report_search_scheduled = False
+        query = self.report_search_var.get().strip()
+        with metrics.timed("tk", "report_search"):
+            names = self.archive.search_names(query) if query else []
+            crimes = self.archive.search_crimes(query, limit=5) if query else []
+        self.search_matches = [("name", match) for match in names] + \
+                              [("crime", match) for match in crimes]
+        self.match_items.set([
+            f"{'Name' if kind == 'name' else 'Crime'}: {match.text}  "
+            f"({match.reports} reports, {match.similarity:.0%} match)"
+            for kind, match in self.search_matches])
+        self.match_listbox.selection_clear(0, tk.END)
+        self.show_search_reports()
+    
+    def show_search_reports(self):
+        """Show the newest reports filed under the selected name or crime type"""
+        lines = []
+        selection = self.match_listbox.curselection()
+        if selection:
+            kind, match = self.search_matches[selection[0]]
+            find = self.archive.find_name if kind == "name" else self.archive.find_crime
+            for report in find(match.text, limit=50):
+                lines.append(f"{report.get('date', '')} {report.get('time', '')}  "
+                             f"{report.get('type', '')}  {report.get('name', '')} | "
+                             f"{report.get('crime', '')}")
+        self.search_reports_text.config(state='normal')
+        self.search_reports_text.delete(1.0, tk.END)
+        self.search_reports_text.insert(tk.END, "\n".join(lines))
+        self.search_reports_text.config(state='disabled')
+    
+    def preview_record(self):
+        """The form as a report record, the way generate_report builds it"""
+        return {
+            "type": self.report_type.get(),
+            "name": self.name_var.get().strip(),
+            "crime": self.crime_var.get().strip(),
+            "date": self.date_var.get().strip(),
+            "time": self.time_var.get().strip(),
+            "crimes": self.selected_crimes_list,
+            "fields": {var: self.special_vars[var].get() for var in self.special_vars}
+        }
+    
+    def schedule_preview(self, *args):
+        """Refresh the preview once the debounce window ends"""
+        if not self.preview_scheduled:
+            self.preview_scheduled = True
+            self.root.after(PREVIEW_DEBOUNCE_MS, self.refresh_preview)
+    
+    def refresh_preview(self):
+        """Re-render the changed sections and splice them into the output box"""
+        self.preview_scheduled = False
+        with metrics.timed("tk", "preview"):
+            changed = self.preview.update(self.preview_record())
+            text = self.output_text
+            # Each section is tagged, so a section is replaced in place;
+            # after Generate or a hand edit the tags are gone and the
+            # whole preview is redrawn
+            if changed is None or any(len(text.tag_ranges(f"section{i}")) != 2
+                                      for i in range(len(self.preview.sections))):
+                text.delete(1.0, tk.END)
+                for i, section in enumerate(self.preview.sections):
+                    text.insert(tk.END, section, f"section{i}")
+                return
+            for i in changed:
+                start, end = text.tag_ranges(f"section{i}")
+                text.delete(start, end)
+                text.insert(start, self.preview.sections[i], f"section{i}")
     
     def copy_part1(self):
         """Copy Part 1 to clipboard"""
@@ -477,6 +723,7 @@ class CrimeReportApp:
             messagebox.showwarning("No Report", "Please generate a report first")
             return
         
+        began = time.perf_counter()
         try:
             self.root.clipboard_clear()
             self.root.clipboard_append(self.part1.strip())  # Remove extra newline
@@ -486,8 +733,14 @@ class CrimeReportApp:
                 import pyperclip
                 pyperclip.copy(self.part1.strip())
                 self.status_var.set("Part 1 copied to clipboard")
+                metrics.CLIPBOARD_FALLBACKS.labels("part1", "copied").inc()
             except:
+                metrics.CLIPBOARD_FALLBACKS.labels("part1", "failed").inc()
+                metrics.OPERATION_ERRORS.labels("tk", "copy").inc()
+                metrics.observe("tk", "copy", time.perf_counter() - began)
                 messagebox.showerror("Copy Failed", "Could not copy to clipboard")
+                return
+        metrics.observe("tk", "copy", time.perf_counter() - began)
     
     def copy_part2(self):
         """Copy Part 2 to clipboard"""
@@ -495,6 +748,7 @@ class CrimeReportApp:
             messagebox.showwarning("No Report", "Please generate a report first")
             return
         
+        began = time.perf_counter()
         try:
             self.root.clipboard_clear()
             self.root.clipboard_append(self.part2.strip())
@@ -504,8 +758,33 @@ class CrimeReportApp:
                 import pyperclip
                 pyperclip.copy(self.part2.strip())
                 self.status_var.set("Part 2 copied to clipboard")
+                metrics.CLIPBOARD_FALLBACKS.labels("part2", "copied").inc()
             except:
+                metrics.CLIPBOARD_FALLBACKS.labels("part2", "failed").inc()
+                metrics.OPERATION_ERRORS.labels("tk", "copy").inc()
+                metrics.observe("tk", "copy", time.perf_counter() - began)
                 messagebox.showerror("Copy Failed", "Could not copy to clipboard")
+                return
+        metrics.observe("tk", "copy", time.perf_counter() - began)
+    
+    def send_report(self):
+        """Queue Part 1 and Part 2 for the channel webhook"""
+        if not hasattr(self, 'part1'):
+            messagebox.showwarning("No Report", "Please generate a report first")
+            return
+        if getattr(self, 'sent_report', None) == self.current_report:
+            if not messagebox.askyesno("Already Sent", "This report is already queued. Send it again?"):
+                return
+        
+        try:
+            with metrics.timed("tk", "send"):
+                count = self.delivery.submit(self.part1, self.part2)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not queue the report: {e}")
+            return
+        self.sent_report = self.current_report
+        self.status_var.set(f"Queued {count} message(s) for the channel "
+                            f"({self.delivery.pending()} waiting)")
     
     def save_to_file(self):
         """Save report to file - user chooses location"""
@@ -523,46 +802,206 @@ class CrimeReportApp:
         )
         
         if filename:
+            # TXT file, the JSON record alongside it and the archive entry
+            # are written by the background writer
             try:
-                # Save TXT file
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(self.current_report)
-                
-                # Also save JSON file
-                json_file = filename.replace('.txt', '.json')
-                with open(json_file, 'w') as f:
-                    json.dump(self.report_data, f, indent=2)
-                
-                self.status_var.set(f"Saved: {os.path.basename(filename)}")
-                
-            except Exception as e:
+                self.writer.submit(filename, self.current_report, self.report_data)
+            except report_writer.WriterBusy as e:
                 messagebox.showerror("Error", f"Failed to save file: {e}")
+                return
+            self.saving_drafts[filename] = self.report_draft
+            
+            self.status_var.set(f"Saving {os.path.basename(filename)}...")
+            if not self.polling_writer:
+                self.polling_writer = True
+                self.root.after(WRITER_POLL_MS, self.poll_writer)
+    
+    def poll_writer(self):
+        """Report finished background saves in the status bar"""
+        for result in self.writer.results():
+            name = os.path.basename(result.job.filename)
+            saved_draft = self.saving_drafts.pop(result.job.filename, None)
+            if result.stage == "save":
+                self.status_var.set(f"Failed to save {name}")
+                messagebox.showerror("Error", f"Failed to save file: {result.error}")
+                continue
+            if result.stage == "archive":
+                self.status_var.set(f"Saved: {name} (not archived)")
+                messagebox.showerror("Error", f"Saved file but could not archive report: {result.error}")
+            else:
+                self.suggester.observe(result.job.report_data["crimes"])
+                self.status_var.set(f"Saved: {name}")
+            # Unless it was edited since, the saved form is not offered back
+            # as an unsaved draft next time
+            if saved_draft is not None and saved_draft == self.draft_values():
+                try:
+                    self.draft.mark_saved(saved_draft)
+                except OSError:
+                    pass
+        
+        if self.writer.pending:
+            self.root.after(WRITER_POLL_MS, self.poll_writer)
+        else:
+            self.polling_writer = False
+    
+    def check_links(self):
+        """Check the evidence links in the background and mark the fields that fail"""
+        links = evidence_links.report_links(
+            {var_name: var.get() for var_name, var in self.special_vars.items()})
+        for label in self.special_labels.values():
+            label.configure(foreground="")
+        if not links:
+            return
+        
+        if self.link_checker is None:
+            self.link_checker = evidence_links.BackgroundValidator()
+        urls = [url for field_links in links.values() for url in field_links]
+        future = self.link_checker.submit(urls)
+        self.status_var.set(f"Checking {len(set(urls))} evidence links...")
+        self.root.after(LINK_POLL_MS, self.poll_link_check, future, links)
+    
+    def poll_link_check(self, future, links):
+        if not future.done():
+            self.root.after(LINK_POLL_MS, self.poll_link_check, future, links)
+            return
+        try:
+            results = future.result()
+        except Exception as e:
+            self.status_var.set(f"Could not check links: {e}")
+            return
+        
+        problems = []
+        labels = {key: label.rstrip(": ") for fields in report_renderer.FIELDS.values()
+                  for label, key in fields}
+        for var_name, urls in links.items():
+            failed = [results[url] for url in urls if not results[url].ok]
+            label = self.evidence_labels.get(var_name)
+            if failed and label is not None:
+                label.configure(foreground="red")
+            problems.extend(f"{labels.get(var_name, var_name)}: {result.error}" for result in failed)
+        
+        if problems:
+            self.status_var.set(f"{len(problems)} dead evidence link(s): {'; '.join(problems)}")
+        else:
+            self.status_var.set(f"All {len(results)} evidence links OK")
+    
+    def draft_values(self):
+        """The form as flat draft journal keys"""
+        values = {
+            "type": self.report_type.get(),
+            "name": self.name_var.get(),
+            "crime": self.crime_var.get(),
+            "date": self.date_var.get(),
+            "time": self.time_var.get(),
+            "crimes": list(self.selected_crimes_list),
+        }
+        for var_name, var in getattr(self, 'evidence_vars', {}).items():
+            values[draft_journal.FIELD_PREFIX + var_name] = var.get()
+        return values
+    
+    def note_draft(self, *args):
+        """Record a form change; the journal is written once the debounce window ends"""
+        if self.draft_paused:
+            return
+        self.draft.record(self.draft_values())
+        if not self.draft_flush_scheduled:
+            self.draft_flush_scheduled = True
+            self.root.after(DRAFT_DEBOUNCE_MS, self.flush_draft)
+    
+    def flush_draft(self):
+        self.draft_flush_scheduled = False
+        try:
+            self.draft.flush()
+        except OSError as e:
+            self.status_var.set(f"Draft autosave failed: {e}")
+    
+    def restore_draft(self):
+        """Fill the form from the draft left by the last session, if any"""
+        try:
+            draft = draft_journal.unflatten(self.draft.load())
+        except OSError:
+            return
+        if self.draft.saved:
+            return
+        if not any(draft["fields"].values()) and not draft.get("name") and not draft.get("crimes"):
+            return
+        
+        self.report_type.set(draft.get("type", "Gang"))
+        self.update_fields()
+        self.name_var.set(draft.get("name", ""))
+        self.crime_var.set(draft.get("crime", ""))
+        if draft.get("date"):
+            self.date_var.set(draft["date"])
+        if draft.get("time"):
+            self.time_var.set(draft["time"])
+        self.selected_crimes_list = self.catalog.ordered(
+            [crime for crime in draft.get("crimes", []) if crime in self.catalog])
+        self.update_selected_crimes_display()
+        for var_name, var in self.evidence_vars.items():
+            var.set(draft["fields"].get(var_name, ""))
+        
+        # Start the next session's journal from one line
+        try:
+            self.draft.compact()
+        except OSError:
+            pass
+        self.status_var.set("Restored unsaved draft from last session")
+    
+    def on_close(self):
+        """Finish pending saves before the window goes away"""
+        self.flush_draft()
+        if self.writer.pending:
+            self.status_var.set("Finishing saves...")
+            self.root.update_idletasks()
+        self.writer.close()
+        if self.link_checker is not None:
+            self.link_checker.close()
+        if self.delivery is not None:
+            # Anything unsent stays in the outbox for next time
+            self.delivery.close()
+        self.root.destroy()
+    
+    def dump_metrics(self):
+        """Write the collected operation timings next to the app (F12)"""
+        try:
+            metrics.dump("metrics.prom")
+            self.status_var.set(f"Metrics written to {os.path.abspath('metrics.prom')}")
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not write metrics: {e}")
     
     def clear_all(self):
         """Clear all fields"""
-        # Clear basic fields
-        self.name_var.set("")
-        self.crime_var.set("")
-        self.set_current_datetime()
+        self.draft_paused = True
+        try:
+            # Clear basic fields
+            self.name_var.set("")
+            self.crime_var.set("")
+            self.set_current_datetime()
         
-        # Clear crimes selection
-        self.selected_crimes_list = []
-        self.update_selected_crimes_display()
+            # Clear crimes selection
+            self.selected_crimes_list = []
+            self.update_selected_crimes_display()
         
-        # Clear special fields
-        if hasattr(self, 'special_vars'):
-            for var in self.special_vars.values():
+            # Clear both evidence forms
+            for var in self.evidence_vars.values():
                 var.set("")
+            for label in self.evidence_labels.values():
+                label.configure(foreground="")
         
-        # Clear output
-        self.output_text.delete(1.0, tk.END)
+            # Clear output
+            self.output_text.delete(1.0, tk.END)
         
-        # Reset to Gang
-        self.report_type.set("Gang")
-        self.update_fields()
+            # Reset to Gang
+            self.report_type.set("Gang")
+            self.update_fields()
+        
+            # Reset status
+            self.status_var.set("Ready")
         
-        # Reset status
-        self.status_var.set("Ready")
+            # Nothing left to restore
+            self.draft.clear()
+        finally:
+            self.draft_paused = False
 
 def main():
     root = tk.Tk()
@@ -0,0 +1,244 @@
+"""Load test for webhook delivery against a local stub receiver
+
+A whole shift submits at once: every officer thread queues a rendered
+report at the same moment, then the test waits for the outbox to drain
+and checks what the stub received. The stub behaves like a chat webhook
+that is having a bad day:
+
+- it enforces its own rate limit and answers 429 with Retry-After;
+- a share of posts fail with 500 or 503 before anything is recorded;
+- messages over the size limit are rejected with 400.
+
+Every report has to arrive exactly once, split to fit, with its parts in
+order.
+
+    python delivery_load_test.py --officers 60 --max-chars 500
+    python delivery_load_test.py --coalesce --restart-after 1
+    python delivery_load_test.py --serve 8950   # just run the stub
+
+--restart-after closes the delivery worker part way through and starts a
+new one on the same outbox, the way an app restart would.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import report_delivery
+import report_renderer
+from api_load_test import sample_record
+from load_test import percentile
+
+
+class StubWebhook(ThreadingHTTPServer):
+    """Records posted messages; rate limits and fails like a real webhook"""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, rate=20.0, burst=5, fail_rate=0.05, max_chars=2000, seed=0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.bucket = report_delivery.TokenBucket(rate, burst)
+        self.fail_rate = fail_rate
+        self.max_chars = max_chars
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.received = []
+        self.stats = {"posts": 0, "accepted": 0, "rate_limited": 0, "failed": 0, "too_long": 0}
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with server.lock:
+            server.stats["posts"] += 1
+            wait = server.bucket.take()
+            if wait:
+                server.stats["rate_limited"] += 1
+                status, reply = 429, {"message": "You are being rate limited.",
+                                      "retry_after": round(wait, 3)}
+            elif server.rng.random() < server.fail_rate:
+                server.stats["failed"] += 1
+                status, reply = server.rng.choice((500, 503)), {"message": "try again"}
+            else:
+                content = json.loads(body).get("content", "")
+                if len(content) > server.max_chars:
+                    server.stats["too_long"] += 1
+                    status, reply = 400, {"message": "content too long"}
+                else:
+                    server.stats["accepted"] += 1
+                    server.received.append(content)
+                    status, reply = 204, None
+        payload = b"" if reply is None else json.dumps(reply).encode("utf-8")
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", f"{reply['retry_after']:.3f}")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(**options):
+    server = StubWebhook(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def shift_reports(officers, seed=0):
+    """One rendered report per officer, each with a few charges"""
+    rng = random.Random(seed)
+    crimes = ["PC 2.10.6 Robbery", "PC 3.1.6 Banditry", "PC 1.4 Assault",
+              "PC 2.3 Kidnapping", "PC 4.2 Evading Police"]
+    reports = []
+    for n in range(officers):
+        record = sample_record(seed * 100_000 + n)
+        record["name"] = f"Officer {n:04d}"
+        record["crimes"] = rng.sample(crimes, rng.randint(1, len(crimes)))
+        reports.append(report_renderer.render(record, header="web"))
+    return reports
+
+
+def verify(reports, received, max_chars):
+    """Return a list of problems with what the stub received"""
+    problems = [f"message of {len(message)} characters" for message in received
+                if len(message) > max_chars]
+    # Each report is queued in one transaction, so its messages are
+    # contiguous in the stream; recover the report order from it
+    expected = {n: "\n\n".join(chunk for part in parts
+                               for chunk in report_delivery.split_message(part, max_chars))
+                for n, parts in enumerate(reports)}
+    stream = "\n\n".join(received)
+    positions = {n: stream.find(text) for n, text in expected.items()}
+    missing = [n for n, position in positions.items() if position < 0]
+    if missing:
+        problems.append(f"{len(missing)} reports missing or out of order, e.g. #{missing[0]}")
+        return problems
+    order = sorted(expected, key=positions.get)
+    if stream != "\n\n".join(expected[n] for n in order):
+        problems.append("received messages differ from the queued reports (duplicates?)")
+    return problems
+
+
+def run_shift(stub, officers, rate, burst, max_chars, coalesce, restart_after=None, seed=0):
+    reports = shift_reports(officers, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = report_delivery.Outbox(os.path.join(directory, "outbox.db"))
+        options = dict(rate=rate, burst=burst, max_chars=max_chars, coalesce=coalesce,
+                       max_attempts=50)
+        delivery = report_delivery.WebhookDelivery(stub.url, outbox, **options)
+
+        # Everyone presses Send at the same moment
+        start = threading.Barrier(officers + 1)
+        submit_ms = []
+        queued = []
+
+        def officer(parts):
+            start.wait()
+            began = time.perf_counter()
+            queued.append(delivery.submit(*parts))
+            submit_ms.append((time.perf_counter() - began) * 1000)
+
+        threads = [threading.Thread(target=officer, args=(parts,)) for parts in reports]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+
+        restarted = False
+        while True:
+            counts = outbox.counts()
+            if not counts.get("pending"):
+                break
+            if restart_after is not None and not restarted and \
+                    time.perf_counter() - began > restart_after:
+                delivery.close()
+                delivery = report_delivery.WebhookDelivery(stub.url, outbox, **options)
+                restarted = True
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - began
+        delivery.close()
+        outbox.close()
+
+    return {
+        "officers": officers,
+        "queued_messages": sum(queued),
+        "elapsed_s": elapsed,
+        "messages_per_s": stub.stats["accepted"] / elapsed if elapsed else 0.0,
+        "submit_ms": {"p50": percentile(submit_ms, 50), "p99": percentile(submit_ms, 99),
+                      "max": max(submit_ms, default=0.0)},
+        "dead": counts.get("dead", 0),
+        "restarted": restarted,
+        "stub": dict(stub.stats),
+        "problems": verify(reports, stub.received, max_chars) if not counts.get("dead") else
+                    [f"{counts['dead']} messages given up"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test webhook delivery")
+    parser.add_argument("--officers", type=int, default=60,
+                        help="reports submitted at once (default: 60)")
+    parser.add_argument("--rate", type=float, default=40.0,
+                        help="client posts per second (default: 40)")
+    parser.add_argument("--burst", type=int, default=10, help="client burst (default: 10)")
+    parser.add_argument("--stub-rate", type=float, default=30.0,
+                        help="posts per second the stub accepts (default: 30)")
+    parser.add_argument("--fail-rate", type=float, default=0.05,
+                        help="share of posts the stub fails with 5xx (default: 0.05)")
+    parser.add_argument("--max-chars", type=int, default=500,
+                        help="message size limit (default: 500, so reports are split)")
+    parser.add_argument("--coalesce", action="store_true", help="join short messages")
+    parser.add_argument("--restart-after", type=float, metavar="SECONDS",
+                        help="restart the delivery worker this far into the run")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the stub on PORT")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        stub = StubWebhook(args.serve, args.stub_rate, fail_rate=args.fail_rate,
+                           max_chars=args.max_chars)
+        print(f"Stub webhook on {stub.url}", file=sys.stderr)
+        try:
+            stub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    stub = start_stub(rate=args.stub_rate, fail_rate=args.fail_rate, max_chars=args.max_chars)
+    results = run_shift(stub, args.officers, args.rate, args.burst, args.max_chars,
+                        args.coalesce, args.restart_after)
+    stub.shutdown()
+
+    submit = results["submit_ms"]
+    print(f"{results['officers']} reports ({results['queued_messages']} messages) delivered in "
+          f"{results['elapsed_s']:.2f}s, {results['messages_per_s']:.1f} posts/s"
+          + (" across a restart" if results["restarted"] else ""))
+    print(f"  submit      p50 {submit['p50']:.2f} ms  p99 {submit['p99']:.2f} ms  "
+          f"max {submit['max']:.2f} ms")
+    stats = results["stub"]
+    print(f"  stub        {stats['posts']} posts: {stats['accepted']} accepted, "
+          f"{stats['rate_limited']} rate limited, {stats['failed']} failed, "
+          f"{stats['too_long']} too long")
+    for problem in results["problems"]:
+        print(f"  PROBLEM     {problem}")
+    return 1 if results["problems"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
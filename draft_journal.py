@@ -0,0 +1,219 @@
+"""Crash-safe journal of the report being written
+
+Each open form keeps a draft journal: an append-only file of JSON lines,
+each holding only the form values that changed since the previous line:
+
+    {"set": {"name": "John Smith", "fields.gang_bodycam_proof": "https://..."}}
+
+Changes are collected in memory with record() and written by flush(),
+which the front ends call at most once per debounce window (Tk) or once
+per rerun (Streamlit), so typing never waits on a file rewrite. A flush
+that fails (disk full, share offline) keeps its changes pending for the
+next one. Replaying the lines with load() gives back the last flushed
+form; a line cut short by a crash or a failed write is ignored. Once
+the journal holds compact_after lines it is rewritten as a single line
+with the whole form. mark_saved() does the same after the form is saved,
+flagging the line so the front ends do not offer it back as unsaved.
+
+Keys are the report_data keys (type, name, crime, date, time, nov,
+crimes) plus "fields.<key>" for each evidence field.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+import report_writer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.environ.get("CRIME_REPORT_DRAFTS", "drafts")
+FIELD_PREFIX = "fields."
+
+_DRAFT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_draft_id():
+    return uuid.uuid4().hex
+
+
+def valid_draft_id(draft_id):
+    """Draft ids come from URLs, so only accept what new_draft_id makes"""
+    return bool(draft_id) and _DRAFT_ID.match(draft_id) is not None
+
+
+def draft_path(name, directory=None):
+    return os.path.join(directory or DEFAULT_DIR, f"{name}.journal")
+
+
+def flatten(report):
+    """report_data-style dict -> flat journal keys"""
+    flat = {key: value for key, value in report.items() if key != "fields"}
+    for key, value in (report.get("fields") or {}).items():
+        flat[FIELD_PREFIX + key] = value
+    return flat
+
+
+def unflatten(state):
+    """Flat journal keys -> report_data-style dict"""
+    report = {"fields": {}}
+    for key, value in state.items():
+        if key.startswith(FIELD_PREFIX):
+            report["fields"][key[len(FIELD_PREFIX):]] = value
+        else:
+            report[key] = value
+    return report
+
+
+def prune(directory=None, max_age=7 * 24 * 3600):
+    """Delete journals not written to for max_age seconds"""
+    directory = directory or DEFAULT_DIR
+    cutoff = time.time() - max_age
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith(".journal") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class DraftJournal:
+    """Append-only journal of one form's values"""
+
+    def __init__(self, path, compact_after=200):
+        self.path = path
+        self.compact_after = compact_after
+        self.state = {}       # everything flushed so far
+        self.pending = {}     # recorded, not yet flushed
+        self.lines = 0
+        self.torn = False     # file ends in a partial line
+        self.saved = False    # nothing changed since the form was last saved
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Replay the journal and return the flushed form as a flat dict"""
+        state = {}
+        lines = 0
+        torn = False
+        saved = False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue    # torn write from a crash
+                    if entry.get("reset"):
+                        state = {}
+                    state.update(entry.get("set") or {})
+                    saved = bool(entry.get("saved"))
+                    lines += 1
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            self.state = state
+            self.lines = lines
+            self.torn = torn
+            self.saved = saved
+        return dict(state)
+
+    def record(self, changes):
+        """Note changed values; nothing is written until flush()"""
+        with self.lock:
+            for key, value in changes.items():
+                if key not in self.state or self.state[key] != value:
+                    self.pending[key] = value
+                else:
+                    self.pending.pop(key, None)
+
+    def flush(self):
+        """Append the pending changes as one line; returns True if anything was written"""
+        with self.lock:
+            if not self.pending:
+                return False
+            changes, self.pending = self.pending, {}
+            try:
+                if self.lines + 1 >= self.compact_after:
+                    self._compact(dict(self.state, **changes))
+                else:
+                    self._append({"set": changes})
+            except OSError:
+                # Not written: the next flush tries them again
+                self.pending = changes
+                raise
+            self.state.update(changes)
+            self.saved = False
+        return True
+
+    def mark_saved(self, values):
+        """Rewrite the journal as saved with these values; a later change unflags it"""
+        with self.lock:
+            self._compact(dict(self.state, **values), saved=True)
+            self.state.update(values)
+            self.pending = {key: value for key, value in self.pending.items()
+                            if self.state.get(key) != value}
+            self.saved = True
+
+    def _make_dir(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _append(self, entry):
+        self._make_dir()
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                # Never glue a new entry onto a line cut short by a crash
+                f.write("\n" + line if self.torn else line)
+        except OSError:
+            self.torn = True    # part of the line may have been written
+            raise
+        self.torn = False
+        self.lines += 1
+
+    def _compact(self, state, saved=False):
+        """Replace the journal with one line holding the whole form"""
+        entry = {"reset": True, "set": state}
+        if saved:
+            entry["saved"] = True
+        self._make_dir()
+        report_writer.write_atomic(
+            self.path, json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.lines = 1
+        self.torn = False
+
+    def compact(self):
+        with self.lock:
+            if self.lines > 1:
+                self._compact(self.state, saved=self.saved)
+
+    def clear(self):
+        """Forget the draft, e.g. after Clear All"""
+        with self.lock:
+            self.state = {}
+            self.pending = {}
+            self.lines = 0
+            self.torn = False
+            self.saved = False
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # The old draft is still on disk: have the next flush
+                # replace it rather than append to it
+                self.lines = self.compact_after
+                logger.warning("Draft journal %s not removed: %s", self.path, e)
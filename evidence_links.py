@@ -0,0 +1,356 @@
+"""Evidence link checking
+
+Finds the URLs in a report's evidence fields and checks that each one
+answers, so dead or mistyped ImgBB/video links are caught before the
+report is handed in rather than during review.
+
+    python evidence_links.py https://ibb.co/abc123 https://streamable.com/e4k2p
+    python evidence_links.py --archive reports.db --limit 5000
+
+Links are checked concurrently on an asyncio event loop with a HEAD
+request (falling back to a one-byte GET where HEAD is refused),
+following redirects. Connections are pooled and kept alive per host,
+each host gets at most per_host requests at a time, every request has
+a timeout (counted from when it gets its host slot), and results are
+cached for a while so rechecking a form is instant. Only the standard
+library is used.
+
+The UIs use a BackgroundValidator, which keeps one event loop and its
+connection pool running on a daemon thread and returns futures.
+"""
+import argparse
+import asyncio
+import re
+import ssl
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urljoin, urlsplit
+
+import metrics
+
+USER_AGENT = "crime-report-system link checker"
+URL_PATTERN = re.compile(r"https?://[^\s<>\"']+", re.IGNORECASE)
+REDIRECTS = {301, 302, 303, 307, 308}
+# Servers that refuse HEAD but may well serve a GET
+HEAD_REFUSED = {403, 405, 501}
+MAX_HEADER_BYTES = 64 * 1024
+MAX_DRAIN_BYTES = 64 * 1024
+
+# ok is True when the final response was 2xx/3xx; status is None if no
+# response was received, in which case error says why
+LinkResult = namedtuple("LinkResult", "url ok status error elapsed")
+
+LINK_CHECKS = metrics.REGISTRY.counter(
+    "crime_report_link_checks_total", "Evidence links checked, by outcome.", ("outcome",))
+
+
+def extract_links(text):
+    """Return the URLs in a field value, in order, without trailing punctuation"""
+    return [url.rstrip(".,;:)]}") for url in URL_PATTERN.findall(text or "")]
+
+
+def report_links(fields):
+    """Map each evidence field key to the links in it"""
+    return {key: links for key, links in
+            ((key, extract_links(value)) for key, value in (fields or {}).items()) if links}
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire"""
+
+    def __init__(self, ttl=600, error_ttl=60, max_entries=100_000):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # url -> (expires, result)
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self.entries[url]
+                return None
+            self.entries.move_to_end(url)
+            return entry[1]
+
+    def put(self, result):
+        ttl = self.ttl if result.ok else self.error_ttl
+        with self.lock:
+            self.entries[result.url] = (time.monotonic() + ttl, result)
+            self.entries.move_to_end(result.url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port); one event loop only"""
+
+    def __init__(self, max_idle_per_host=8):
+        self.max_idle = max_idle_per_host
+        self.idle = {}
+        self.ssl_context = ssl.create_default_context()
+
+    async def acquire(self, key):
+        """Return (reader, writer, reused)"""
+        idle = self.idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self.ssl_context if scheme == "https" else None,
+            limit=MAX_HEADER_BYTES)
+        return reader, writer, False
+
+    def release(self, key, reader, writer):
+        idle = self.idle.setdefault(key, [])
+        if len(idle) < self.max_idle and not writer.is_closing():
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for idle in self.idle.values():
+            for _, writer in idle:
+                writer.close()
+        self.idle.clear()
+
+
+async def read_head(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ", 2)
+    status = int(parts[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return parts[0], status, headers
+
+
+class LinkValidator:
+    """Checks links concurrently; all methods run on one event loop"""
+
+    def __init__(self, concurrency=200, per_host=8, timeout=5.0, max_redirects=5, cache=None):
+        self.concurrency = asyncio.Semaphore(concurrency)
+        self.per_host = per_host
+        self.host_limits = {}     # (scheme, host, port) -> [semaphore, users]
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.cache = cache if cache is not None else TTLCache()
+        self.pool = ConnectionPool(max_idle_per_host=per_host)
+
+    async def _request(self, method, url):
+        """One request; returns (status, headers). Reuses pooled connections
+
+        The timeout covers each request once it has its host slot, so a
+        link is not failed for queueing behind others on the same host.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"not an http(s) URL: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        request = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                   f"Accept: */*\r\n" + ("Range: bytes=0-0\r\n" if method == "GET" else "") +
+                   "\r\n").encode("latin-1")
+
+        # Waiting for a free slot on a busy host is not part of the timeout
+        slot = self.host_limits.get(key)
+        if slot is None:
+            slot = self.host_limits[key] = [asyncio.Semaphore(self.per_host), 0]
+        slot[1] += 1
+        try:
+            # The overall slot is taken last, so links queued for one busy
+            # host do not hold slots that other hosts' links could use
+            async with slot[0], self.concurrency:
+                return await asyncio.wait_for(self._exchange(key, method, request),
+                                              self.timeout)
+        finally:
+            # Hosts nobody holds or waits for are forgotten
+            slot[1] -= 1
+            if not slot[1]:
+                del self.host_limits[key]
+
+    async def _exchange(self, key, method, request):
+        for attempt in range(2):
+            reader, writer, reused = await self.pool.acquire(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                version, status, headers = await read_head(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue    # the server dropped an idle connection; retry on a new one
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            try:
+                keep = await self._finish(method, version, status, headers, reader)
+            except BaseException:
+                writer.close()
+                raise
+            if keep:
+                self.pool.release(key, reader, writer)
+            else:
+                writer.close()
+            return status, headers
+
+    @staticmethod
+    async def _finish(method, version, status, headers, reader):
+        """Consume the body if cheap; return whether the connection can be reused"""
+        if version == "HTTP/1.0" or headers.get("connection", "").lower() == "close":
+            return False
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return True
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return False
+        length = headers.get("content-length")
+        if length is None or not length.isdigit() or int(length) > MAX_DRAIN_BYTES:
+            return False
+        await reader.readexactly(int(length))
+        return True
+
+    async def _follow(self, url):
+        method = "HEAD"
+        for _ in range(self.max_redirects + 1):
+            status, headers = await self._request(method, url)
+            if method == "HEAD" and status in HEAD_REFUSED:
+                method = "GET"
+                status, headers = await self._request(method, url)
+            if status in REDIRECTS and headers.get("location"):
+                url = urljoin(url, headers["location"])
+                continue
+            return status
+        raise ValueError("too many redirects")
+
+    async def check(self, url):
+        """Check one link, using the cache"""
+        cached = self.cache.get(url)
+        if cached is not None:
+            return cached
+        began = time.perf_counter()
+        try:
+            status = await self._follow(url)
+            result = LinkResult(url, 200 <= status < 400, status,
+                                None if status < 400 else f"HTTP {status}",
+                                time.perf_counter() - began)
+        except asyncio.TimeoutError:
+            result = LinkResult(url, False, None, f"timed out after {self.timeout:g}s",
+                                time.perf_counter() - began)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError) as e:
+            result = LinkResult(url, False, None, str(e) or type(e).__name__,
+                                time.perf_counter() - began)
+        LINK_CHECKS.labels("ok" if result.ok else "failed").inc()
+        self.cache.put(result)
+        return result
+
+    async def check_all(self, urls):
+        """Check links concurrently; returns {url: LinkResult}"""
+        unique = list(dict.fromkeys(urls))
+        with metrics.timed("links", "check_batch"):
+            results = await asyncio.gather(*(self.check(url) for url in unique))
+        return dict(zip(unique, results))
+
+    def close(self):
+        self.pool.close()
+
+
+class BackgroundValidator:
+    """A LinkValidator on its own event loop thread, usable from any thread"""
+
+    def __init__(self, **options):
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(options, ready),
+                                       name="link-checker", daemon=True)
+        self.thread.start()
+        ready.wait()
+
+    def _run(self, options, ready):
+        asyncio.set_event_loop(self.loop)
+        self.validator = LinkValidator(**options)
+        ready.set()
+        self.loop.run_forever()
+
+    def submit(self, urls):
+        """Start checking; returns a concurrent.futures.Future of {url: LinkResult}"""
+        return asyncio.run_coroutine_threadsafe(self.validator.check_all(urls), self.loop)
+
+    def check(self, urls, timeout=None):
+        """Check and wait for the results"""
+        return self.submit(urls).result(timeout)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.validator.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def check_links(urls, **options):
+    """Check links from synchronous code; returns {url: LinkResult}"""
+    async def run():
+        validator = LinkValidator(**options)
+        try:
+            return await validator.check_all(urls)
+        finally:
+            validator.close()
+    return asyncio.run(run())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check evidence links")
+    parser.add_argument("urls", nargs="*", help="links to check")
+    parser.add_argument("--archive", help="check every link in this report archive")
+    parser.add_argument("--limit", type=int, help="only the first N archived reports")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds per link (default: 5)")
+    parser.add_argument("--per-host", type=int, default=8,
+                        help="concurrent requests per host (default: 8)")
+    parser.add_argument("--concurrency", type=int, default=200,
+                        help="concurrent requests overall (default: 200)")
+    args = parser.parse_args(argv)
+
+    owners = {url: [] for url in args.urls}
+    if args.archive:
+        import report_archive
+        with report_archive.ReportArchive(args.archive) as archive:
+            reports = archive.iter_reports()
+            for n, (report_id, report) in enumerate(reports):
+                if args.limit is not None and n >= args.limit:
+                    break
+                for key, links in report_links(report.get("fields")).items():
+                    for url in links:
+                        owners.setdefault(url, []).append(f"#{report_id} {key}")
+    if not owners:
+        parser.error("give links to check or --archive")
+
+    began = time.perf_counter()
+    results = check_links(owners, timeout=args.timeout, per_host=args.per_host,
+                          concurrency=args.concurrency)
+    elapsed = time.perf_counter() - began
+
+    failed = [result for result in results.values() if not result.ok]
+    for result in failed:
+        where = ", ".join(owners[result.url][:3])
+        print(f"{result.error}\t{result.url}" + (f"\t{where}" if where else ""))
+    print(f"{len(results)} links checked in {elapsed:.2f}s, {len(failed)} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
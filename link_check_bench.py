@@ -0,0 +1,128 @@
+"""Stub evidence host and link checker benchmark
+
+Starts a local HTTP server on several ports (each port stands in for
+one image/video host) and checks a batch of generated links against it
+with evidence_links, verifying every result:
+
+    /ok/<n>       200
+    /dead/<n>     404
+    /moved/<n>    301 to /ok/<n>
+    /nohead/<n>   405 to HEAD, 200 to GET
+    /slow/<n>     never answers within the timeout
+
+    python link_check_bench.py -n 10000 --hosts 20
+    python link_check_bench.py --serve 8900   # just run the stub
+
+The stub keeps connections alive like a real host, so the benchmark
+also exercises connection reuse.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import threading
+import time
+
+import evidence_links
+
+SLOW_SECONDS = 30
+
+
+async def stub_connection(reader, writer):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            method, path, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+            kind = path.split("/")[1] if path.count("/") >= 2 else ""
+            extra = ""
+            body = b""
+            if kind == "ok":
+                status, reason = 200, "OK"
+            elif kind == "moved":
+                status, reason = 301, "Moved Permanently"
+                extra = f"Location: /ok/{path.split('/', 2)[2]}\r\n"
+            elif kind == "nohead" and method == "HEAD":
+                status, reason = 405, "Method Not Allowed"
+            elif kind == "nohead":
+                status, reason, body = 206, "Partial Content", b"x"
+            elif kind == "slow":
+                await asyncio.sleep(SLOW_SECONDS)
+                status, reason = 200, "OK"
+            else:
+                status, reason = 404, "Not Found"
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Length: {len(body)}\r\n{extra}\r\n"
+                         .encode("latin-1") + (b"" if method == "HEAD" else body))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_stub(ports, ready=None):
+    servers = [await asyncio.start_server(stub_connection, "127.0.0.1", port, backlog=1024)
+               for port in ports]
+    if ready is not None:
+        ready.append([server.sockets[0].getsockname()[1] for server in servers])
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+def start_stub(hosts):
+    """Run the stub on a daemon thread; returns the ports it listens on"""
+    ready = []
+    thread = threading.Thread(target=lambda: asyncio.run(serve_stub([0] * hosts, ready)),
+                              daemon=True)
+    thread.start()
+    while not ready:
+        time.sleep(0.01)
+    return ready[0]
+
+
+def generate_links(count, ports, slow=0, seed=0):
+    """Return {url: expected ok}"""
+    rng = random.Random(seed)
+    kinds = [("ok", True)] * 16 + [("dead", False)] * 2 + [("moved", True), ("nohead", True)]
+    links = {}
+    for n in range(count):
+        kind, ok = ("slow", False) if n < slow else rng.choice(kinds)
+        links[f"http://127.0.0.1:{rng.choice(ports)}/{kind}/{n}"] = ok
+    return links
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the evidence link checker")
+    parser.add_argument("-n", "--links", type=int, default=10_000, help="links to check (default: 10000)")
+    parser.add_argument("--hosts", type=int, default=20, help="stub hosts (ports) (default: 20)")
+    parser.add_argument("--slow", type=int, default=0, help="links that time out (default: 0)")
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds per link (default: 2)")
+    parser.add_argument("--per-host", type=int, default=8,
+                        help="concurrent requests per host (default: 8)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="only run the stub on PORT")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        print(f"Stub host on http://127.0.0.1:{args.serve}/ok/1", file=sys.stderr)
+        try:
+            asyncio.run(serve_stub([args.serve]))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    ports = start_stub(args.hosts)
+    links = generate_links(args.links, ports, args.slow)
+    began = time.perf_counter()
+    results = evidence_links.check_links(links, timeout=args.timeout, per_host=args.per_host)
+    elapsed = time.perf_counter() - began
+
+    wrong = [url for url, ok in links.items() if results[url].ok != ok]
+    failed = sum(1 for result in results.values() if not result.ok)
+    print(f"{len(results)} links on {args.hosts} hosts in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.0f} links/s), {failed} failed as expected")
+    if wrong:
+        print(f"{len(wrong)} wrong results, first: {wrong[0]} -> {results[wrong[0]]}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
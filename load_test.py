@@ -0,0 +1,256 @@
+"""Concurrent-session load test for the Streamlit app
+
+Drives app.py with Streamlit's AppTest API (Streamlit >= 1.28) from N
+threads at once. Every simulated officer fills in name, crime type,
+charges and evidence links, presses Generate Report, then Clear All,
+for a number of rounds. Each interaction is one script rerun and is
+timed; the tool reports p50/p95/p99 rerun latency, throughput and the
+size of one session's state.
+
+    python load_test.py --sessions 20 --rounds 5
+    python load_test.py --sessions 50 --json results.json --max-p95 250
+
+The archive and caches are written to a temporary directory unless
+--workdir is given, so a load test never touches the real archive.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+EVIDENCE_LINKS = [
+    "https://ibb.co/abc123",
+    "https://i.ibb.co/xyz789/proof.png",
+    "https://streamable.com/e4k2p",
+    "https://youtu.be/dQw4w9WgXcQ",
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def deep_size(obj, seen, skip_types=()):
+    """Approximate bytes reachable from obj, not counting ids in seen"""
+    if id(obj) in seen or isinstance(obj, skip_types):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen, skip_types) + deep_size(v, seen, skip_types)
+                    for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen, skip_types) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen, skip_types)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_size(getattr(obj, name), seen, skip_types)
+                    for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def session_state_bytes(at):
+    """Bytes held by one session's state, excluding shared cached resources"""
+    import charge_catalog
+    import charge_search
+    state = at.session_state
+    skip = (charge_catalog.ChargeCatalog, charge_search.ChargeSearchIndex)
+    seen = set()
+    return sum(deep_size(key, seen, skip) + deep_size(state[key], seen, skip)
+               for key in state.filtered_state)
+
+
+def install_shared_runtime():
+    """Make AppTest safe to drive from several threads at once
+
+    AppTest._run in Streamlit 1.28 installs a fresh mock Runtime as a
+    global before each rerun and clears it afterwards, so concurrent
+    sessions tear each other's runtime down mid-run. Install one mock
+    runtime for the whole load test instead, like a real server has, and
+    run each session's script without the global setup and teardown.
+    Cached resources and the compiled script are then shared between
+    sessions as in production; compiling app.py in many threads at once
+    also trips a CPython 3.11 AST bug.
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1.app_test import AppTest
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    config.set_option("runner.postScriptGC", False)
+    script_cache = ScriptCache()
+
+    def run(self, widget_state=None, timeout=None):
+        script_runner = LocalScriptRunner(self._script_path, self.session_state)
+        script_runner._script_cache = script_cache
+        self._tree = script_runner.run(widget_state, self.query_params,
+                                       self.default_timeout if timeout is None else timeout)
+        self._tree._runner = self
+        return self
+
+    AppTest._run = run
+
+
+class Session:
+    """One simulated officer"""
+
+    def __init__(self, index, timeout):
+        from streamlit.testing.v1 import AppTest
+        self.index = index
+        self.timings = []      # (action, seconds)
+        self.errors = []
+        self.state_bytes = 0
+        self.random = random.Random(index)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def step(self, action, interact):
+        began = time.perf_counter()
+        interact()
+        self.timings.append((action, time.perf_counter() - began))
+        if self.at.exception:
+            raise RuntimeError(f"{action}: {self.at.exception[0].message}")
+
+    def button(self, text):
+        return next(b for b in self.at.button if text in b.label)
+
+    def run(self, rounds):
+        try:
+            self.play(rounds)
+        except Exception as exc:
+            # A missing widget means the rerun failed to render the page
+            self.errors.append(f"{type(exc).__name__}: {exc}")
+
+    def play(self, rounds):
+        at = self.at
+        self.step("load", at.run)
+        for n in range(rounds):
+            report_type = self.random.choice(["Gang", "Family"])
+            if at.radio(key="report_type_selector").value != report_type:
+                self.step("report_type", lambda: at.radio(key="report_type_selector")
+                          .set_value(report_type).run())
+            self.step("name", lambda: at.text_input(key="name_input")
+                      .input(f"Officer {self.index}-{n}").run())
+            self.step("crime_type", lambda: at.text_input(key="crime_type_input")
+                      .input(self.random.choice(["Robbery", "Hostage", "Banditry"])).run())
+            top = at.multiselect(key="top_charges")
+            for charge in self.random.sample(list(top.options), 2):
+                self.step("charges", lambda c=charge: at.multiselect(key="top_charges")
+                          .select(c).run())
+            # Evidence fields live in a form: fill them all, then submit once
+            for area in at.text_area:
+                area.input(self.random.choice(EVIDENCE_LINKS))
+            self.step("generate", lambda: self.button("Generate Report").click().run())
+            if n == rounds - 1:
+                self.state_bytes = session_state_bytes(at)
+            self.step("clear", lambda: self.button("Clear All").click().run())
+
+
+def run_load_test(sessions, rounds, timeout=60):
+    """Run sessions concurrently; returns a results dict"""
+    install_shared_runtime()
+    users = [Session(i, timeout) for i in range(sessions)]
+    threads = [threading.Thread(target=user.run, args=(rounds,), daemon=True) for user in users]
+
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    timings = [seconds * 1000 for user in users for _, seconds in user.timings]
+    by_action = {}
+    for user in users:
+        for action, seconds in user.timings:
+            by_action.setdefault(action, []).append(seconds * 1000)
+    state_sizes = [user.state_bytes for user in users if user.state_bytes]
+    return {
+        "sessions": sessions,
+        "rounds": rounds,
+        "elapsed_s": elapsed,
+        "reruns": len(timings),
+        "reruns_per_s": len(timings) / elapsed if elapsed else 0.0,
+        "reports_per_s": sessions * rounds / elapsed if elapsed else 0.0,
+        "latency_ms": {"p50": percentile(timings, 50), "p95": percentile(timings, 95),
+                       "p99": percentile(timings, 99), "max": max(timings, default=0.0)},
+        "by_action_ms": {action: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+                         for action, values in sorted(by_action.items())},
+        "session_state_bytes": {"mean": sum(state_sizes) / len(state_sizes) if state_sizes else 0,
+                                "max": max(state_sizes, default=0)},
+        "errors": [error for user in users for error in user.errors],
+    }
+
+
+def print_results(results):
+    latency = results["latency_ms"]
+    print(f"{results['sessions']} sessions x {results['rounds']} rounds: "
+          f"{results['reruns']} reruns in {results['elapsed_s']:.1f}s")
+    print(f"  throughput  {results['reruns_per_s']:.1f} reruns/s, "
+          f"{results['reports_per_s']:.2f} reports/s")
+    print(f"  latency     p50 {latency['p50']:.1f} ms  p95 {latency['p95']:.1f} ms  "
+          f"p99 {latency['p99']:.1f} ms  max {latency['max']:.1f} ms")
+    for action, values in results["by_action_ms"].items():
+        print(f"    {action:<12} p50 {values['p50']:7.1f} ms  p95 {values['p95']:7.1f} ms")
+    state = results["session_state_bytes"]
+    print(f"  session state  mean {state['mean'] / 1024:.1f} KiB  max {state['max'] / 1024:.1f} KiB")
+    if results["errors"]:
+        print(f"  {len(results['errors'])} errors, first: {results['errors'][0]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test app.py with concurrent AppTest sessions")
+    parser.add_argument("-n", "--sessions", type=int, default=10, help="concurrent sessions (default: 10)")
+    parser.add_argument("-r", "--rounds", type=int, default=3,
+                        help="reports generated per session (default: 3)")
+    parser.add_argument("--timeout", type=float, default=60, help="per-rerun timeout in seconds")
+    parser.add_argument("--workdir", help="directory for the archive and caches (default: a temp dir)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    parser.add_argument("--max-p95", type=float,
+                        help="exit with status 1 if p95 rerun latency exceeds this many ms")
+    args = parser.parse_args(argv)
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = args.workdir or tempfile.mkdtemp(prefix="crime-report-load-")
+    os.makedirs(workdir, exist_ok=True)
+    # Must be set before app.py imports report_archive
+    os.environ["CRIME_REPORT_ARCHIVE"] = os.path.join(workdir, "reports.db")
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+
+    results = run_load_test(args.sessions, args.rounds, args.timeout)
+    print_results(results)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if results["errors"]:
+        return 1
+    if args.max_p95 is not None and results["latency_ms"]["p95"] > args.max_p95:
+        print(f"p95 {results['latency_ms']['p95']:.1f} ms exceeds {args.max_p95} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""In-process timing and counter metrics
+
+Both front ends time their main operations into histograms kept in
+memory, labelled by front end and operation:
+
+    with metrics.timed("tk", "generate"):
+        ...
+
+The collected values are exposed in the Prometheus text format, either
+over a small local HTTP endpoint (app.py) or as a file dump (the Tk app,
+F12):
+
+    curl http://127.0.0.1:9108/metrics
+
+Only the standard library is used, so the metrics cost nothing to
+install and a few microseconds per observation.
+"""
+import abc
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    """A named family of values, one per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self.children.get(key)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(key, self.new_child())
+        return child
+
+    @abc.abstractmethod
+    def new_child(self):
+        """A new value for one combination of label values"""
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        # labels() can add a child from another thread while this runs
+        with self.lock:
+            children = sorted(self.children.items())
+        for key, child in children:
+            lines.extend(child.expose(self.name, self.labelnames, key))
+        return lines
+
+
+class CounterValue:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def expose(self, name, labelnames, key):
+        return [f"{name}{format_labels(labelnames, key)} {format_value(self.value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def new_child(self):
+        return CounterValue()
+
+
+class HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last one is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def expose(self, name, labelnames, key):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{format_value(float(bound))}"'
+            lines.append(f"{name}_bucket{format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labelnames, key)} {format_value(total)}")
+        lines.append(f"{name}_count{format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+
+    def new_child(self):
+        return HistogramValue(self.buckets)
+
+
+class Registry:
+    """Every metric of the process, in registration order"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+OPERATION_SECONDS = REGISTRY.histogram(
+    "crime_report_operation_seconds", "Time spent in each user-facing operation.",
+    ("frontend", "operation"))
+OPERATION_ERRORS = REGISTRY.counter(
+    "crime_report_operation_errors_total", "Operations that raised an exception.",
+    ("frontend", "operation"))
+CLIPBOARD_FALLBACKS = REGISTRY.counter(
+    "crime_report_clipboard_fallbacks_total",
+    "Copies that fell back from the Tk clipboard to pyperclip, by outcome.",
+    ("part", "outcome"))
+SLOW_RERUNS = REGISTRY.counter(
+    "crime_report_slow_reruns_total",
+    "Streamlit reruns slower than the rerun budget, RERUN_BUDGET_MS in app.py.")
+
+
+def observe(frontend, operation, seconds):
+    OPERATION_SECONDS.labels(frontend, operation).observe(seconds)
+
+
+@contextmanager
+def timed(frontend, operation):
+    """Time the body into crime_report_operation_seconds"""
+    began = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OPERATION_ERRORS.labels(frontend, operation).inc()
+        raise
+    finally:
+        observe(frontend, operation, time.perf_counter() - began)
+
+
+def dump(path, registry=REGISTRY):
+    """Write the current metrics to a file"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(registry.expose())
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format, *args)
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,127 @@
+"""Fuzzy search over the names and crime types of archived reports
+
+Names are typed by hand, so the same person turns up as "John Smith",
+"john smith " and "Jon Smith". Each distinct name (and crime type) is
+split into trigrams, the way PostgreSQL's pg_trgm does: every word is
+padded with two spaces in front and one behind, so "jon" gives "  j",
+" jo", "jon" and "on ". A query is ranked against every value sharing
+a trigram with it by similarity, the shared trigrams over all the
+trigrams of both (1.0 for the same text):
+
+    index = ReportNameIndex()
+    index.load(rows)                          # (id, name, crime) in id order
+    index.names.search("jon smth")           # [Match("John Smith", 0.47, 12), ...]
+
+The index holds distinct values, not reports, so a million reports by
+a few thousand officers stay a few thousand entries; each entry keeps
+the ids of its reports. Scoring is done with NumPy over the posting
+lists of the query's trigrams.
+"""
+import re
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+# text as most often written, similarity 0..1, number of reports
+Match = namedtuple("Match", "text similarity reports")
+
+_NOT_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """Lower-case words, punctuation and extra spaces dropped"""
+    return " ".join(_NOT_WORD.sub(" ", (text or "").casefold()).split())
+
+
+def trigrams(text):
+    """The trigram set of normalized text"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Distinct values, their report ids and a trigram -> value postings map"""
+
+    def __init__(self):
+        self.texts = []          # value as most often written
+        self.reports = []        # value -> array of report ids
+        self.sizes = array("i")  # value -> number of trigrams
+        self.postings = {}       # trigram -> array of values
+        self.by_key = {}         # normalized text -> value
+        self.by_text = {}        # text as written -> (value, spelling)
+        self.spellings = {}      # spelling -> number of reports
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, report_id, text):
+        found = self.by_text.get(text)
+        if found is None:
+            key = normalize(text)
+            if not key:
+                return
+            spelling = " ".join(text.split())
+            value = self.by_key.get(key)
+            if value is None:
+                value = self.by_key[key] = len(self.texts)
+                self.texts.append(spelling)
+                self.reports.append(array("q"))
+                grams = trigrams(key)
+                self.sizes.append(len(grams))
+                for gram in grams:
+                    posting = self.postings.get(gram)
+                    if posting is None:
+                        posting = self.postings[gram] = array("i")
+                    posting.append(value)
+            found = self.by_text[text] = value, spelling
+        value, spelling = found
+        self.reports[value].append(report_id)
+        # Shown the way it is written most often
+        count = self.spellings[spelling] = self.spellings.get(spelling, 0) + 1
+        if count > self.spellings.get(self.texts[value], 0):
+            self.texts[value] = spelling
+
+    def search(self, query, limit=10, threshold=0.3):
+        """Values most similar to query, best first"""
+        grams = trigrams(normalize(query))
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+        hits = np.concatenate([np.frombuffer(posting, np.int32) for posting in lists])
+        values, shared = np.unique(hits, return_counts=True)
+        sizes = np.frombuffer(self.sizes, np.int32)[values]
+        scores = shared / (len(grams) + sizes - shared)
+        keep = np.flatnonzero(scores >= threshold)
+        if len(keep) > limit:
+            keep = keep[np.argpartition(-scores[keep], limit - 1)[:limit]]
+        found = [Match(self.texts[value], round(float(score), 3), len(self.reports[value]))
+                 for value, score in zip(values[keep].tolist(), scores[keep].tolist())]
+        found.sort(key=lambda match: (-match.similarity, -match.reports, match.text))
+        return found
+
+    def report_ids(self, text):
+        """Ids of the reports whose value normalizes the same as text, oldest first"""
+        value = self.by_key.get(normalize(text))
+        return [] if value is None else self.reports[value].tolist()
+
+
+class ReportNameIndex:
+    """Trigram indexes of report names and crime types, kept current by report id"""
+
+    def __init__(self):
+        self.names = TrigramIndex()
+        self.crimes = TrigramIndex()
+        self.last_id = 0
+
+    def load(self, rows):
+        """Add (id, name, crime) rows in id order"""
+        add_name = self.names.add
+        add_crime = self.crimes.add
+        for report_id, name, crime in rows:
+            add_name(report_id, name)
+            add_crime(report_id, crime)
+            self.last_id = report_id
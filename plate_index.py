@@ -0,0 +1,206 @@
+"""License plates named in reports
+
+The license plate and PDA fields are free text: "AB12 CDE, xy99-zzz",
+"plates AB12CDE and XY99 ZZZ", a screenshot link, "N/A". When a report
+is archived its plates are pulled out and normalized (upper case, no
+spaces or separators), and the owners named in "Owner of the car
+searched in PDA" are tied to the plates searched in the PDA:
+
+    extract_plates("AB12 CDE, xy99-zzz")   # ["AB12CDE", "XY99ZZZ"]
+    report_rows(report)                   # [("AB12CDE", None), ("XY99ZZZ", "John Smith")]
+
+The archive stores those rows and keeps a PlateIndex of them in memory:
+plate -> report ids, owner -> plates and plate -> owners are dict
+lookups, and a sorted list of every plate answers as-you-type prefix
+suggestions.
+
+A plate is 2 to 8 letters and digits with at least one digit, so words
+like "none" or "unknown" are not taken for plates. Two short words next
+to each other ("AB12 CDE") are read as one plate only when together they
+have the shape of a UK registration (current, prefix or suffix style),
+so "Red Ford AB12 CDE" gives AB12CDE and not FORDAB12.
+"""
+import re
+from bisect import bisect_left, insort
+
+# Fields whose plates are indexed; owners are paired with the plates
+# searched in the PDA, or every plate of the report when none were
+PLATE_FIELDS = ("gang_license_plates", "family_license_plates", "family_pda_search")
+PDA_FIELD = "family_pda_search"
+OWNER_FIELD = "family_car_owner"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_plates (
+    report_id INTEGER NOT NULL,
+    plate TEXT NOT NULL,
+    owner TEXT
+);
+"""
+
+_URL = re.compile(r"\b(?:https?://|www\.)\S+", re.IGNORECASE)
+_LIST = re.compile(r"[,;/|\n]+|\s+(?:and|&)\s+", re.IGNORECASE)
+_OWNER_LIST = re.compile(r"[,;|\n]+|\s+(?:and|&)\s+", re.IGNORECASE)
+_LEAD = re.compile(r"^(?:license\s+|registration\s+)?(?:plates?|reg|vrm)\b\s*[:#-]?\s*",
+                   re.IGNORECASE)
+_SEPARATORS = re.compile(r"[\s\-._]+")
+_PLATE = re.compile(r"^(?=.*\d)[A-Z0-9]{2,8}$")
+# AB12CDE, A123BCD, ABC123D: the shapes a plate split over two words has
+_SPLIT_PLATE = re.compile(r"^(?:[A-Z]{2}\d{2}[A-Z]{3}|[A-Z]\d{1,3}[A-Z]{3}|[A-Z]{3}\d{1,3}[A-Z])$")
+_NOT_OWNERS = {"n/a", "na", "none", "unknown", "-"}
+
+
+def normalize_plate(text):
+    """The canonical form of a plate, or None if text is not one"""
+    plate = _SEPARATORS.sub("", (text or "").upper())
+    return plate if _PLATE.match(plate) else None
+
+
+def owner_key(name):
+    """Owners match case-insensitively, ignoring extra spaces"""
+    return " ".join(name.split()).casefold()
+
+
+def _chunks(text, separators=_LIST):
+    """The comma/"and" separated items of a field, links removed"""
+    for chunk in separators.split(_URL.sub(" ", text or "")):
+        chunk = _LEAD.sub("", chunk.strip())
+        if chunk:
+            yield chunk
+
+
+def split_last(text):
+    """(everything before the last item of a list, the last item)
+
+    The last item is the one being typed: completing it keeps the rest
+    of the field as written.
+    """
+    cut = 0
+    for match in _LIST.finditer(text or ""):
+        cut = match.end()
+    return (text or "")[:cut], (text or "")[cut:]
+
+
+def extract_plates(text):
+    """Normalized plates in a free-text field, in order, without repeats
+
+    >>> for text in ("AB12 CDE, xy99-zzz", "Car AB12 CDE", "Red Ford AB12 CDE",
+    ...              "Silver VW Golf AB12 CDE", "A123 BCD and AB 12 CDE", "1 car", "N/A"):
+    ...     print(f"{text!r:26} {extract_plates(text)}")
+    'AB12 CDE, xy99-zzz'       ['AB12CDE', 'XY99ZZZ']
+    'Car AB12 CDE'             ['AB12CDE']
+    'Red Ford AB12 CDE'        ['AB12CDE']
+    'Silver VW Golf AB12 CDE'  ['AB12CDE']
+    'A123 BCD and AB 12 CDE'   ['A123BCD', 'AB12CDE']
+    '1 car'                    []
+    'N/A'                      []
+    """
+    if not text:
+        return []
+    plates = {}
+    for chunk in _chunks(text):
+        words = chunk.split()
+        # "AB12CDE", or "AB 12 CDE" spaced out as a whole item
+        plate = normalize_plate(chunk)
+        if plate and (len(words) == 1 or _SPLIT_PLATE.match(plate)):
+            plates[plate] = None
+            continue
+        i = 0
+        while i < len(words):
+            # "AB12 CDE": a plate written as two short words
+            if i + 1 < len(words) and len(words[i]) <= 4 and len(words[i + 1]) <= 4:
+                plate = normalize_plate(words[i] + words[i + 1])
+                if plate and _SPLIT_PLATE.match(plate):
+                    plates[plate] = None
+                    i += 2
+                    continue
+            plate = normalize_plate(words[i])
+            if plate:
+                plates[plate] = None
+            i += 1
+    return list(plates)
+
+
+def extract_owners(text):
+    """Owner names in a free-text field, as written"""
+    if not text:
+        return []
+    owners = {}
+    for chunk in _chunks(text, _OWNER_LIST):
+        name = " ".join(chunk.split())
+        if name.casefold() not in _NOT_OWNERS:
+            owners.setdefault(owner_key(name), name)
+    return list(owners.values())
+
+
+def report_rows(report):
+    """(plate, owner or None) pairs to index for one report_data dict"""
+    fields = report.get("fields") or {}
+    found = {key: extract_plates(fields.get(key)) for key in PLATE_FIELDS}
+    plates = dict.fromkeys(plate for key in PLATE_FIELDS for plate in found[key])
+    owners = extract_owners(fields.get(OWNER_FIELD))
+    if not owners:
+        return [(plate, None) for plate in plates]
+    owned = found[PDA_FIELD] or list(plates)
+    return ([(plate, None) for plate in plates if plate not in owned] +
+            [(plate, owner) for plate in owned for owner in owners])
+
+
+class PlateIndex:
+    """Inverted index of report_plates rows"""
+
+    def __init__(self):
+        self.reports = {}       # plate -> report ids, oldest first
+        self.owners = {}        # owner key -> {plate: None}
+        self.plate_owners = {}  # plate -> {owner name: None}
+        self.names = {}         # owner key -> name as first written
+        self.plates = []        # every plate, sorted, for suggestions
+        self.last_rowid = 0
+
+    def __len__(self):
+        return len(self.reports)
+
+    def load(self, rows):
+        """Add (rowid, report_id, plate, owner) rows in rowid order"""
+        new_plates = []
+        for rowid, report_id, plate, owner in rows:
+            ids = self.reports.get(plate)
+            if ids is None:
+                ids = self.reports[plate] = []
+                new_plates.append(plate)
+            # A report has one row per owner of a plate
+            if not ids or ids[-1] != report_id:
+                ids.append(report_id)
+            if owner:
+                key = owner_key(owner)
+                name = self.names.setdefault(key, owner)
+                self.owners.setdefault(key, {})[plate] = None
+                self.plate_owners.setdefault(plate, {})[name] = None
+            self.last_rowid = rowid
+        # One new plate is the usual case after the first load
+        if len(new_plates) == 1:
+            insort(self.plates, new_plates[0])
+        elif new_plates:
+            self.plates = sorted(self.plates + new_plates)
+
+    def report_ids(self, plate):
+        """Ids of reports naming a plate (any spelling), oldest first"""
+        return list(self.reports.get(normalize_plate(plate), ()))
+
+    def owner_plates(self, owner):
+        return list(self.owners.get(owner_key(owner), ()))
+
+    def owners_of(self, plate):
+        return list(self.plate_owners.get(normalize_plate(plate), ()))
+
+    def suggest(self, prefix, limit=8):
+        """Known plates starting with prefix, in order"""
+        prefix = _SEPARATORS.sub("", (prefix or "").upper())
+        if not prefix:
+            return []
+        start = bisect_left(self.plates, prefix)
+        found = []
+        for plate in self.plates[start:start + limit]:
+            if not plate.startswith(prefix):
+                break
+            found.append(plate)
+        return found
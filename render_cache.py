@@ -0,0 +1,123 @@
+"""Content-addressed cache of rendered reports
+
+Officers press Generate Report again and again while correcting a
+report, and every Streamlit session renders its own copy. RenderCache
+renders each distinct report once and shares it between sessions:
+
+    cache = RenderCache(max_bytes=32 * 1024 * 1024)
+    report = cache.render(record, header="web")
+    report.part1, report.part2, report.text
+
+The key is a hash of the inputs that reach the output: type, name, crime
+type, date, time, the NOV flag, the fields the type's template uses
+(stripped, as the template strips them) and the charges. Two records
+that render the same text get the same key.
+
+Part 1 and Part 2 are stored once, as one string, and split at an
+offset; callers that need to keep a report (like a Streamlit session)
+keep its key and a way to render it again (the archive id) instead of
+copies of the text. Least recently used entries are dropped once the
+cached text passes max_bytes.
+"""
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+import metrics
+import report_renderer
+
+# Rough per-entry bookkeeping cost on top of the text itself
+ENTRY_OVERHEAD = 200
+
+RENDER_CACHE = metrics.REGISTRY.counter(
+    "crime_report_render_cache_total", "Render cache lookups and evictions.", ("result",))
+
+
+class RenderedReport(namedtuple("RenderedReport", "key text split")):
+    """One rendered report: text is Part 1 followed by Part 2"""
+
+    __slots__ = ()
+
+    @property
+    def part1(self):
+        return self.text[:self.split]
+
+    @property
+    def part2(self):
+        return self.text[self.split:]
+
+
+def normalize(record):
+    """The parts of a record that affect its rendered text"""
+    report_type = record.get("type", "Gang")
+    fields = record.get("fields") or {}
+    return {
+        "type": report_type,
+        "name": record.get("name", ""),
+        "crime": record.get("crime", ""),
+        "date": record.get("date", ""),
+        "time": record.get("time", ""),
+        "nov": bool(record.get("nov")),
+        "fields": [(fields.get(key) or "").strip()
+                   for _, key in report_renderer.fields_for(report_type)],
+        "crimes": list(record.get("crimes") or ()),
+    }
+
+
+def cache_key(record, header="desktop"):
+    data = json.dumps([header, normalize(record)], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered reports, bounded by text size"""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return the cached report for a key, or None if it was evicted"""
+        with self.lock:
+            report = self.entries.get(key)
+            if report is not None:
+                self.entries.move_to_end(key)
+        return report
+
+    def render(self, record, header="desktop"):
+        """Return the RenderedReport for a record, rendering it on a miss"""
+        key = cache_key(record, header)
+        report = self.get(key)
+        if report is not None:
+            RENDER_CACHE.labels("hit").inc()
+            return report
+        RENDER_CACHE.labels("miss").inc()
+        part1, part2 = report_renderer.render(record, header)
+        report = RenderedReport(key, part1 + part2, len(part1))
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = report
+                self.bytes += sys.getsizeof(report.text) + ENTRY_OVERHEAD
+                self._evict()
+            else:
+                report = self.entries[key]
+        return report
+
+    def _evict(self):
+        # The newest entry always stays, even if it alone is over the cap
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.bytes -= sys.getsizeof(old.text) + ENTRY_OVERHEAD
+            RENDER_CACHE.labels("evicted").inc()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
@@ -0,0 +1,289 @@
+"""Local HTTP API for rendering reports
+
+Lets bots and other tools get Part 1 / Part 2 text without going through
+the Streamlit page. Output comes from report_renderer, the same code as
+the Tk "Generate Report" button. Records are rendered as sent, though:
+the Tk app first strips the name, crime type, date and time and fills
+in the current date and time when they are empty, so clients that want
+the same text should do that too.
+
+    python report_api.py --port 8765 --workers 4
+
+    POST /render         one report_data record   -> {"part1": ..., "part2": ...}
+    POST /render/batch   {"records": [...]}        -> {"results": [{"part1": ..., "part2": ...}
+                                                                   or {"error": ...}, ...]}
+    GET  /health         -> {"status": "ok"}
+    GET  /metrics        Prometheus text
+
+Part 1 uses the Tk layout; add ?header=web (or "header": "web" in a
+batch body) for the Streamlit layout.
+
+The server is a small HTTP/1.1 implementation on asyncio: connections
+are kept alive and pipelined requests are answered in order. Rendering
+takes microseconds, so one event loop per process is enough. --workers
+starts that many processes sharing the port (SO_REUSEPORT) to use more
+cores; each process then keeps its own /metrics. Only the standard
+library is needed. api_load_test.py measures throughput.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+import report_renderer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_BATCH = 10_000
+IDLE_TIMEOUT = 15
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 501: "Not Implemented"}
+TEXT_FIELDS = ("name", "crime", "date", "time")
+
+logger = logging.getLogger(__name__)
+
+
+class RequestError(Exception):
+    """Client error; turned into a response with this status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def validate(record):
+    """Check a record has the shapes render() expects"""
+    if not isinstance(record, dict):
+        raise RequestError(400, "record must be a JSON object")
+    report_type = record.get("type", "Gang")
+    if report_type not in report_renderer.REPORT_TYPES:
+        raise RequestError(400, f"type must be one of {', '.join(report_renderer.REPORT_TYPES)}")
+    for key in TEXT_FIELDS:
+        if not isinstance(record.get(key, ""), str):
+            raise RequestError(400, f"{key} must be a string")
+    crimes = record.get("crimes") or []
+    if not isinstance(crimes, list) or not all(isinstance(crime, str) for crime in crimes):
+        raise RequestError(400, "crimes must be a list of strings")
+    fields = record.get("fields") or {}
+    if not isinstance(fields, dict) or not all(isinstance(value, str) for value in fields.values()):
+        raise RequestError(400, "fields must be an object of strings")
+    return record
+
+
+def parse_header_choice(value):
+    header = value or "desktop"
+    if not isinstance(header, str) or header not in report_renderer.HEADER_FORMATS:
+        raise RequestError(400,
+                           f"header must be one of {', '.join(report_renderer.HEADER_FORMATS)}")
+    return header
+
+
+def render_one(record, header):
+    part1, part2 = report_renderer.render(validate(record), header)
+    return {"part1": part1, "part2": part2}
+
+
+def render_batch(body, header):
+    if isinstance(body, dict):
+        header = parse_header_choice(body.get("header") or header)
+        records = body.get("records")
+    else:
+        records = body
+    if not isinstance(records, list):
+        raise RequestError(400, 'expected {"records": [...]} or a JSON array')
+    if len(records) > MAX_BATCH:
+        raise RequestError(413, f"at most {MAX_BATCH} records per batch")
+    results = []
+    for record in records:
+        try:
+            results.append(render_one(record, header))
+        except RequestError as e:
+            results.append({"error": str(e)})
+    return {"results": results}
+
+
+def handle(method, target, body):
+    """Route one request; returns (status, content_type, payload bytes)"""
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    path = url.path.rstrip("/") or "/"
+
+    if path == "/health":
+        return 200, "application/json", b'{"status":"ok"}'
+    if path == "/metrics":
+        return 200, metrics.CONTENT_TYPE, metrics.REGISTRY.expose().encode("utf-8")
+    if path not in ("/render", "/render/batch"):
+        raise RequestError(404, f"no such endpoint: {path}")
+    if method != "POST":
+        raise RequestError(405, "use POST")
+
+    header = parse_header_choice(query.get("header", [""])[0])
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise RequestError(400, f"invalid JSON: {e}") from None
+
+    operation = "render" if path == "/render" else "render_batch"
+    with metrics.timed("api", operation):
+        result = render_one(data, header) if operation == "render" else render_batch(data, header)
+    return 200, "application/json", json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+
+def response(status, content_type, payload, keep_alive):
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+    if keep_alive:
+        head += f"Keep-Alive: timeout={IDLE_TIMEOUT}\r\n"
+    return head.encode("latin-1") + b"\r\n" + payload
+
+
+def error_response(status, message, keep_alive=False):
+    payload = json.dumps({"error": message}).encode("utf-8")
+    return response(status, "application/json", payload, keep_alive)
+
+
+async def read_request(reader):
+    """Read one request; returns (method, target, version, headers, body) or None at EOF"""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise RequestError(400, "incomplete request") from None
+        return None
+    except asyncio.LimitOverrunError:
+        raise RequestError(431, "request header too large") from None
+    except asyncio.TimeoutError:
+        return None
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "malformed request line") from None
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise RequestError(501, "chunked bodies are not supported; send Content-Length")
+    length = headers.get("content-length")
+    if length is None:
+        if method == "POST":
+            raise RequestError(411, "Content-Length required")
+        length = 0
+    try:
+        length = int(length)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise RequestError(400, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f"body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, version, headers, body
+
+
+def wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+async def serve_connection(reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except RequestError as e:
+                writer.write(error_response(e.status, str(e)))
+                break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if request is None:
+                break
+
+            method, target, version, headers, body = request
+            keep_alive = wants_keep_alive(version, headers)
+            try:
+                status, content_type, payload = handle(method, target, body)
+                writer.write(response(status, content_type, payload, keep_alive))
+            except RequestError as e:
+                writer.write(error_response(e.status, str(e), keep_alive))
+            except Exception:
+                logger.exception("Failed to handle %s %s", method, target)
+                writer.write(error_response(500, "internal error", keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, reuse_port=False, ready=None):
+    server = await asyncio.start_server(serve_connection, host, port, limit=MAX_HEADER_BYTES,
+                                        reuse_port=reuse_port or None, backlog=1024)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def run_worker(host, port, reuse_port, ready=None):
+    try:
+        asyncio.run(serve(host, port, reuse_port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve report rendering over HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to bind (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="server processes sharing the port (default: 1)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.workers <= 1:
+        logger.info("Serving on http://%s:%d", args.host, args.port)
+        run_worker(args.host, args.port, False)
+        return 0
+
+    processes = [multiprocessing.Process(target=run_worker, args=(args.host, args.port, True),
+                                         daemon=True)
+                 for _ in range(args.workers)]
+    for process in processes:
+        process.start()
+    logger.info("Serving on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    # Take the workers down with us on SIGTERM as well as Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,523 @@
+"""Indexed report archive
+
+Every generated report's ``report_data`` dict is appended to a single
+SQLite database in WAL mode instead of living only in loose .txt/.json
+pairs. Name, report type, date and charge are indexed so lookups stay
+fast however many reports have been archived.
+
+Charges are not stored as strings. Each report keeps a fixed-width
+bitmask against the charge catalog (see charge_catalog) plus the catalog
+version it was encoded with, and the charge index holds ordinals.
+Charges missing from the catalog are kept verbatim in the JSON.
+
+Each report also stores its date and time as a UTC epoch (see
+report_time), NULL when the strings could not be converted. A TimeIndex
+of (epoch, id) pairs reads the reports added since its last query first,
+including those archived by another process, so "every report between X
+and Y" is two bisections and a slice.
+
+Hourly and daily counts by type, NOV flag and charge are kept in a
+rollups table (see report_rollups) that is updated in the same
+transaction as every insert.
+
+License plates and car owners named in a report are stored in
+report_plates (see plate_index). Lookups go through an in-memory
+PlateIndex that reads the rows added since its last lookup first, so it
+also sees reports archived by the other front-end. Names and crime types
+are searched by similarity the same way, through a trigram index (see
+name_search) that catches up on reports by id.
+
+The archive location defaults to reports.db in the working directory and
+can be changed with the CRIME_REPORT_ARCHIVE environment variable.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+import charge_catalog
+import name_search
+import plate_index
+import report_rollups
+import report_time
+
+DEFAULT_PATH = os.environ.get("CRIME_REPORT_ARCHIVE", "reports.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    crime TEXT NOT NULL,
+    date TEXT NOT NULL,
+    date_key INTEGER,
+    time TEXT NOT NULL,
+    nov INTEGER NOT NULL DEFAULT 0,
+    charges BLOB,
+    catalog_version INTEGER,
+    data TEXT NOT NULL,
+    created REAL NOT NULL,
+    epoch INTEGER
+);
+CREATE TABLE IF NOT EXISTS charge_index (
+    ordinal INTEGER NOT NULL,
+    report_id INTEGER NOT NULL,
+    PRIMARY KEY (ordinal, report_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_reports_name ON reports (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_reports_type_date ON reports (type, date_key);
+CREATE INDEX IF NOT EXISTS idx_reports_date ON reports (date_key);
+CREATE INDEX IF NOT EXISTS idx_reports_crime ON reports (crime COLLATE NOCASE);
+"""
+
+
+def date_key(date):
+    """Turn DD.MM.YYYY into a sortable YYYYMMDD integer, or None"""
+    try:
+        day, month, year = (int(part) for part in date.strip().split("."))
+    except (AttributeError, ValueError):
+        return None
+    if not (1 <= day <= 31 and 1 <= month <= 12):
+        return None
+    return year * 10000 + month * 100 + day
+
+
+class TimeIndex:
+    """Report ids sorted by epoch, for range queries by bisection"""
+
+    def __init__(self):
+        self.epochs = array("q")
+        self.ids = array("q")
+        self.last_id = 0
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def load(self, rows):
+        """Add (epoch, id) rows in id order; rows without an epoch are skipped"""
+        pairs = []
+        for epoch, report_id in rows:
+            if epoch is not None:
+                pairs.append((epoch, report_id))
+            self.last_id = report_id
+        if len(pairs) < 64:
+            for epoch, report_id in pairs:
+                self.add(epoch, report_id)
+            return
+        # The first load, or a big import by another process: sort once
+        pairs.extend(zip(self.epochs, self.ids))
+        pairs.sort()
+        self.epochs = array("q", (epoch for epoch, _ in pairs))
+        self.ids = array("q", (report_id for _, report_id in pairs))
+
+    def add(self, epoch, report_id):
+        # New reports are nearly always the latest, which is an append
+        if not self.epochs or epoch >= self.epochs[-1]:
+            self.epochs.append(epoch)
+            self.ids.append(report_id)
+        else:
+            i = bisect_right(self.epochs, epoch)
+            self.epochs.insert(i, epoch)
+            self.ids.insert(i, report_id)
+
+    def between(self, start, end):
+        """Ids of reports with start <= epoch <= end, oldest first"""
+        return self.ids[bisect_left(self.epochs, start):bisect_right(self.epochs, end)].tolist()
+
+
+def report_epochs(reports):
+    """Epochs for a batch of reports: their own "epoch", else converted in one pass"""
+    missing = [i for i, report in enumerate(reports) if report.get("epoch") is None]
+    epochs = [report.get("epoch") for report in reports]
+    if missing:
+        converted = report_time.epochs([str(reports[i].get("date", "")) for i in missing],
+                                       [str(reports[i].get("time", "")) for i in missing])
+        for i, epoch in zip(missing, converted.tolist()):
+            epochs[i] = epoch if epoch >= 0 else None
+    return epochs
+
+
+class ReportArchive:
+    """Append-only store of report_data dicts backed by SQLite"""
+
+    def __init__(self, path=None, catalog=None):
+        self.path = path or DEFAULT_PATH
+        self.catalog = catalog or charge_catalog.load_catalog()
+        # One connection shared by the UI threads, serialised by a lock
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.time_index = TimeIndex()
+        self.plate_index = plate_index.PlateIndex()
+        self.name_index = name_search.ReportNameIndex()
+        report_rollups.register(self.conn)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self._migrate()
+            self._migrate_epochs()
+            self._migrate_rollups()
+            self._migrate_plates()
+            self.conn.commit()
+        self.conn.create_function("mask_contains", 2, charge_catalog.mask_contains,
+                                  deterministic=True)
+
+    def _migrate(self):
+        """Convert archives written before charges were stored as bitmasks"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(reports)")}
+        if "charges" in columns:
+            return
+        self.conn.execute("ALTER TABLE reports ADD COLUMN charges BLOB")
+        self.conn.execute("ALTER TABLE reports ADD COLUMN catalog_version INTEGER")
+        rows = self.conn.execute("SELECT id, data FROM reports").fetchall()
+        for report_id, data in rows:
+            report = json.loads(data)
+            mask, unknown = self.catalog.encode(report.pop("crimes", None) or ())
+            if unknown:
+                report["extra_crimes"] = unknown
+            self.conn.execute(
+                "UPDATE reports SET charges = ?, catalog_version = ?, data = ? WHERE id = ?",
+                (mask, self.catalog.version, json.dumps(report, ensure_ascii=False), report_id))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO charge_index (ordinal, report_id) VALUES (?, ?)",
+                [(ordinal, report_id) for ordinal in self._ordinals(mask)])
+        self.conn.execute("DROP TABLE IF EXISTS report_charges")
+
+    def _migrate_epochs(self, batch_size=50_000):
+        """Add and fill the epoch column of archives written before it existed"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(reports)")}
+        if "epoch" in columns:
+            return
+        self.conn.execute("ALTER TABLE reports ADD COLUMN epoch INTEGER")
+        last_id = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, date, time FROM reports WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            ids, dates, times = zip(*rows)
+            epochs = report_time.epochs(dates, times).tolist()
+            self.conn.executemany("UPDATE reports SET epoch = ? WHERE id = ?",
+                                  [(epoch, report_id) for report_id, epoch in zip(ids, epochs)
+                                   if epoch >= 0])
+            last_id = ids[-1]
+
+    def _migrate_rollups(self):
+        """Create the rollups table, counting any reports already archived"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups'").fetchone()
+        if exists:
+            return
+        self.conn.executescript(report_rollups.SCHEMA)
+        report_rollups.rebuild(self.conn, self.catalog)
+
+    def _migrate_plates(self, batch_size=10_000):
+        """Create report_plates, indexing the plates of reports already archived"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'report_plates'").fetchone()
+        if exists:
+            return
+        self.conn.executescript(plate_index.SCHEMA)
+        last_id = 0
+        while True:
+            rows = self.conn.execute("SELECT id, data FROM reports WHERE id > ? ORDER BY id LIMIT ?",
+                                     (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            self.conn.executemany(
+                "INSERT INTO report_plates (report_id, plate, owner) VALUES (?, ?, ?)",
+                [(report_id, plate, owner) for report_id, data in rows
+                 for plate, owner in plate_index.report_rows(json.loads(data))])
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def _ordinals(mask):
+        """Yield the ordinals set in a mask"""
+        mask = int.from_bytes(mask, "little")
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _insert(self, report, epoch, rollup):
+        """Insert one report; caller holds the lock, writes the rollup and commits"""
+        mask, unknown = self.catalog.encode(report.get("crimes") or ())
+        data = {key: value for key, value in report.items() if key != "crimes"}
+        if unknown:
+            data["extra_crimes"] = unknown
+        cursor = self.conn.execute(
+            "INSERT INTO reports (type, name, crime, date, date_key, time, nov, charges, "
+            "catalog_version, data, created, epoch) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (report.get("type", "Gang"), report.get("name", ""), report.get("crime", ""),
+             report.get("date", ""), date_key(report.get("date", "")), report.get("time", ""),
+             1 if report.get("nov") else 0, mask, self.catalog.version,
+             json.dumps(data, ensure_ascii=False), report.get("created", time.time()), epoch))
+        report_id = cursor.lastrowid
+        ordinals = list(self._ordinals(mask))
+        self.conn.executemany(
+            "INSERT INTO charge_index (ordinal, report_id) VALUES (?, ?)",
+            [(ordinal, report_id) for ordinal in ordinals])
+        rollup.add(epoch, report.get("type", "Gang"), report.get("nov"), ordinals)
+        self.conn.executemany(
+            "INSERT INTO report_plates (report_id, plate, owner) VALUES (?, ?, ?)",
+            [(report_id, plate, owner) for plate, owner in plate_index.report_rows(report)])
+        return report_id
+
+    def _load(self, data, mask):
+        """Rebuild a report_data dict from a stored row"""
+        report = json.loads(data)
+        if mask is not None:
+            report["crimes"] = self.catalog.decode(mask) + report.pop("extra_crimes", [])
+        return report
+
+    def add(self, report):
+        """Archive one report_data dict and return its id"""
+        epoch = report.get("epoch")
+        if epoch is None:
+            epoch = report_time.try_epoch(report.get("date", ""), report.get("time", ""))
+        rollup = report_rollups.RollupBatch(self.catalog.size)
+        with self.lock:
+            with self.conn:
+                report_id = self._insert(report, epoch, rollup)
+                rollup.write(self.conn)
+        return report_id
+
+    def add_many(self, reports, batch_size=1000):
+        """Archive an iterable of reports in batched transactions
+
+        Returns the number of reports written.
+        """
+        count = 0
+        batch = []
+        for report in reports:
+            batch.append(report)
+            if len(batch) >= batch_size:
+                count += self._write_batch(batch)
+                batch = []
+        if batch:
+            count += self._write_batch(batch)
+        return count
+
+    def _write_batch(self, batch):
+        epochs = report_epochs(batch)
+        rollup = report_rollups.RollupBatch(self.catalog.size)
+        with self.lock:
+            with self.conn:
+                for report, epoch in zip(batch, epochs):
+                    self._insert(report, epoch, rollup)
+                rollup.write(self.conn)
+        return len(batch)
+
+    def get(self, report_id):
+        """Return the report_data dict stored under an id, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT data, charges FROM reports WHERE id = ?",
+                                    (report_id,)).fetchone()
+        return self._load(*row) if row else None
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
+    def find_ids(self, name=None, report_type=None, date=None, charge=None, crime=None,
+                 date_from=None, date_to=None, charges=None, limit=100):
+        """Return ids of matching reports, newest first
+
+        Every filter is optional and they are combined with AND. Dates are
+        DD.MM.YYYY strings; name and crime type match case-insensitively.
+        charges is a list of charge labels that must all be present: the
+        first one in the catalog is looked up in the charge index and the
+        rest are checked with a bitwise AND against each candidate's mask.
+        Labels missing from the catalog are matched against the charges
+        kept verbatim in the JSON.
+        """
+        clauses = []
+        params = []
+        table = "reports"
+        wanted = ([charge] if charge is not None else []) + list(charges or ())
+        known = [label for label in wanted if label in self.catalog]
+        if known:
+            first = self.catalog.get(known[0]).ordinal
+            table = "charge_index JOIN reports ON reports.id = charge_index.report_id"
+            clauses.append("charge_index.ordinal = ?")
+            params.append(first)
+            if len(known) > 1:
+                needle, _ = self.catalog.encode(known[1:])
+                clauses.append("mask_contains(reports.charges, ?)")
+                params.append(needle)
+        for label in dict.fromkeys(label for label in wanted if label not in self.catalog):
+            # The substring test skips most rows before the JSON is parsed
+            clauses.append("instr(reports.data, ?) > 0 AND EXISTS (SELECT 1 FROM "
+                           "json_each(reports.data, '$.extra_crimes') WHERE value = ?)")
+            params.extend((json.dumps(label, ensure_ascii=False), label))
+        if name is not None:
+            clauses.append("reports.name = ? COLLATE NOCASE")
+            params.append(name)
+        if crime is not None:
+            clauses.append("reports.crime = ? COLLATE NOCASE")
+            params.append(crime)
+        if report_type is not None:
+            clauses.append("reports.type = ?")
+            params.append(report_type)
+        if date is not None:
+            clauses.append("reports.date_key = ?")
+            params.append(date_key(date))
+        if date_from is not None:
+            clauses.append("reports.date_key >= ?")
+            params.append(date_key(date_from))
+        if date_to is not None:
+            clauses.append("reports.date_key <= ?")
+            params.append(date_key(date_to))
+        sql = f"SELECT reports.id FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY reports.id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return [row[0] for row in self.conn.execute(sql, params)]
+
+    def find(self, **filters):
+        """Return matching report_data dicts, newest first (see find_ids)"""
+        ids = self.find_ids(**filters)
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT data, charges FROM reports WHERE id IN ({marks}) ORDER BY id DESC",
+                ids).fetchall()
+        return [self._load(*row) for row in rows]
+
+    def _load_time_index(self):
+        """The time index with every report archived so far; caller holds the lock"""
+        index = self.time_index
+        index.load(self.conn.execute("SELECT epoch, id FROM reports WHERE id > ? ORDER BY id",
+                                     (index.last_id,)))
+        return index
+
+    def ids_between(self, start, end):
+        """Ids of reports timed between two UTC epochs (inclusive), oldest first"""
+        with self.lock:
+            return self._load_time_index().between(start, end)
+
+    def find_between(self, start, end):
+        """report_data dicts timed between two UTC epochs (inclusive), oldest first"""
+        ids = self.ids_between(start, end)
+        reports = []
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            marks = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = dict((row[0], row[1:]) for row in self.conn.execute(
+                    f"SELECT id, data, charges FROM reports WHERE id IN ({marks})", chunk))
+            reports.extend(self._load(*rows[report_id]) for report_id in chunk)
+        return reports
+
+    def iter_reports(self, batch_size=1000):
+        """Yield (id, report_data) for every archived report in id order"""
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT id, data, charges FROM reports WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for report_id, data, mask in rows:
+                yield report_id, self._load(data, mask)
+            last_id = rows[-1][0]
+
+    def _plates(self):
+        """The plate index with every row archived so far; caller holds the lock"""
+        index = self.plate_index
+        index.load(self.conn.execute(
+            "SELECT rowid, report_id, plate, owner FROM report_plates WHERE rowid > ? ORDER BY rowid",
+            (index.last_rowid,)))
+        return index
+
+    def plate_report_ids(self, plate):
+        """Ids of reports naming a plate, in any spelling, newest first"""
+        with self.lock:
+            return self._plates().report_ids(plate)[::-1]
+
+    def find_plate(self, plate, limit=100):
+        """report_data dicts of the reports naming a plate, newest first"""
+        ids = self.plate_report_ids(plate)[:limit]
+        return [report for report in map(self.get, ids) if report is not None]
+
+    def owner_plates(self, owner):
+        """Plates searched in the PDA for a car owner"""
+        with self.lock:
+            return self._plates().owner_plates(owner)
+
+    def plate_owners(self, plate):
+        """Owners found in the PDA for a plate"""
+        with self.lock:
+            return self._plates().owners_of(plate)
+
+    def suggest_plates(self, prefix, limit=8):
+        """Known plates starting with prefix, for completion as it is typed"""
+        with self.lock:
+            return self._plates().suggest(prefix, limit)
+
+    def _names(self):
+        """The name index with every report archived so far; caller holds the lock"""
+        index = self.name_index
+        index.load(self.conn.execute("SELECT id, name, crime FROM reports WHERE id > ? ORDER BY id",
+                                     (index.last_id,)))
+        return index
+
+    def search_names(self, query, limit=10):
+        """Report names most like query, as name_search.Match tuples, best first"""
+        with self.lock:
+            return self._names().names.search(query, limit)
+
+    def find_name(self, name, limit=100):
+        """report_data dicts filed under a name, however it was cased or spaced, newest first"""
+        with self.lock:
+            ids = self._names().names.report_ids(name)[::-1][:limit]
+        return [report for report in map(self.get, ids) if report is not None]
+
+    def search_crimes(self, query, limit=10):
+        """Crime types most like query, as name_search.Match tuples, best first"""
+        with self.lock:
+            return self._names().crimes.search(query, limit)
+
+    def find_crime(self, crime, limit=100):
+        """report_data dicts of a crime type, however it was cased or spaced, newest first"""
+        with self.lock:
+            ids = self._names().crimes.report_ids(crime)[::-1][:limit]
+        return [report for report in map(self.get, ids) if report is not None]
+
+    def rollups(self, period, start, end, report_type=None, nov=None):
+        """Report counts per "hour" or "day" bucket from start to end
+
+        Returns report_rollups.RollupRow tuples, oldest first; their
+        charge counts line up with catalog.by_ordinal. See
+        report_rollups.query for the bucket values.
+        """
+        with self.lock:
+            return report_rollups.query(self.conn, period, start, end, self.catalog.size,
+                                        report_type, nov)
+
+    def rebuild_rollups(self):
+        """Recount the rollups table from every archived report"""
+        with self.lock:
+            with self.conn:
+                return report_rollups.rebuild(self.conn, self.catalog)
@@ -0,0 +1,490 @@
+"""Webhook delivery of finished reports
+
+Instead of copying Part 1 and Part 2 into the channel by hand, a report
+can be pushed to a chat webhook (Discord-style by default):
+
+    delivery = WebhookDelivery("https://discord.com/api/webhooks/...")
+    delivery.submit(part1, part2)     # returns once the parts are queued
+    ...
+    delivery.close()
+
+submit() only writes to the outbox, an SQLite queue (outbox.db, or the
+CRIME_REPORT_OUTBOX environment variable), so the UI never waits on the
+network and nothing queued is lost if the app closes or crashes. A
+worker thread sends the queue in order:
+
+- parts longer than the webhook's size limit are split on line
+  boundaries into several messages when they are queued;
+- rows are claimed from the outbox in batches and sent over one
+  keep-alive connection; with coalesce=True consecutive short messages
+  are also joined into one post;
+- a token bucket keeps posts under the webhook's rate limit, and a 429
+  pauses the bucket for as long as the server's Retry-After asks;
+- network errors and 5xx responses are retried with exponential
+  backoff and jitter; a message is given up ("dead") after max_attempts,
+  or at once on any other 4xx, and stays in the outbox for inspection.
+
+Messages go out in the order they were queued: a message that is waiting
+to be retried holds back the ones behind it, so Part 2 never lands
+before its Part 1. Claimed rows carry a lease, so a second process
+sharing the outbox, or a restart after a crash, cannot send a message
+twice while it is in flight; delivery is at least once.
+
+The webhook is configured with CRIME_REPORT_WEBHOOK; delivery is off
+when it is unset. delivery_load_test.py runs a whole shift against a
+local stub receiver.
+
+    python report_delivery.py --status
+    python report_delivery.py --retry-dead
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import metrics
+
+DEFAULT_PATH = os.environ.get("CRIME_REPORT_OUTBOX", "outbox.db")
+WEBHOOK_URL = os.environ.get("CRIME_REPORT_WEBHOOK", "")
+USER_AGENT = "crime-report-system webhook delivery"
+
+# Discord's limits: 2000 characters per message, 5 posts per 2 seconds
+# per webhook and 30 per minute per channel
+MAX_CHARS = 2000
+RATE = 0.5
+BURST = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    body TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox (state, id);
+"""
+
+# One queued message; attempts counts failed sends so far
+Message = namedtuple("Message", "id body attempts")
+
+DELIVERIES = metrics.REGISTRY.counter(
+    "crime_report_webhook_messages_total", "Webhook messages, by outcome.", ("outcome",))
+
+
+def split_message(text, limit=MAX_CHARS):
+    """Split text into chunks of at most limit characters
+
+    Splits fall on line breaks where possible, so an evidence line is
+    never cut in two unless it is longer than the limit by itself.
+    """
+    text = text.strip("\n")
+    if len(text) <= limit:
+        return [text] if text.strip() else []
+    chunks = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if not current:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current += "\n" + line
+        else:
+            chunks.append(current)
+            current = line
+    if current.strip():
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def backoff(attempts, base=1.0, cap=300.0):
+    """Seconds to wait before the next try: exponential with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempts))
+
+
+def retry_after(headers, body):
+    """Seconds the server asked us to wait after a 429, or None"""
+    value = headers.get("retry-after")
+    if value is not None:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+    try:
+        # Discord also puts it in the JSON body
+        return max(0.0, float(json.loads(body)["retry_after"]))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class TokenBucket:
+    """rate tokens per second, at most burst saved up"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Take a token if one is free; otherwise return the seconds to wait"""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """Hold every send for seconds and start again with an empty bucket"""
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+
+class Outbox:
+    """Persistent FIFO of messages waiting to be posted"""
+
+    def __init__(self, path=None, lease=120.0):
+        self.path = path or DEFAULT_PATH
+        self.lease = lease
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30,
+                                    isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def enqueue(self, bodies):
+        """Append messages in one transaction; returns how many were queued"""
+        now = time.time()
+        rows = [(body, now) for body in bodies]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany("INSERT INTO outbox (body, created) VALUES (?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def claim(self, limit):
+        """Lease the next messages that are due, in queue order
+
+        Returns (messages, wait): wait is the number of seconds until the
+        head of the queue is due when nothing could be claimed, or None
+        if the queue is empty.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    "SELECT id, body, attempts, next_attempt, lease_until FROM outbox "
+                    "WHERE state = 'pending' ORDER BY id LIMIT ?", (limit,)).fetchall()
+                messages = []
+                for message_id, body, attempts, next_attempt, lease_until in rows:
+                    # Stop at the first message that is not ready, to keep the order
+                    if next_attempt > now or lease_until > now:
+                        break
+                    messages.append(Message(message_id, body, attempts))
+                if messages:
+                    self.conn.executemany(
+                        "UPDATE outbox SET lease_until = ? WHERE id = ?",
+                        [(now + self.lease, message.id) for message in messages])
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        if messages or not rows:
+            return messages, None
+        _, _, _, next_attempt, lease_until = rows[0]
+        return [], max(next_attempt, lease_until) - now
+
+    def delete(self, ids):
+        """Drop delivered messages"""
+        with self.lock:
+            self.conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def release(self, ids, delay=0.0, error=None, count_attempt=True):
+        """Put claimed messages back, due again in delay seconds"""
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE outbox SET lease_until = 0, next_attempt = ?, last_error = ?, "
+                "attempts = attempts + ? WHERE id = ?",
+                [(time.time() + delay, error, 1 if count_attempt else 0, i) for i in ids])
+
+    def bury(self, ids, error):
+        """Give up on messages; they stay in the outbox as 'dead'"""
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE outbox SET state = 'dead', lease_until = 0, last_error = ?, "
+                "attempts = attempts + 1 WHERE id = ?", [(error, i) for i in ids])
+
+    def revive(self):
+        """Queue every dead message again; returns how many"""
+        with self.lock:
+            return self.conn.execute(
+                "UPDATE outbox SET state = 'pending', attempts = 0, next_attempt = 0 "
+                "WHERE state = 'dead'").rowcount
+
+    def counts(self):
+        """Return {state: number of messages}"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT state, COUNT(*) FROM outbox GROUP BY state"))
+
+    def dead(self, limit=20):
+        """Return (id, last_error, body) of the oldest dead messages"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, last_error, body FROM outbox WHERE state = 'dead' "
+                "ORDER BY id LIMIT ?", (limit,)).fetchall()
+
+
+class WebhookDelivery:
+    """Posts queued reports to a webhook from a background thread"""
+
+    def __init__(self, url, outbox=None, rate=RATE, burst=BURST, max_chars=MAX_CHARS,
+                 batch_size=20, coalesce=False, max_attempts=8, timeout=10.0,
+                 content_key="content"):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"not an http(s) webhook URL: {url!r}")
+        self.url = url
+        self.outbox = outbox if outbox is not None else Outbox()
+        self.bucket = TokenBucket(rate, burst)
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+        self.coalesce = coalesce
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.content_key = content_key
+        self.connection = None
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="webhook-delivery", daemon=True)
+        self.thread.start()
+
+    def submit(self, *parts):
+        """Queue the parts of a report, split to fit; returns the number of messages"""
+        bodies = [chunk for part in parts for chunk in split_message(part, self.max_chars)]
+        if not bodies:
+            return 0
+        count = self.outbox.enqueue(bodies)
+        self.wakeup.set()
+        return count
+
+    def pending(self):
+        return self.outbox.counts().get("pending", 0)
+
+    def close(self, timeout=5.0):
+        """Stop the worker; whatever is still queued is sent next time"""
+        self.stopping.set()
+        self.wakeup.set()
+        self.thread.join(timeout)
+        self._disconnect()
+
+    def _sleep(self, seconds):
+        """Wait up to seconds, or until new work arrives; False once stopping"""
+        if seconds is None or seconds > 0:
+            self.wakeup.wait(seconds)
+        self.wakeup.clear()
+        return not self.stopping.is_set()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                messages, wait = self.outbox.claim(self.batch_size)
+            except sqlite3.Error:
+                messages, wait = [], 1.0
+            if not messages:
+                # Wake when the head is due or a submit() arrives; poll in
+                # case another process is adding to the same outbox
+                if not self._sleep(min(wait, 5.0) if wait is not None else 5.0):
+                    return
+                continue
+            try:
+                self._send_batch(messages)
+            except sqlite3.Error:
+                # The claimed rows' lease runs out and they are sent again
+                if not self._sleep(1.0):
+                    return
+
+    def _groups(self, messages):
+        """Messages to post, as lists of rows; joined only with coalesce"""
+        if not self.coalesce:
+            return [[message] for message in messages]
+        groups = []
+        size = 0
+        for message in messages:
+            if groups and size + 2 + len(message.body) <= self.max_chars:
+                groups[-1].append(message)
+                size += 2 + len(message.body)
+            else:
+                groups.append([message])
+                size = len(message.body)
+        return groups
+
+    def _send_batch(self, messages):
+        groups = self._groups(messages)
+        for n, group in enumerate(groups):
+            # Wait for a token; stopping hands the unsent rows straight back
+            while True:
+                wait = self.bucket.take()
+                if not wait:
+                    break
+                if not self._sleep(wait):
+                    self.outbox.release([m.id for g in groups[n:] for m in g],
+                                        count_attempt=False)
+                    return
+            ids = [message.id for message in group]
+            if not self._deliver(group, ids):
+                # Keep the order: later messages wait behind the failed one
+                self.outbox.release([m.id for g in groups[n + 1:] for m in g],
+                                    count_attempt=False)
+                return
+
+    def _deliver(self, group, ids):
+        """Post one message; returns False if the rest of the batch must wait"""
+        body = "\n\n".join(message.body for message in group)
+        payload = json.dumps({self.content_key: body}).encode("utf-8")
+        attempts = max(message.attempts for message in group)
+        try:
+            with metrics.timed("webhook", "post"):
+                status, headers, reply = self._post(payload)
+        except (OSError, http.client.HTTPException) as e:
+            self._disconnect()
+            return self._failed(ids, attempts, str(e) or type(e).__name__)
+
+        if 200 <= status < 300:
+            self.outbox.delete(ids)
+            DELIVERIES.labels("sent").inc(len(ids))
+            return True
+        error = f"HTTP {status}: {reply[:200].decode('utf-8', 'replace')}"
+        if status == 429:
+            wait = retry_after(headers, reply)
+            wait = backoff(attempts) if wait is None else wait
+            self.bucket.pause(wait)
+            # Being rate limited is not the message's fault
+            self.outbox.release(ids, wait, error, count_attempt=False)
+            DELIVERIES.labels("rate_limited").inc(len(ids))
+            return False
+        if status >= 500 or status == 408:
+            return self._failed(ids, attempts, error)
+        # Any other 4xx will fail the same way every time
+        self.outbox.bury(ids, error)
+        DELIVERIES.labels("dead").inc(len(ids))
+        metrics.OPERATION_ERRORS.labels("webhook", "post").inc()
+        return True
+
+    def _failed(self, ids, attempts, error):
+        metrics.OPERATION_ERRORS.labels("webhook", "post").inc()
+        if attempts + 1 >= self.max_attempts:
+            self.outbox.bury(ids, error)
+            DELIVERIES.labels("dead").inc(len(ids))
+            return True
+        self.outbox.release(ids, backoff(attempts), error)
+        DELIVERIES.labels("retried").inc(len(ids))
+        return False
+
+    def _connect(self):
+        parts = urlsplit(self.url)
+        if parts.scheme == "https":
+            return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=self.timeout)
+        return http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.timeout)
+
+    def _disconnect(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _post(self, payload):
+        """POST over the kept-alive connection; returns (status, headers, body)"""
+        parts = urlsplit(self.url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        reused = self.connection is not None
+        if not reused:
+            self.connection = self._connect()
+        try:
+            self.connection.request("POST", path, body=payload, headers={
+                "Content-Type": "application/json", "User-Agent": USER_AGENT})
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            self._disconnect()
+            if not reused:
+                raise
+            # The server dropped the idle connection; try once on a new one
+            return self._post(payload)
+        reply = response.read()
+        headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.will_close:
+            self._disconnect()
+        return response.status, headers, reply
+
+
+def from_environment(**options):
+    """The configured WebhookDelivery, or None when CRIME_REPORT_WEBHOOK is unset"""
+    if not WEBHOOK_URL:
+        return None
+    return WebhookDelivery(WEBHOOK_URL, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the webhook outbox")
+    parser.add_argument("--outbox", default=DEFAULT_PATH, help=f"outbox file (default: {DEFAULT_PATH})")
+    parser.add_argument("--status", action="store_true", help="show queued and dead messages")
+    parser.add_argument("--retry-dead", action="store_true", help="queue dead messages again")
+    args = parser.parse_args(argv)
+
+    with Outbox(args.outbox) as outbox:
+        if args.retry_dead:
+            print(f"{outbox.revive()} dead messages queued again")
+        counts = outbox.counts()
+        print(f"{counts.get('pending', 0)} pending, {counts.get('dead', 0)} dead")
+        if args.status:
+            for message_id, error, body in outbox.dead():
+                first_line = body.split("\n", 1)[0]
+                print(f"#{message_id}\t{error}\t{first_line[:60]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
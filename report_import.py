@@ -0,0 +1,261 @@
+"""Import saved report files into the archive
+
+Walks directory trees for reports written by Save to File
+(``<name>_<date>.txt`` with a matching ``.json``) and Streamlit downloads
+(``*_report.txt``, text only), turns each one back into a report_data
+record and loads the records into the archive in bulk.
+
+    python report_import.py ~/reports /mnt/share/reports --archive reports.db
+
+Parsing runs in a process pool. Every loaded file is appended to a
+checkpoint file, so an interrupted import picks up where it stopped when
+run again with the same checkpoint. Files that failed are not recorded
+and are tried again.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import report_archive
+import report_renderer
+from bulk_generate import chunked
+
+SEPARATOR_LINE = report_renderer.SEPARATOR.rstrip("\n")
+CRIMES_PREFIX = "Crimes Committed"
+LABEL_KEYS = {report_type: {label: key for label, key in fields}
+              for report_type, fields in report_renderer.FIELDS.items()}
+# Stored in NOT NULL text columns of the archive
+TEXT_KEYS = ("type", "name", "crime", "date", "time")
+
+
+class ParseError(ValueError):
+    """Raised when a file does not look like a generated report"""
+
+
+def parse_header(line):
+    """Parse a Part 1 header line into name, crime, date, time and nov"""
+    parts = line.split(" | ")
+    if len(parts) >= 4:
+        # Tk layout: name | crime | date | time
+        name, crime, date, rest = " | ".join(parts[:-3]), parts[-3], parts[-2], parts[-1]
+        time_text, _, nov = rest.partition(" ")
+    elif len(parts) == 3:
+        # Streamlit layout: name | crime | date time [Nov]
+        name, crime, rest = parts
+        date, _, rest = rest.partition(" ")
+        time_text, _, nov = rest.partition(" ")
+    else:
+        raise ParseError(f"unrecognised header: {line!r}")
+    return {"name": name, "crime": crime, "date": date, "time": time_text,
+            "nov": nov.strip().lower() == "nov"}
+
+
+def parse_report(text):
+    """Parse generated report text back into a report_data record"""
+    lines = text.splitlines()
+    if not lines:
+        raise ParseError("empty file")
+    record = parse_header(lines[0])
+
+    # Part 2 opens with "<type> Name: <name>"
+    try:
+        body_start = next(i for i, line in enumerate(lines[1:], 1) if line.strip())
+    except StopIteration:
+        raise ParseError("missing Part 2") from None
+    report_type, sep, _ = lines[body_start].partition(" Name: ")
+    if not sep:
+        raise ParseError(f"missing report type line: {lines[body_start]!r}")
+    record["type"] = report_type
+    label_keys = LABEL_KEYS.get(report_type, LABEL_KEYS["Family"])
+
+    # Remaining sections are delimited by ===== lines
+    sections = []
+    current = None
+    for line in lines[body_start + 1:]:
+        if line == SEPARATOR_LINE:
+            if current:
+                sections.append(current)
+            current = []
+        elif current is not None:
+            current.append(line)
+    if current:
+        sections.append(current)
+
+    fields = {}
+    crimes = []
+    for section in sections:
+        head, body = section[0], section[1:]
+        if head.startswith(CRIMES_PREFIX):
+            crimes = [line[2:] for line in body if line.startswith("- ")]
+            continue
+        if head.endswith(" N/A") and head[:-4] in label_keys:
+            fields[label_keys[head[:-4]]] = ""
+        elif head in label_keys:
+            fields[label_keys[head]] = "\n".join(body).strip()
+    record["crimes"] = crimes
+    record["fields"] = fields
+    return record
+
+
+def check_record(record, json_path):
+    """Reject sidecar values the archive cannot store, e.g. "name": null"""
+    for key in TEXT_KEYS:
+        if not isinstance(record.get(key, ""), str):
+            raise ValueError(f"{json_path}: {key} must be a string")
+    crimes = record.get("crimes") or []
+    if not isinstance(crimes, list) or not all(isinstance(crime, str) for crime in crimes):
+        raise ValueError(f"{json_path}: crimes must be a list of strings")
+    if not isinstance(record.get("fields") or {}, dict):
+        raise ValueError(f"{json_path}: fields must be an object")
+
+
+def load_file(path):
+    """Build a record for one .txt file, preferring its .json sidecar"""
+    json_path = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(json_path):
+        with open(json_path, encoding="utf-8") as f:
+            record = json.load(f)
+        if not isinstance(record, dict):
+            raise ValueError(f"{json_path} holds a JSON {type(record).__name__}, not an object")
+        check_record(record, json_path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            record = parse_report(f.read())
+    record["source"] = path
+    return record
+
+
+def parse_batch(paths):
+    """Parse a batch of files; returns (records, [(path, error)])"""
+    records = []
+    errors = []
+    for path in paths:
+        try:
+            records.append(load_file(path))
+        except (OSError, ValueError) as e:
+            errors.append((path, str(e)))
+    return records, errors
+
+
+def walk(roots):
+    """Yield every .txt path under the given directories"""
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.lower().endswith(".txt"):
+                    yield os.path.abspath(os.path.join(dirpath, filename))
+
+
+def read_checkpoint(path):
+    """Return the set of files already imported"""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def run_import(roots, archive, checkpoint=None, workers=None, batch_size=500, log=print):
+    """Import every report file under roots into archive
+
+    Returns a dict of counts and per-stage timings in seconds.
+    """
+    stats = {"found": 0, "skipped": 0, "imported": 0, "failed": 0,
+             "walk": 0.0, "parse": 0.0, "load": 0.0}
+
+    start = time.perf_counter()
+    done = read_checkpoint(checkpoint)
+    paths = []
+    for path in walk(roots):
+        stats["found"] += 1
+        if path in done:
+            stats["skipped"] += 1
+        else:
+            paths.append(path)
+    stats["walk"] = time.perf_counter() - start
+
+    checkpoint_file = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+
+    def load(result):
+        records, errors = result
+        for path, error in errors:
+            log(f"skipped {path}: {error}")
+        stats["failed"] += len(errors)
+        began = time.perf_counter()
+        try:
+            stats["imported"] += archive.add_many(records, batch_size=batch_size)
+        except sqlite3.Error:
+            # The failed transaction was rolled back; find the records to blame
+            loaded = []
+            for record in records:
+                try:
+                    archive.add(record)
+                except sqlite3.Error as e:
+                    log(f"skipped {record['source']}: {e}")
+                    stats["failed"] += 1
+                else:
+                    loaded.append(record)
+            stats["imported"] += len(loaded)
+            records = loaded
+        stats["load"] += time.perf_counter() - began
+        if checkpoint_file:
+            # Only loaded files: failed ones are tried again by the next run
+            checkpoint_file.writelines(r["source"] + "\n" for r in records)
+            checkpoint_file.flush()
+
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for batch in chunked(paths, batch_size):
+                pending.append(pool.submit(parse_batch, batch))
+                while len(pending) >= workers * 2:
+                    began = time.perf_counter()
+                    result = pending.popleft().result()
+                    stats["parse"] += time.perf_counter() - began
+                    load(result)
+            while pending:
+                began = time.perf_counter()
+                result = pending.popleft().result()
+                stats["parse"] += time.perf_counter() - began
+                load(result)
+    finally:
+        if checkpoint_file:
+            checkpoint_file.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import saved report files into the archive")
+    parser.add_argument("roots", nargs="+", help="directories (or files) to import")
+    parser.add_argument("--archive", default=report_archive.DEFAULT_PATH,
+                        help=f"archive database (default: {report_archive.DEFAULT_PATH})")
+    parser.add_argument("--checkpoint", default="import.checkpoint",
+                        help="file recording imported paths (default: import.checkpoint)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="parser processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500, help="files per batch (default: 500)")
+    args = parser.parse_args(argv)
+
+    with report_archive.ReportArchive(args.archive) as archive:
+        stats = run_import(args.roots, archive, checkpoint=args.checkpoint,
+                           workers=args.workers, batch_size=args.batch_size,
+                           log=lambda msg: print(msg, file=sys.stderr))
+
+    print(f"Found {stats['found']} files, skipped {stats['skipped']} already imported, "
+          f"imported {stats['imported']}, failed {stats['failed']}")
+    # Parse time is time spent waiting on the pool, so it overlaps with loading
+    for stage in ("walk", "parse", "load"):
+        print(f"  {stage:<6}{stats[stage]:8.2f}s")
+    return 0 if not stats["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""Shared Part 1 / Part 2 report rendering
+
+Both front-ends (crime_report.py and app.py) and the batch tools render
+reports through this module. A report record is the same dict that the
+Tk app stores as ``report_data``:
+
+    {"type": "Gang", "name": ..., "crime": ..., "date": ..., "time": ...,
+     "nov": False, "crimes": [...], "fields": {"gang_bodycam_proof": ...}}
+
+No UI toolkit is imported here, so it is safe to use from scripts and
+worker processes.
+"""
+from functools import lru_cache
+
+SEPARATOR = "=" * 50 + "\n"
+
+# (label, field key) in the order they appear in Part 2
+GANG_FIELDS = (
+    ("Proof of bodycam / refresh / upload:", "gang_bodycam_proof"),
+    ("Bodycam Footage:", "gang_bodycam_footage"),
+    ("Bodycam Footage of interrogation:", "gang_interrogation"),
+    ("Culprit Identification Proof:", "gang_culprit_id"),
+    ("License plates:", "gang_license_plates"),
+)
+
+FAMILY_FIELDS = (
+    ("Proof of bodycam / refresh / upload:", "family_bodycam_proof"),
+    ("Bodycam Footage:", "family_bodycam_footage"),
+    ("Culprit Identification Proof:", "family_culprit_id"),
+    ("Bodycam Footage of interrogation:", "family_interrogation"),
+    ("License plates:", "family_license_plates"),
+    ("License plates searched in PDA:", "family_pda_search"),
+    ("Owner of the car searched in PDA:", "family_car_owner"),
+)
+
+FIELDS = {"Gang": GANG_FIELDS, "Family": FAMILY_FIELDS}
+REPORT_TYPES = tuple(FIELDS)
+
+# Part 1 header layouts: the Tk app separates date and time with a pipe,
+# the Streamlit page puts them together and appends the NOV marker.
+HEADER_FORMATS = {
+    "desktop": "{name} | {crime} | {date} | {time}\n\n",
+    "web": "{name} | {crime} | {date} {time} {nov}\n\n",
+}
+
+
+class ReportTemplate:
+    """Pre-built text pieces of Part 2 for one report type"""
+
+    __slots__ = ("report_type", "fields", "keys", "labels", "missing",
+                 "name_prefix", "crimes_heading")
+
+    def __init__(self, report_type, fields):
+        self.report_type = report_type
+        self.fields = fields
+        self.keys = tuple(key for _, key in fields)
+        # Link goes on the line after the label, N/A on the same line
+        self.labels = tuple(f"{label}\n" for label, _ in fields)
+        self.missing = tuple(f"{label} N/A\n{SEPARATOR}" for label, _ in fields)
+        self.name_prefix = f"{report_type} Name: "
+        self.crimes_heading = "Crimes Committed " + (
+            "(Mandatory):\n" if report_type == "Gang" else ":\n")
+
+    def part2(self, name, fields, crimes):
+        """Render Part 2 from a name, a field dict and a list of crimes"""
+        out = [self.name_prefix, name, "\n\n", SEPARATOR]
+        append = out.append
+        get = fields.get
+        for key, label, missing in zip(self.keys, self.labels, self.missing):
+            value = (get(key) or "").strip()
+            if value:
+                append(label)
+                append(value)
+                append("\n")
+                append(SEPARATOR)
+            else:
+                append(missing)
+        append(self.crimes_heading)
+        if crimes:
+            for crime in crimes:
+                append("- ")
+                append(crime)
+                append("\n")
+        else:
+            append("N/A\n")
+        append(SEPARATOR)
+        return "".join(out)
+
+    # The same text as part2(), one section at a time, for ReportPreview
+    def name_section(self, name):
+        return f"{self.name_prefix}{name}\n\n{SEPARATOR}"
+
+    def field_section(self, i, value):
+        value = (value or "").strip()
+        return f"{self.labels[i]}{value}\n{SEPARATOR}" if value else self.missing[i]
+
+    def crimes_section(self, crimes):
+        lines = "".join(f"- {crime}\n" for crime in crimes) if crimes else "N/A\n"
+        return f"{self.crimes_heading}{lines}{SEPARATOR}"
+
+
+# Compiled once at import; any other type falls back to the Family layout
+# just like the original if/else in the front-ends.
+TEMPLATES = {report_type: ReportTemplate(report_type, fields)
+             for report_type, fields in FIELDS.items()}
+
+
+def get_template(report_type):
+    """Return the compiled template for a report type"""
+    template = TEMPLATES.get(report_type)
+    if template is None:
+        template = _fallback_template(report_type)
+    return template
+
+
+# Other types come from imported files and archived records, so only the
+# last few are kept; the same one each time lets ReportPreview update
+# sections instead of redrawing the whole report
+@lru_cache(maxsize=32)
+def _fallback_template(report_type):
+    return ReportTemplate(report_type, FAMILY_FIELDS)
+
+
+def fields_for(report_type):
+    """Return the (label, key) pairs used by a report type"""
+    return get_template(report_type).fields
+
+
+def render_part1(record, header="desktop"):
+    """Render the Part 1 header line"""
+    return HEADER_FORMATS[header].format(
+        name=record.get("name", ""),
+        crime=record.get("crime", ""),
+        date=record.get("date", ""),
+        time=record.get("time", ""),
+        nov="Nov" if record.get("nov") else "",
+    )
+
+
+def render(record, header="desktop"):
+    """Render one report record, returning (part1, part2)"""
+    template = get_template(record.get("type", "Gang"))
+    part2 = template.part2(record.get("name", ""),
+                           record.get("fields") or {},
+                           record.get("crimes") or ())
+    return render_part1(record, header), part2
+
+
+def render_many(records, header="desktop"):
+    """Lazily render an iterable of records, yielding (part1, part2)
+
+    Only one report is held in memory at a time, so this can be fed
+    straight from a file reader of any size.
+    """
+    for record in records:
+        yield render(record, header)
+
+
+class ReportPreview:
+    """A report kept rendered as its record changes, one section at a time
+
+    The text is split into sections: the Part 1 header, the name line,
+    one per evidence field and the charges block. update() compares each
+    section's inputs with the last ones and re-renders only the sections
+    that changed, so a keystroke in one field costs one field's worth of
+    rendering. The joined text always equals render(record, header).
+    """
+
+    def __init__(self, header="desktop"):
+        self.header = header
+        self.template = None
+        self.inputs = []
+        self.sections = []
+
+    def _inputs(self, record):
+        get = record.get
+        fields = get("fields") or {}
+        return ([(get("name", ""), get("crime", ""), get("date", ""), get("time", ""),
+                  bool(get("nov"))), get("name", "")] +
+                [(fields.get(key) or "").strip() for key in self.template.keys] +
+                [tuple(get("crimes") or ())])
+
+    def _render(self, i, value, record):
+        if i == 0:
+            return render_part1(record, self.header)
+        if i == 1:
+            return self.template.name_section(value)
+        if i == len(self.inputs) - 1:
+            return self.template.crimes_section(value)
+        return self.template.field_section(i - 2, value)
+
+    def update(self, record):
+        """Re-render what changed; returns the changed section indices
+
+        Returns None when the layout itself changed (a different report
+        type), meaning the whole text must be redrawn.
+        """
+        template = get_template(record.get("type", "Gang"))
+        if template is not self.template:
+            self.template = template
+            self.inputs = self._inputs(record)
+            self.sections = [self._render(i, value, record) for i, value in enumerate(self.inputs)]
+            return None
+        changed = []
+        for i, value in enumerate(self._inputs(record)):
+            if value != self.inputs[i]:
+                self.inputs[i] = value
+                self.sections[i] = self._render(i, value, record)
+                changed.append(i)
+        return changed
+
+    @property
+    def part1(self):
+        return self.sections[0] if self.sections else ""
+
+    @property
+    def part2(self):
+        return "".join(self.sections[1:])
+
+    @property
+    def text(self):
+        return "".join(self.sections)
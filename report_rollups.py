@@ -0,0 +1,195 @@
+"""Hourly and daily report counts for dashboards
+
+The archive keeps a rollups table next to its reports. Each row holds
+the number of reports in one time bucket for one report type and NOV
+flag, and how many of them were filed with each charge:
+
+    period  bucket      type    nov  count  charges
+    hour    1718013600  Gang    0    14     [0, 5, 0, 2, ...]
+    day     20240610    Family  1    3      [1, 0, 0, 3, ...]
+
+Hour buckets are the UTC epoch the hour starts at; day buckets are UK
+dates as YYYYMMDD integers, like report_archive.date_key. charges is
+indexed by catalog ordinal and stored as little-endian int32s; a vector
+written under a smaller catalog is simply shorter. Reports without an
+epoch are not counted.
+
+Rows are updated in the same transaction that archives a report, so the
+counts always match the reports table, and a dashboard query reads only
+the buckets it asks for however large the archive grows. rebuild()
+recomputes the whole table from the reports with NumPy, a block of
+reports at a time.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import report_time
+
+PERIODS = ("hour", "day")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    nov INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    charges BLOB NOT NULL,
+    PRIMARY KEY (period, bucket, type, nov)
+) WITHOUT ROWID;
+"""
+
+UPSERT = ("INSERT INTO rollups (period, bucket, type, nov, count, charges) "
+          "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (period, bucket, type, nov) DO UPDATE SET "
+          "count = count + excluded.count, charges = add_counts(charges, excluded.charges)")
+
+COUNT_DTYPE = np.dtype("<i4")
+
+# charges is an int64 array indexed by ordinal, catalog.size long
+RollupRow = namedtuple("RollupRow", "bucket type nov count charges")
+
+
+def add_counts(first, second):
+    """SQL function: the sum of two charge count vectors"""
+    first = np.frombuffer(first, COUNT_DTYPE)
+    second = np.frombuffer(second, COUNT_DTYPE)
+    if len(first) < len(second):
+        first, second = second, first
+    total = first.copy()
+    total[:len(second)] += second
+    return total.tobytes()
+
+
+def register(conn):
+    conn.create_function("add_counts", 2, add_counts, deterministic=True)
+
+
+def buckets(period, epochs):
+    """The period's bucket for each of an array of epochs"""
+    epochs = np.asarray(epochs, dtype=np.int64)
+    if period == "hour":
+        return epochs - epochs % 3600
+    if period == "day":
+        return report_time.day_keys(epochs)
+    raise ValueError(f"unknown rollup period {period!r}")
+
+
+def _grouped(period, epochs, types, novs, reports, ordinals, size):
+    """Upsert rows for reports given as arrays
+
+    reports and ordinals are parallel arrays: report reports[i] was filed
+    with charge ordinals[i].
+    """
+    names, codes = np.unique(np.asarray(types, dtype=object), return_inverse=True)
+    # One integer per (bucket, nov, type) so np.unique can group them
+    keys = (buckets(period, epochs) * 2 + novs) * len(names) + codes
+    unique, group = np.unique(keys, return_inverse=True)
+    counts = np.bincount(group, minlength=len(unique))
+    charges = np.bincount(group[reports] * size + ordinals,
+                          minlength=len(unique) * size).astype(COUNT_DTYPE).reshape(-1, size)
+    rest, code = np.divmod(unique, len(names))
+    bucket, nov = np.divmod(rest, 2)
+    return [(period, b, names[c], n, count, vector.tobytes())
+            for b, c, n, count, vector in zip(bucket.tolist(), code.tolist(), nov.tolist(),
+                                              counts.tolist(), charges)]
+
+
+class RollupBatch:
+    """Counts for reports archived in one transaction
+
+    The archive add()s each report as it inserts it and write()s the
+    batch before committing, one upsert per bucket the batch touches.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.epochs = []
+        self.types = []
+        self.novs = []
+        self.reports = []
+        self.ordinals = []
+
+    def add(self, epoch, report_type, nov, ordinals):
+        if epoch is None:
+            return
+        n = len(self.epochs)
+        self.epochs.append(epoch)
+        self.types.append(report_type)
+        self.novs.append(1 if nov else 0)
+        for ordinal in ordinals:
+            self.reports.append(n)
+            self.ordinals.append(ordinal)
+
+    def write(self, conn):
+        """Add the batch to the rollups table; caller holds the lock and commits"""
+        if not self.epochs:
+            return
+        arrays = (self.epochs, self.types, np.array(self.novs, np.int64),
+                  np.array(self.reports, np.int64), np.array(self.ordinals, np.int64))
+        for period in PERIODS:
+            conn.executemany(UPSERT, _grouped(period, *arrays, self.size))
+        self.__init__(self.size)
+
+
+def rebuild(conn, catalog, block_rows=16384):
+    """Recompute the rollups table from the reports table
+
+    Caller holds the lock and commits. Returns the number of reports
+    counted.
+    """
+    width = catalog.width
+    blank = bytes(width)
+    conn.execute("DELETE FROM rollups")
+    last_id = 0
+    counted = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, epoch, type, nov, charges FROM reports "
+            "WHERE id > ? AND epoch IS NOT NULL ORDER BY id LIMIT ?",
+            (last_id, block_rows)).fetchall()
+        if not rows:
+            return counted
+        last_id = rows[-1][0]
+        counted += len(rows)
+        _, epochs, types, novs, masks = zip(*rows)
+        packed = np.frombuffer(
+            b"".join(blank if m is None else m[:width].ljust(width, b"\0") for m in masks),
+            dtype=np.uint8).reshape(len(rows), width)
+        reports, ordinals = np.nonzero(
+            np.unpackbits(packed, axis=1, bitorder="little")[:, :catalog.size])
+        novs = (np.array(novs, np.int64) != 0).astype(np.int64)
+        for period in PERIODS:
+            # Blocks can share buckets, so these are upserts too
+            conn.executemany(UPSERT, _grouped(period, epochs, types, novs, reports, ordinals,
+                                              catalog.size))
+
+
+def query(conn, period, start, end, size, report_type=None, nov=None):
+    """Rollup rows of buckets start..end (inclusive), oldest first
+
+    start and end are buckets of the period: epochs for "hour" (any
+    epoch inside the hour works), YYYYMMDD for "day". size is the length
+    of the returned charge vectors. Caller holds the lock.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"unknown rollup period {period!r}")
+    if period == "hour":
+        start -= start % 3600
+    clauses = ["period = ?", "bucket BETWEEN ? AND ?"]
+    params = [period, start, end]
+    if report_type is not None:
+        clauses.append("type = ?")
+        params.append(report_type)
+    if nov is not None:
+        clauses.append("nov = ?")
+        params.append(1 if nov else 0)
+    rows = []
+    for bucket, report_type, nov, count, charges in conn.execute(
+            "SELECT bucket, type, nov, count, charges FROM rollups WHERE " +
+            " AND ".join(clauses) + " ORDER BY bucket, type, nov", params):
+        vector = np.zeros(size, np.int64)
+        charges = np.frombuffer(charges, COUNT_DTYPE)[:size]
+        vector[:len(charges)] = charges
+        rows.append(RollupRow(bucket, report_type, nov, count, vector))
+    return rows
@@ -0,0 +1,192 @@
+"""Report dates and times
+
+Reports show the date as DD.MM.YYYY and the time as 24h HH:MM, UK local
+time. This module parses and validates those strings once, when a
+report is entered, and turns them into a UTC epoch (whole seconds) that
+is stored next to the display strings, so saved reports can be sorted
+and range-queried without parsing text again.
+
+UK local time is converted with the Europe/London rules:
+
+- a time inside the hour skipped when the clocks go forward (01:00-01:59
+  on the last Sunday of March) does not exist and is rejected;
+- a time inside the hour repeated when the clocks go back (01:00-01:59
+  on the last Sunday of October) is taken as the first one, in BST.
+
+epochs() converts whole columns of strings at once with numpy, for bulk
+imports and archive migrations, and gives the same answer as to_epoch().
+day_keys() goes the other way, from epochs to UK dates.
+"""
+import re
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+TIMEZONE = pytz.timezone("Europe/London")
+DATE_FORMAT = "%d.%m.%Y"
+TIME_FORMAT = "%H:%M"
+
+_DATE = re.compile(r"^(\d{1,2})\.(\d{1,2})\.(\d{4})$")
+_TIME = re.compile(r"^(\d{1,2}):(\d{2})$")
+_EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidTimestamp(ValueError):
+    """Raised for a date or time that is malformed or does not exist"""
+
+
+def uk_now():
+    """Current UK date and time"""
+    return datetime.now(TIMEZONE)
+
+
+def now_strings():
+    """Current UK date and time as the (DD.MM.YYYY, HH:MM) display strings"""
+    now = uk_now()
+    return now.strftime(DATE_FORMAT), now.strftime(TIME_FORMAT)
+
+
+def parse(date, time):
+    """Parse display strings into a naive UK local datetime"""
+    date_match = _DATE.match((date or "").strip())
+    if date_match is None:
+        raise InvalidTimestamp(f"date must be DD.MM.YYYY, got {date!r}")
+    time_match = _TIME.match((time or "").strip())
+    if time_match is None:
+        raise InvalidTimestamp(f"time must be 24h HH:MM, got {time!r}")
+    day, month, year = (int(part) for part in date_match.groups())
+    hour, minute = (int(part) for part in time_match.groups())
+    try:
+        return datetime(year, month, day, hour, minute)
+    except ValueError as e:
+        raise InvalidTimestamp(f"{date} {time}: {e}") from None
+
+
+def localize(local):
+    """Attach UK time to a naive datetime, with the DST rules above"""
+    try:
+        return TIMEZONE.localize(local, is_dst=None)
+    except pytz.NonExistentTimeError:
+        raise InvalidTimestamp(
+            f"{local:%d.%m.%Y %H:%M} does not exist in UK time (the clocks go forward)") from None
+    except pytz.AmbiguousTimeError:
+        return TIMEZONE.localize(local, is_dst=True)
+
+
+def to_epoch(date, time):
+    """Validate display strings and return the UTC epoch in seconds"""
+    moment = localize(parse(date, time))
+    return int((moment.replace(tzinfo=None) - moment.utcoffset() - _EPOCH).total_seconds())
+
+
+def try_epoch(date, time):
+    """Like to_epoch, but None for a value that cannot be converted"""
+    try:
+        return to_epoch(date, time)
+    except InvalidTimestamp:
+        return None
+
+
+def display(epoch):
+    """The (DD.MM.YYYY, HH:MM) display strings for a UTC epoch"""
+    moment = datetime.fromtimestamp(epoch, TIMEZONE)
+    return moment.strftime(DATE_FORMAT), moment.strftime(TIME_FORMAT)
+
+
+def _transitions():
+    """UTC transition instants (seconds) and the offset in effect from each"""
+    instants = np.array([int((moment - _EPOCH).total_seconds())
+                         for moment in TIMEZONE._utc_transition_times], dtype=np.int64)
+    offsets = np.array([int(info[0].total_seconds()) for info in TIMEZONE._transition_info],
+                       dtype=np.int64)
+    return instants, offsets
+
+
+_TRANSITIONS = None
+
+
+def _transition_table():
+    global _TRANSITIONS
+    if _TRANSITIONS is None:
+        _TRANSITIONS = _transitions()
+    return _TRANSITIONS
+
+
+def utc_offsets(epochs):
+    """UK offset from UTC, in seconds, in force at each of an array of epochs"""
+    instants, offsets = _transition_table()
+    epochs = np.asarray(epochs, dtype=np.int64)
+    return offsets[np.searchsorted(instants, epochs, side="right") - 1]
+
+
+def day_keys(epochs):
+    """UK dates of an array of epochs as YYYYMMDD integers (see report_archive.date_key)"""
+    epochs = np.asarray(epochs, dtype=np.int64)
+    days = ((epochs + utc_offsets(epochs)) // 86400).astype("datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    return ((years.astype(np.int64) + 1970) * 10000 +
+            (months - years).astype(np.int64) * 100 + 100 +
+            (days - months).astype(np.int64) + 1)
+
+
+def _fixed_width(strings, pattern):
+    """Digits of strings shaped exactly like pattern ("d" = digit)
+
+    Returns (digits, ok): an int64 array with a column per pattern
+    character, and a mask of the rows that match.
+    """
+    width = len(pattern)
+    # One extra character shows which strings are too long
+    codes = np.asarray(strings, dtype=f"U{width + 1}").view(np.uint32).reshape(-1, width + 1)
+    digits = codes[:, :width] - ord("0")
+    ok = codes[:, width] == 0
+    for i, char in enumerate(pattern):
+        ok &= digits[:, i] < 10 if char == "d" else codes[:, i] == ord(char)
+    return digits.astype(np.int64), ok
+
+
+def epochs(dates, times):
+    """Convert sequences of display strings to UTC epochs in one pass
+
+    Returns an int64 array; -1 marks a value that is malformed or does
+    not exist (epochs before 1970 are not expected in reports). Strings
+    in the canonical DD.MM.YYYY / HH:MM shape are converted as arrays;
+    the odd one out (5.6.2024, stray spaces) goes through to_epoch().
+    """
+    instants, offsets = _transition_table()
+
+    date_digits, date_ok = _fixed_width(dates, "dd.dd.dddd")
+    time_digits, time_ok = _fixed_width(times, "dd:dd")
+    count = len(date_ok)
+    canonical = date_ok & time_ok
+    day = date_digits[:, 0] * 10 + date_digits[:, 1]
+    month = date_digits[:, 3] * 10 + date_digits[:, 4]
+    year = (date_digits[:, 6] * 1000 + date_digits[:, 7] * 100 +
+            date_digits[:, 8] * 10 + date_digits[:, 9])
+    hour = time_digits[:, 0] * 10 + time_digits[:, 1]
+    minute = time_digits[:, 3] * 10 + time_digits[:, 4]
+    valid = canonical & (month >= 1) & (month <= 12) & (day >= 1) & (hour <= 23) & (minute <= 59)
+
+    # Days in the month, then seconds since the epoch of the local time
+    months = (year - 1970) * 12 + np.clip(month, 1, 12) - 1
+    first = months.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    month_days = (months + 1).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) - first
+    valid &= day <= month_days
+    local = (first + day - 1) * 86400 + hour * 3600 + minute * 60
+
+    # A local time is real under an offset when that offset is in force
+    # at the resulting UTC instant; with two answers (the repeated hour)
+    # the larger offset, i.e. the earlier instant, wins
+    chosen = np.full(count, -1, dtype=np.int64)
+    for offset in sorted(set(offsets.tolist())):
+        candidate = local - offset
+        in_force = offsets[np.searchsorted(instants, candidate, side="right") - 1] == offset
+        chosen = np.where(in_force, candidate, chosen)
+    result = np.where(valid & (chosen >= 0), chosen, -1)
+
+    for i in np.flatnonzero(~canonical):
+        epoch = try_epoch(str(dates[i]), str(times[i]))
+        result[i] = -1 if epoch is None or epoch < 0 else epoch
+    return result
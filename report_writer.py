@@ -0,0 +1,194 @@
+"""Background writer for saved reports
+
+Saving a report writes a .txt and a .json file and archives the record.
+On a slow disk or a network share that can take seconds, so the Tk app
+hands each save to a ReportWriter instead of doing it on the main thread:
+
+    writer = ReportWriter(archive)
+    writer.submit(filename, report_text, report_data)
+    ...
+    for result in writer.results():    # from a root.after() poll
+        ...
+
+A single worker thread takes jobs from a bounded queue. Every file is
+written to a temporary file in the target directory and renamed over the
+target, so a crash never leaves a half-written report. Jobs that are
+waiting together are written as one batch: their reports go into the
+archive in one transaction and, with fsync enabled, each directory is
+synced once per batch rather than once per file.
+"""
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+
+SaveJob = namedtuple("SaveJob", "filename report_text report_data")
+
+# error is None on success; stage is "save" or "archive" when it failed
+SaveResult = namedtuple("SaveResult", "job error stage")
+
+
+def _umask():
+    # Reading the umask means setting it; done once, before any writes
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _umask()
+
+
+def _file_mode(path):
+    """The mode path should keep, or a new file's default under the umask"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def write_atomic(path, text, fsync=False):
+    """Write text to path via a temporary file and a rename"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        # mkstemp makes the file owner-only; the rename would keep that
+        try:
+            os.chmod(tmp_path, _file_mode(path))
+        except OSError:
+            pass    # shares that do not support modes
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def fsync_directory(directory):
+    """Make renames in directory durable; a no-op where unsupported"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_report_files(filename, report_text, report_data, fsync=False):
+    """Write the report text and its JSON record next to it"""
+    write_atomic(filename, report_text, fsync)
+    json_file = filename.replace('.txt', '.json')
+    write_atomic(json_file, json.dumps(report_data, indent=2), fsync)
+
+
+class WriterBusy(Exception):
+    """Raised by submit() when the queue of pending saves is full"""
+
+
+class ReportWriter:
+    """Writes and archives reports on a background thread"""
+
+    def __init__(self, archive=None, max_pending=32, batch_size=16, fsync=False, frontend="tk"):
+        self.archive = archive
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.frontend = frontend
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.done = queue.Queue()
+        self.pending = 0          # submitted but not yet reported back
+        self.pending_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, filename, report_text, report_data):
+        """Queue a save without blocking; raises WriterBusy if the queue is full"""
+        job = SaveJob(filename, report_text, report_data)
+        with self.pending_lock:
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                raise WriterBusy(f"{self.jobs.maxsize} saves are already waiting") from None
+            self.pending += 1
+        return job
+
+    def results(self):
+        """Yield the results of finished saves; never blocks"""
+        while True:
+            try:
+                result = self.done.get_nowait()
+            except queue.Empty:
+                return
+            with self.pending_lock:
+                self.pending -= 1
+            yield result
+
+    def _next_batch(self):
+        batch = [self.jobs.get()]
+        while batch[-1] is not None and len(batch) < self.batch_size:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        written = []
+        directories = set()
+        for job in batch:
+            began = time.perf_counter()
+            try:
+                write_report_files(job.filename, job.report_text, job.report_data, self.fsync)
+            except Exception as e:
+                metrics.OPERATION_ERRORS.labels(self.frontend, "save").inc()
+                self.done.put(SaveResult(job, str(e), "save"))
+                continue
+            finally:
+                metrics.observe(self.frontend, "save", time.perf_counter() - began)
+            written.append(job)
+            directories.add(os.path.dirname(os.path.abspath(job.filename)))
+
+        if self.fsync:
+            for directory in directories:
+                fsync_directory(directory)
+
+        error = None
+        if self.archive is not None and written:
+            try:
+                with metrics.timed(self.frontend, "archive"):
+                    self.archive.add_many([job.report_data for job in written])
+            except Exception as e:
+                error = str(e)
+        for job in written:
+            self.done.put(SaveResult(job, error, "archive" if error else None))
+
+    def close(self, timeout=None):
+        """Finish every queued save, then stop the worker"""
+        self.jobs.put(None)
+        self.thread.join(timeout)